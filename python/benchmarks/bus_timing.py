@@ -0,0 +1,193 @@
+'''
+Projected link time: file downloads and telemetry backlogs, on the wire.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.bus_timing [--baud 100000] [--stretch-us 20]
+                [--kbytes 4] [--read-interval 10] [--report-period 1]
+                [--buffers 48,112,240] [--loop-ms 1,5,20]
+
+The device code runs as is, on a SlaveSim with a BusTiming clock, so
+every master transaction costs its wire time (plus --stretch-us of
+clock stretching), and the master follows the satellite simulator's
+cadence: read_block() reads 16 bytes at a time, --gap-ms apart, until
+it gets an empty block.  The server's main loop only refills the slave
+buffer every --loop-ms, unless the staged chunk goes in from tx done.
+An empty read ends the poll early, that's what --buffers is about.
+
+download: --kbytes read through FR commands (--chunk bytes each, 62
+is the default FR size): write the command, --response-ms later read 
+the reply.
+
+backlog: the telemetry lane starts full and a --report-bytes report
+comes in every --report-period s, while the master polls every
+--read-interval s (run_sequence_csv's readInterval).  Time to drain
+is until the initial backlog has all been read, dropped counts
+reports evicted while the master was away.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+
+from spasic.i2c.device_sim import I2CDevice, SlaveSim, BusTiming
+from spasic.i2c.tx_arena import TxArena, DropOldest, DropNewest
+import spasic.cnc.response.response as rsp
+try:
+    import spasic.settings as sts
+except:
+    import spasic.settings_safe as sts
+
+FileReadChunk = 16*4 - 2 # FR default
+
+class Link:
+    def __init__(self, args, buffer_size:int, loop_ms:float):
+        self.timing = BusTiming(args.baud, args.stretch_us)
+        self.slave = SlaveSim(buffer_size, self.timing)
+        self.hi = TxArena(sts.I2CTxArenaSize)
+        self.lo = TxArena(sts.I2CTxTelemetryArenaSize, max_frames=sts.I2CTxTelemetryMaxFrames,
+                          drop_policy=DropOldest if sts.I2CTxTelemetryDropOldest else DropNewest)
+        devclass = type('SizedI2CDevice', (I2CDevice,), {'SlaveBufferSize': buffer_size})
+        self.dev = devclass(txqueue=self.hi, txqueue_low=self.lo, backend=self.slave)
+        self.dev.begin()
+        self.loop_us = int(loop_ms * 1000)
+        self.gap_us = int(args.gap_ms * 1000)
+        self.next_loop_us = 0
+        self.readbuf = bytearray(16)
+        self.empty = bytearray(16)
+        self.polls = 0
+
+    def service(self):
+        # a main loop pass, if one is due
+        if self.timing.now_us >= self.next_loop_us:
+            self.dev.push_outgoing_data()
+            self.dev.queue_outdata()
+            self.next_loop_us = self.timing.now_us + self.loop_us
+
+    def wait(self, us:int):
+        self.timing.idle(us)
+        self.service()
+
+    def read_block(self):
+        '''
+            Like the client's read_block: read until an empty block.
+        '''
+        self.polls += 1
+        received = 0
+        self.service()
+        self.slave.master_request_into(self.readbuf)
+        while self.readbuf != self.empty:
+            received += 16
+            self.wait(self.gap_us)
+            self.slave.master_request_into(self.readbuf)
+        return received
+
+    @property
+    def queued(self):
+        return len(self.hi) + len(self.lo) + self.slave._out_len - self.slave._out_idx
+
+    def result(self):
+        t = self.timing
+        return {
+            'seconds': t.now_us / 1e6,
+            'wire_ms': t.busy_us / 1000,
+            'utilisation': t.utilisation,
+            'reads': t.reads,
+            'empty': self.slave.empty_reads,
+            'polls': self.polls,
+        }
+
+def run_download(args, buffer_size:int, loop_ms:float):
+    link = Link(args, buffer_size, loop_ms)
+    fr = bytearray(8)
+    fr[0] = ord('F') + ord('R')
+    total = args.kbytes * 1024
+    sent = 0
+    while sent < total:
+        # FR, handled and answered on the next main loop pass
+        link.slave.master_send_data(fr)
+        link.slave.pending_data_into(link.readbuf)
+        chunk = total - sent if total - sent < args.chunk else args.chunk
+        # not zeros: a block of those reads as the end of data
+        link.hi.put(rsp.ResponseDataBytes(bytearray([0xa5] * chunk)))
+        sent += chunk
+        link.wait(int(args.response_ms * 1000))
+        link.read_block()
+    res = link.result()
+    res['bytes_per_s'] = total / res['seconds']
+    return res
+
+def run_backlog(args, buffer_size:int, loop_ms:float):
+    link = Link(args, buffer_size, loop_ms)
+    report = rsp.ResponseExperiment(3, False, 0, bytearray([0xa5] * args.report_bytes))
+    for _i in range(sts.I2CTxTelemetryMaxFrames):
+        if link.lo.free < len(report):
+            break
+        link.lo.put(report)
+    backlog = len(link.lo)
+    evicted = link.lo.responses_evicted
+
+    period_us = int(args.report_period * 1e6) if args.report_period > 0 else 0
+    interval_us = int(args.read_interval * 1e6)
+    next_report_us = period_us
+    drained_at = None
+    read_total = 0
+    for _p in range(args.polls):
+        # reports trickle in while the master's away
+        t_poll = link.timing.now_us + interval_us
+        while period_us and next_report_us < t_poll:
+            link.timing.now_us = next_report_us
+            link.lo.put(report)
+            link.service()
+            next_report_us += period_us
+        link.timing.now_us = t_poll
+        read_total += link.read_block()
+        if drained_at is None and read_total >= backlog:
+            drained_at = link.timing.now_us
+
+    res = link.result()
+    res['backlog'] = backlog
+    res['drain_s'] = drained_at / 1e6 if drained_at is not None else None
+    res['dropped'] = link.lo.responses_evicted - evicted
+    return res
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Bus timing projections")
+    parser.add_argument('--baud', type=int, default=sts.I2CBaudRate, help='bus clock, Hz')
+    parser.add_argument('--stretch-us', type=int, default=20, help='clock stretching, per transaction')
+    parser.add_argument('--gap-ms', type=float, default=2, help="master's wait between reads")
+    parser.add_argument('--response-ms', type=float, default=50, help="master's wait for a command reply")
+    parser.add_argument('--kbytes', type=int, default=4, help='download size')
+    parser.add_argument('--chunk', type=int, default=FileReadChunk, help='bytes per FR command')
+    parser.add_argument('--read-interval', type=float, default=10, help='s between telemetry polls')
+    parser.add_argument('--report-period', type=float, default=1, help='s between reports, 0 for none')
+    parser.add_argument('--report-bytes', type=int, default=8, help='report payload size')
+    parser.add_argument('--polls', type=int, default=6, help='telemetry polls simulated')
+    parser.add_argument('--buffers', type=str, default='48,112,240', help='slave buffer sizes to try')
+    parser.add_argument('--loop-ms', type=str, default='1,5,20', help='main loop periods to try')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    buffers = [int(b) for b in args.buffers.split(',')]
+    loops = [float(l) for l in args.loop_ms.split(',')]
+    timing = BusTiming(args.baud, args.stretch_us)
+    print(f'{args.baud}Hz: write(8) {timing.transaction_us(8)}us read(16) {timing.transaction_us(16)}us, '
+          f'at most {timing.max_throughput(16, int(args.gap_ms * 1000)):.0f} B/s with {args.gap_ms}ms between reads\n')
+
+    print(f'download {args.kbytes}kB, {args.chunk} bytes per FR')
+    print(f'{"buffer":>6} {"loop ms":>7} {"seconds":>8} {"B/s":>7} {"reads":>6} {"empty":>6} {"wire ms":>8} {"util %":>6}')
+    for buffer_size in buffers:
+        for loop_ms in loops:
+            r = run_download(args, buffer_size, loop_ms)
+            print(f'{buffer_size:>6} {loop_ms:>7g} {r["seconds"]:>8.2f} {r["bytes_per_s"]:>7.0f} {r["reads"]:>6} '
+                  f'{r["empty"]:>6} {r["wire_ms"]:>8.1f} {r["utilisation"]*100:>6.2f}')
+
+    print(f'\ntelemetry backlog, polled every {args.read_interval}s, a report every {args.report_period}s')
+    print(f'{"buffer":>6} {"loop ms":>7} {"backlog":>7} {"drain s":>7} {"reads":>6} {"empty":>6} {"dropped":>7} {"util %":>6}')
+    for buffer_size in buffers:
+        for loop_ms in loops:
+            r = run_backlog(args, buffer_size, loop_ms)
+            drain = f'{r["drain_s"]:.1f}' if r['drain_s'] is not None else '-'
+            print(f'{buffer_size:>6} {loop_ms:>7g} {r["backlog"]:>7} {drain:>7} {r["reads"]:>6} '
+                  f'{r["empty"]:>6} {r["dropped"]:>7} {r["utilisation"]*100:>6.3f}')
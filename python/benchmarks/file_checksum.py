@@ -0,0 +1,81 @@
+'''
+File checksums ('FZ'): the old word-by-word XOR vs block CRC-32.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.file_checksum [--size 256] [--blocks 4]
+
+A --size KB file of random bytes gets checksummed the old way (read(4)
+and XOR, until the end, in one call) and with a ChecksumJob, --blocks
+blocks at a time as the main loop does it.  For each: the whole time,
+the longest the main loop would be held up in one go, and how many
+objects reading allocated (bytes per word, or none).  Last row is
+asking again, answered from the ChecksumIndex.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+import zlib
+
+from spasic.fs.checksum import ChecksumIndex, ChecksumJob
+
+def xor_checksum(filepath:str):
+    # as FSAccess.simple_checksum did it
+    csum = 0
+    reads = 0
+    with open(filepath, 'rb') as f:
+        v = f.read(4)
+        while len(v):
+            reads += 1
+            csum = csum ^ int.from_bytes(v, 'little')
+            v = f.read(4)
+    return (csum, reads)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="File checksum, XOR vs CRC-32")
+    parser.add_argument('--size', type=int, default=256, help='file size, in KB')
+    parser.add_argument('--blocks', type=int, default=4, help='512 byte blocks per main loop pass')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    data = random.Random(1).randbytes(args.size * 1024)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'file.bin')
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        print(f'{args.size}KB file\n')
+        print(f'{"method":>10} {"total ms":>9} {"longest ms":>10} {"allocs":>7}')
+
+        t_start = time.perf_counter()
+        (_csum, reads) = xor_checksum(path)
+        elapsed = time.perf_counter() - t_start
+        print(f'{"xor":>10} {elapsed * 1000:>9.1f} {elapsed * 1000:>10.1f} {reads:>7}')
+
+        index = ChecksumIndex(None)
+        job = ChecksumJob(index)
+        job.start(path, len(data))
+        longest = 0
+        t_start = time.perf_counter()
+        done = False
+        while not done:
+            t_step = time.perf_counter()
+            done = job.step(args.blocks)
+            longest = max(longest, time.perf_counter() - t_step)
+        elapsed = time.perf_counter() - t_start
+        if job.crc != zlib.crc32(data):
+            print('MISMATCH: crc32 is wrong')
+        print(f'{"crc32":>10} {elapsed * 1000:>9.1f} {longest * 1000:>10.3f} {0:>7}')
+
+        t_start = time.perf_counter()
+        cached = index.lookup(path, os.stat(path)[6])
+        elapsed = time.perf_counter() - t_start
+        if cached != job.crc:
+            print('MISMATCH: not cached')
+        print(f'{"cached":>10} {elapsed * 1000:>9.3f} {elapsed * 1000:>10.3f} {0:>7}')
@@ -0,0 +1,70 @@
+'''
+Incoming command frame ring benchmark.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.frame_ring [--depth 16] [--seconds 2]
+
+Frames are written by the simulated master into device_sim.SlaveSim,
+fetched by the simulated I2CDevice poll, pushed into a FrameRing the
+same way i2c_server.i2c_data_in does, and drained in place like
+process_pending_data.  Reports sustained frames/second and drops, 
+for bursts of increasing size between two "main loop" passes.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import time
+
+from spasic.i2c.device_sim import I2CDevice, i2cslave
+from spasic.i2c.frame_ring import FrameRing
+
+Frames = [
+    bytearray(b'S\x00\x00\x00\x00\x00\x00\x00'),
+    bytearray(b'P\x01PNG\x00\x00\x00'),
+    bytearray(b'\x8e\x00\x00\x00\x00\x00\x00\x00'),
+    bytearray(b'\xa9\x02/path/'),
+]
+
+def run(depth:int, burst:int, seconds:float):
+    ring = FrameRing(depth)
+    dev = I2CDevice()
+    dev.callback_data_in = lambda n, bts: ring.push(n, bts)
+    dev.begin()
+    
+    checksum = 0
+    sent = 0
+    handled = 0
+    t_end = time.perf_counter() + seconds
+    t_start = time.perf_counter()
+    while time.perf_counter() < t_end:
+        for i in range(burst):
+            i2cslave.master_send_data(Frames[(sent + i) % len(Frames)])
+        sent += burst
+        
+        # one main loop pass: poll, then drain in place
+        while dev.poll_pending_data():
+            pass
+        frame = ring.peek()
+        while frame is not None:
+            checksum += frame[0]
+            handled += 1
+            ring.pop()
+            frame = ring.peek()
+    elapsed = time.perf_counter() - t_start
+    return (handled / elapsed, sent, handled, ring.dropped, ring.high_water)
+    
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="FrameRing benchmark")
+    parser.add_argument('--depth', type=int, default=16, help='ring depth')
+    parser.add_argument('--seconds', type=float, default=1.0, help='duration of each run')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    print(f'{"burst":>6} {"frames/s":>12} {"sent":>9} {"handled":>9} {"dropped":>8} {"highwater":>9}')
+    for burst in [1, 4, 8, args.depth, args.depth * 2]:
+        (rate, sent, handled, dropped, hw) = run(args.depth, burst, args.seconds)
+        print(f'{burst:>6} {rate:>12.0f} {sent:>9} {handled:>9} {dropped:>8} {hw:>9}')
@@ -0,0 +1,111 @@
+'''
+Response decoding on a noisy downlink: plain (v1) vs framed (v2).
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.framing_noise [--responses 5000] [--packet 112]
+                [--error-rates 0,0.0005,0.002,0.01] [--seed 1]
+
+The same run of responses (status, experiment, info, variable values,
+OK messages, each one unique) is encoded plain and framed, then bytes
+are garbled at random, at each --error-rates (the chance for any one
+byte).  The streams are fed to a ResponseDecoder --packet bytes at a
+time, framed_only for v2, as the client does after switching.
+
+Every response decoded either is one that was sent (ok) or isn't
+(bogus: made up out of garbage, what v2 is meant to avoid).  Whatever
+wasn't recovered is lost.  Rate is of the decoding alone.  Plain 
+streams come up with some bogus ones even without errors: a status or
+info cut short by the end of a packet can't be told from a whole one.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import random
+import time
+
+from spasic.cnc.response.response import *
+from spasic.cnc.response.decoder import ResponseDecoder
+import spasic.cnc.response.framing as framing
+
+def make_responses(count:int):
+    responses = []
+    for i in range(count):
+        tag = i.to_bytes(4, 'little')
+        kind = i % 5
+        if kind == 0:
+            # full result: a plain status is only unambiguous then
+            responses.append(ResponseStatus(True, i & 0xff, 0, i, tag + b'\xa5\xa5\xa5\xa5'))
+        elif kind == 1:
+            responses.append(ResponseExperiment(i & 0xff, False, 0, tag + bytes(i % 8)))
+        elif kind == 2:
+            responses.append(ResponseInfo(1, 1, 0, 'P2', i, i))
+        elif kind == 3:
+            responses.append(ResponseVariableValue(i % 7, tag + b'value'))
+        else:
+            responses.append(ResponseOKMessage(b'EQ' + tag))
+    return responses
+
+def encode(responses, framed:bool):
+    stream = bytearray()
+    writer = framing.FrameWriter()
+    for r in responses:
+        item = writer.wrap(r) if framed else r
+        buf = bytearray(len(item))
+        item.encode_into(buf, 0)
+        stream += buf
+    return stream
+
+def garble(stream:bytearray, error_rate:float, rnd:random.Random):
+    noisy = bytearray(stream)
+    if error_rate <= 0:
+        return noisy
+    for i in range(len(noisy)):
+        if rnd.random() < error_rate:
+            noisy[i] ^= rnd.randint(1, 255)
+    return noisy
+
+def decode(stream:bytearray, packet:int, framed:bool):
+    decoder = ResponseDecoder(framed_only=framed)
+    parsed = []
+    t_start = time.perf_counter()
+    for i in range(0, len(stream), packet):
+        decoder.feed(stream[i:(i + packet)])
+        parsed.extend(decoder.responses())
+    decoder.flush()
+    parsed.extend(decoder.responses())
+    elapsed = time.perf_counter() - t_start
+    return (parsed, elapsed, decoder)
+
+def score(sent, parsed):
+    expected = set(bytes(r.bytes) for r in sent)
+    ok = 0
+    for r in parsed:
+        if bytes(r.bytes) in expected:
+            ok += 1
+    return (ok, len(parsed) - ok, len(sent) - ok)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Noisy downlink decoding, plain vs framed")
+    parser.add_argument('--responses', type=int, default=5000, help='responses sent')
+    parser.add_argument('--packet', type=int, default=112, help='bytes fed to the decoder at a time')
+    parser.add_argument('--error-rates', type=str, default='0,0.0005,0.002,0.01', help='chance a byte is garbled')
+    parser.add_argument('--seed', type=int, default=1, help='for the garbling')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    sent = make_responses(args.responses)
+    streams = [('v1', False, encode(sent, False)), ('v2', True, encode(sent, True))]
+    for (name, _f, stream) in streams:
+        print(f'{name}: {len(stream)} bytes, {len(stream) / len(sent):.1f} per response')
+
+    print(f'\n{"errors":>7} {"proto":>5} {"ok":>6} {"bogus":>6} {"lost":>6} {"bad crc":>7} {"responses/s":>11}')
+    for error_rate in [float(e) for e in args.error_rates.split(',')]:
+        for (name, framed, stream) in streams:
+            noisy = garble(stream, error_rate, random.Random(args.seed))
+            (parsed, elapsed, decoder) = decode(noisy, args.packet, framed)
+            (ok, bogus, lost) = score(sent, parsed)
+            bad = decoder.frames_bad if framed else '-'
+            print(f'{error_rate:>7g} {name:>5} {ok:>6} {bogus:>6} {lost:>6} {bad:>7} {len(parsed) / elapsed:>11.0f}')
@@ -0,0 +1,90 @@
+'''
+Patches ('FP') vs uploading the whole new file, on real edits.
+
+Runs under CPython, from the spasics/python directory, in the git
+checkout:
+
+  python -m benchmarks.patch_size [--file i2c_server.py] [--buffer 256]
+
+Every version of --file in the git history gets compared with the one
+before: the patch i2c_client_patch makes, against the new file itself,
+in bytes and in 'FW' frames (7 bytes each) to upload.  The patch is
+then applied by a PatchJob, through a --buffer byte buffer, on temp
+files, and the result checked, with the number of steps (main loop
+passes, at PatchBuffersPerPass) it took.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from i2c_client_patch import make_patch
+from spasic.fs.patch import PatchJob
+import spasic.settings as sts
+
+def versions(filepath:str):
+    '''
+        (commit, contents) for each version of filepath, oldest first
+    '''
+    revs = subprocess.run(['git', 'log', '--format=%h', '--', filepath],
+                          capture_output=True, text=True, check=True).stdout.split()
+    vers = []
+    for rev in reversed(revs):
+        contents = subprocess.run(['git', 'show', f'{rev}:./{filepath}'],
+                                  capture_output=True, check=True).stdout
+        vers.append((rev, contents))
+    return vers
+
+def frames(num_bytes:int):
+    return (num_bytes + 6) // 7
+
+def apply(tmpdir:str, old:bytes, delta:bytes, buffer_size:int):
+    paths = [os.path.join(tmpdir, n) for n in ['old', 'delta', 'new']]
+    for (path, contents) in zip(paths[:2], [old, delta]):
+        with open(path, 'wb') as f:
+            f.write(contents)
+    job = PatchJob(None, buffer_size)
+    steps = 0
+    if job.start(*paths):
+        steps = 1
+        while not job.step(sts.PatchBuffersPerPass):
+            steps += 1
+    if job.error is not None:
+        return (None, steps)
+    with open(paths[2], 'rb') as f:
+        return (f.read(), steps)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Patch size vs full upload, over a file's git history")
+    parser.add_argument('--file', type=str, default='i2c_server.py', help='file, relative to here')
+    parser.add_argument('--buffer', type=int, default=sts.PatchBufferSize, help='patch buffer size')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    vers = versions(args.file)
+    print(f'{args.file}: {len(vers)} versions, patches applied with a {args.buffer} byte buffer\n')
+    print(f'{"commit":>8} {"new size":>9} {"patch":>6} {"%":>6} {"FW full":>8} {"FW patch":>9} {"steps":>6} {"diff ms":>8}')
+    total_full = 0
+    total_patch = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(1, len(vers)):
+            (_rev, old) = vers[i - 1]
+            (rev, new) = vers[i]
+            t_start = time.perf_counter()
+            delta = make_patch(old, new)
+            elapsed = time.perf_counter() - t_start
+            (result, steps) = apply(tmpdir, old, delta, args.buffer)
+            if result != new:
+                print(f'MISMATCH: patch for {rev} does not apply')
+            total_full += len(new)
+            total_patch += len(delta)
+            print(f'{rev:>8} {len(new):>9} {len(delta):>6} {100 * len(delta) / len(new):>6.1f} '
+                  f'{frames(len(new)):>8} {frames(len(delta)):>9} {steps:>6} {elapsed * 1000:>8.1f}')
+    if total_full:
+        print(f'\n{"all":>8} {total_full:>9} {total_patch:>6} {100 * total_patch / total_full:>6.1f} '
+              f'{frames(total_full):>8} {frames(total_patch):>9}')
@@ -0,0 +1,340 @@
+'''
+Command pipeline benchmark: sustained rate and per-command latency.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.pipeline [--rates 250,500,1000,2000,4000]
+                [--seconds 2] [--samples 200] [--out pipeline.json]
+
+The real i2c_server main loop runs in a thread (see hostsim), and the
+benchmark plays master through the simulated bus.
+
+Rate sweep: 8-byte pings are written at each of --rates commands/s,
+while a reader thread empties the slave buffer at bus pace (one
+16-byte read per --read-us).  For each rate we record frames lost
+(slave-side overruns, PendingDataIn drops and anything never processed),
+PendingDataIn high water and out-queue growth.  The slave hardware
+only holds so many unfetched writes: --slave-fifo models that
+(0 for unlimited).
+
+Latency: one command at a time, the time from the master's write to
+its response being available in the slave buffer or, for commands
+that don't reply (VA, FW), to the handler being done.  EI is
+timed without an experiment having run, so replies NOXP.
+
+Results, along with the version and relevant settings, go to a
+JSON file so runs can be compared between releases.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import contextlib
+import json
+import os
+import platform
+import threading
+import time
+
+from hostsim import HostHarness
+
+ResultsFormat = 1
+
+# one 16 byte read, address byte included, at 100kHz
+ReadTimeUs = int((1 + 16) * 9 * 1e6 / 100000)
+
+# variables used for the file commands
+PathVariable = 21
+ScratchVariable = 20
+ChunkSize = 7
+
+def op(cmd:str) -> int:
+    return sum(ord(c) for c in cmd)
+
+class Master:
+    def __init__(self, harness:HostHarness):
+        import machine
+        from spasic.i2c.device_sim import i2cslave
+        import spasic.cnc.dispatch as dispatch
+        self.harness = harness
+        self.slave = i2cslave
+        self.dispatch = dispatch
+        self.bus = machine.I2C(0)
+        self.addr = i2cslave.addr
+        self.readbuf = bytearray(16)
+        self.bytes_read = 0
+
+    def available(self):
+        return self.slave._out_len - self.slave._out_idx
+
+    def read(self):
+        avail = self.available()
+        if avail <= 0:
+            return 0
+        self.bus.readfrom_into(self.addr, self.readbuf)
+        n = avail if avail < 16 else 16
+        self.bytes_read += n
+        return n
+
+    def queued(self):
+        return self.harness.server.out_queue_length()
+
+    def drain(self, timeout:float=2.0):
+        '''
+            Read until the slave buffer and the out queues
+            have stayed empty for a couple of ms.
+        '''
+        t_end = time.perf_counter() + timeout
+        t_quiet = None
+        while time.perf_counter() < t_end:
+            if self.read() or self.queued() or self.slave.have_pending_data():
+                t_quiet = None
+            elif t_quiet is None:
+                t_quiet = time.perf_counter()
+            elif time.perf_counter() - t_quiet > 0.002:
+                return True
+            time.sleep(0)
+        return False
+
+    def command(self, frame:bytes):
+        # setup commands: send, let it be handled and toss the reply
+        self.bus.writeto(self.addr, frame)
+        self.harness.wait_idle()
+        self.drain()
+
+    def timed(self, frame:bytes, replies:bool, timeout:float=0.5):
+        '''
+            Seconds from write to reply available (or handler
+            done, for commands that don't reply), None on timeout
+        '''
+        self.drain()
+        opcode = frame[0]
+        count = self.dispatch.CallCount[opcode]
+        t_start = time.perf_counter()
+        self.bus.writeto(self.addr, frame)
+        while True:
+            if replies:
+                if self.available() > 0:
+                    break
+            elif self.dispatch.CallCount[opcode] != count:
+                break
+            if time.perf_counter() - t_start > timeout:
+                return None
+            time.sleep(0)
+        elapsed = time.perf_counter() - t_start
+        self.drain()
+        return elapsed
+
+
+def run_rate(master:Master, rate:int, seconds:float, slave_fifo:int, read_us:int):
+    glb = master.harness.globals
+    ring = glb.PendingDataIn
+    slave = master.slave
+    master.drain()
+    ring.reset_stats()
+    discarded = glb.PendingDataOut.bytes_discarded + glb.PendingTelemetryOut.bytes_discarded
+    bytes_read = master.bytes_read
+
+    stop = threading.Event()
+    def reader():
+        while not stop.is_set():
+            master.read()
+            time.sleep(read_us / 1e6)
+    rthread = threading.Thread(target=reader, daemon=True)
+    rthread.start()
+
+    frame = bytearray(b'P\x00\x00PNG\x00\x00')
+    sent = 0
+    overruns = 0
+    backlog_max = 0
+    outq_max = 0
+    t_start = time.perf_counter()
+    t_end = t_start + seconds
+    now = t_start
+    while now < t_end:
+        due = int((now - t_start) * rate) - sent - overruns
+        for _i in range(due):
+            if slave_fifo and len(slave._data_in) >= slave_fifo:
+                overruns += 1
+                continue
+            frame[1:3] = (sent % 0x10000).to_bytes(2, 'little')
+            master.bus.writeto(master.addr, frame)
+            sent += 1
+        backlog = len(slave._data_in)
+        if backlog > backlog_max:
+            backlog_max = backlog
+        outq = master.queued()
+        if outq > outq_max:
+            outq_max = outq
+        time.sleep(0.0002)
+        now = time.perf_counter()
+
+    elapsed = now - t_start
+    # give the server a moment to catch up on what it was sent
+    master.harness.wait_idle(1.0)
+    stop.set()
+    rthread.join()
+    outq_end = master.queued()
+    unprocessed = sent - ring.received
+    master.drain()
+
+    return {
+        'rate': rate,
+        'sent': sent,
+        'processed_per_s': round(ring.received / elapsed, 1),
+        'lost': overruns + ring.dropped + unprocessed,
+        'slave_overruns': overruns,
+        'ring_dropped': ring.dropped,
+        'ring_high_water': ring.high_water,
+        'unprocessed': unprocessed,
+        'slave_backlog_max': backlog_max,
+        'outq_max_bytes': outq_max,
+        'outq_end_bytes': outq_end,
+        'tx_discarded_bytes': glb.PendingDataOut.bytes_discarded +
+                            glb.PendingTelemetryOut.bytes_discarded - discarded,
+        'bytes_read': master.bytes_read - bytes_read,
+    }
+
+def set_variable(master:Master, vid:int, value:bytes):
+    master.command(bytes([op('VS'), vid]) + value[:6])
+    for i in range(6, len(value), 6):
+        master.command(bytes([op('VA'), vid]) + value[i:i + 6])
+
+def percentile(values, pct:float):
+    return values[int(round(pct / 100.0 * (len(values) - 1)))]
+
+def summarize(latencies, timeouts:int, opcode:int, dispatch):
+    us = sorted(int(t * 1e6) for t in latencies)
+    stats = dispatch.stats(opcode)
+    summary = {
+        'samples': len(us),
+        'timeouts': timeouts,
+        'handler_avg_us': stats[2],
+        'handler_max_us': stats[3],
+    }
+    if len(us):
+        summary.update({
+            'min_us': us[0],
+            'p50_us': percentile(us, 50),
+            'p99_us': percentile(us, 99),
+            'max_us': us[-1],
+            'mean_us': sum(us) // len(us),
+        })
+    return summary
+
+def run_latency(master:Master, samples:int):
+    dispatch = master.dispatch
+
+    def ping(i):
+        return bytes([ord('P')]) + (i % 0x10000).to_bytes(2, 'little') + b'PNG'
+
+    # (name, frame for sample i, replies, setup frames, teardown frames)
+    cases = [
+        ('P', ping, True, [], []),
+        ('S', lambda i: b'S', True, [], []),
+        ('EI', lambda i: bytes([op('EI')]), True, [], []),
+        ('VS', lambda i: bytes([op('VS'), ScratchVariable]) + b'vsbnch', True, [], []),
+        ('VA', lambda i: bytes([op('VA'), ScratchVariable]) + b'vabnch', False, [], []),
+        ('FW', lambda i: bytes([op('FW')]) + bytes([i % 256] * ChunkSize), False,
+            [b'FO' + bytes([PathVariable, ord('W')])], [bytes([op('FC')])]),
+        ('FR', lambda i: bytes([op('FR'), ChunkSize]), True,
+            [b'FO' + bytes([PathVariable, ord('R')])], [bytes([op('FC')])]),
+    ]
+
+    # lands in the harness' temporary root
+    set_variable(master, PathVariable, b'/pipeline.bin')
+    results = dict()
+    for (name, frame, replies, setup, teardown) in cases:
+        for cmd in setup:
+            master.command(cmd)
+        dispatch.reset_stats()
+        latencies = []
+        timeouts = 0
+        for i in range(samples):
+            t = master.timed(frame(i), replies)
+            if t is None:
+                timeouts += 1
+            else:
+                latencies.append(t)
+        results[name] = summarize(latencies, timeouts, op(name), dispatch)
+        for cmd in teardown:
+            master.command(cmd)
+
+    return results
+
+def describe_build(harness:HostHarness):
+    import spasic.ver as ver
+    sts = harness.server.sts
+    settings = dict()
+    for name in ['I2CInFrameRingDepth', 'I2CTxArenaSize', 'I2CTxTelemetryArenaSize',
+                 'I2CTxTelemetryMaxFrames', 'MainLoopSleepMinMs', 'MainLoopSleepMaxMs',
+                 'MainLoopIdleBackoffMs', 'MainLoopWakeCheckMs']:
+        settings[name] = getattr(sts, name, None)
+    return {
+        'format': ResultsFormat,
+        'version': f'{ver.major}.{ver.minor}.{ver.patch}',
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+    }
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Command pipeline benchmark")
+    parser.add_argument('--rates', type=str, default='250,500,1000,2000,4000',
+                        help='comma separated commands/second to sweep through')
+    parser.add_argument('--seconds', type=float, default=2.0, help='time spent at each rate')
+    parser.add_argument('--samples', type=int, default=200, help='latency samples per command')
+    parser.add_argument('--slave-fifo', type=int, default=4,
+                        help='unfetched writes the slave can hold, 0 for unlimited')
+    parser.add_argument('--read-us', type=int, default=ReadTimeUs,
+                        help='time between master reads during the sweep')
+    parser.add_argument('--out', type=str, default='pipeline.json', help='results file')
+    parser.add_argument('--verbose', action='store_true', help="don't hide server output")
+    return parser.parse_args()
+
+def main():
+    args = getArgs()
+    rates = [int(r) for r in args.rates.split(',') if len(r.strip())]
+
+    quiet = open(os.devnull, 'w')
+    redirect = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(quiet)
+    harness = HostHarness()
+    with redirect, harness:
+        master = Master(harness)
+        results = describe_build(harness)
+        results['args'] = vars(args)
+        results['rates'] = [run_rate(master, rate, args.seconds, args.slave_fifo, args.read_us)
+                            for rate in rates]
+        results['latency'] = run_latency(master, args.samples)
+    quiet.close()
+
+    if harness.error is not None:
+        raise harness.error
+
+    sustained = 0
+    for r in results['rates']:
+        if r['lost']:
+            break
+        sustained = r['rate']
+    results['sustained_rate'] = sustained
+
+    print(f"{'rate':>6} {'proc/s':>8} {'lost':>6} {'ovr':>5} {'drop':>5} {'hiwat':>5} {'backlog':>7} {'outq max':>8} {'outq end':>8}")
+    for r in results['rates']:
+        print(f"{r['rate']:6} {r['processed_per_s']:8} {r['lost']:6} {r['slave_overruns']:5} {r['ring_dropped']:5} "
+              f"{r['ring_high_water']:5} {r['slave_backlog_max']:7} {r['outq_max_bytes']:8} {r['outq_end_bytes']:8}")
+    print(f"sustained without loss: {sustained} commands/s\n")
+
+    print(f"{'cmd':>4} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'handler':>8} {'t/o':>4}")
+    for (name, lat) in results['latency'].items():
+        if not lat['samples']:
+            print(f"{name:>4} {'-':>8} {'-':>8} {'-':>8} {lat['handler_avg_us']:8} {lat['timeouts']:4}")
+            continue
+        print(f"{name:>4} {lat['p50_us']:8} {lat['p99_us']:8} {lat['max_us']:8} {lat['handler_avg_us']:8} {lat['timeouts']:4}")
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+'''
+Reply latency under telemetry load.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.reply_latency [--replies 200] [--telemetry 2]
+
+The simulated master does one 16-byte read per tick.  Every tick, 
+--telemetry background reports (unkeyed, so they don't coalesce, 
+like a chatty experiment would produce) get queued, which is more than 
+the bus can carry. Every so often a command reply is queued too, and 
+we count how many reads it takes before the master has all of it.
+
+Compared: everything in a single FIFO, as before, and replies in 
+their own lane ahead of telemetry.  Bus time assumes 100kHz, 
+~(1 + 16) bytes * 9 bits per read.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import random
+
+from spasic.i2c.device_sim import I2CDevice, i2cslave
+from spasic.i2c.tx_arena import TxArena
+import spasic.cnc.response.response as rsp
+
+ReadTimeMs = (1 + 16) * 9 / 100.0
+
+def run(num_replies:int, telemetry_per_tick:int, lanes:bool):
+    random.seed(1)
+    hi = TxArena(1024)
+    lo = TxArena(256, max_frames=32)
+    dev = I2CDevice(txqueue=hi, txqueue_low=lo)
+    dev.begin()
+    telemetry = lo if lanes else hi
+    
+    readbuf = bytearray(16)
+    received = bytearray()
+    waiting = [] # (marker, tick queued)
+    latencies = []
+    lost = 0
+    tick = 0
+    seq = 0
+    
+    while len(latencies) + lost < num_replies:
+        tick += 1
+        for i in range(telemetry_per_tick):
+            telemetry.put(rsp.ResponseExperiment(3, False, 0, bytearray([0xee]*8)))
+            
+        if not waiting and random.random() < 0.1:
+            seq += 1
+            marker = b'R' + seq.to_bytes(2, 'little')
+            if hi.put(rsp.ResponseOKMessage(marker)):
+                waiting.append((bytes(rsp.ResponseOKMessage(marker).bytes), tick))
+            else:
+                lost += 1
+            
+        dev.queue_outdata()
+        # reads past the end of the slave buffer are padding, skip it
+        avail = i2cslave._out_len - i2cslave._out_idx
+        i2cslave.master_request_into(readbuf)
+        received += readbuf[:avail if avail < 16 else 16]
+        dev.push_outgoing_data()
+        
+        if waiting:
+            (expected, t_queued) = waiting[0]
+            if received.find(expected) >= 0:
+                latencies.append(tick - t_queued)
+                waiting.pop(0)
+                received = bytearray()
+        if len(received) > 4096:
+            received = received[-64:]
+        
+    latencies.sort()
+    return (latencies, lost, hi.bytes_discarded + lo.bytes_discarded)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Reply latency under telemetry load")
+    parser.add_argument('--replies', type=int, default=200, help='number of command replies to time')
+    parser.add_argument('--telemetry', type=int, default=2, help='telemetry reports queued per master read')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    print(f'{"queueing":>10} {"avg reads":>10} {"p50":>6} {"p95":>6} {"max":>6} {"avg ms":>8} {"lost":>5} {"discarded":>10}')
+    for (name, lanes) in [('fifo', False), ('lanes', True)]:
+        (lat, lost, discarded) = run(args.replies, args.telemetry, lanes)
+        if not len(lat):
+            print(f'{name:>10} no replies made it through, {lost} lost')
+            continue
+        avg = sum(lat) / len(lat)
+        p50 = lat[len(lat) // 2]
+        p95 = lat[(len(lat) * 95) // 100]
+        print(f'{name:>10} {avg:>10.1f} {p50:>6} {p95:>6} {lat[-1]:>6} {avg * ReadTimeMs:>8.1f} {lost:>5} {discarded:>10}')
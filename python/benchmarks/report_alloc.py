@@ -0,0 +1,99 @@
+'''
+Auto-report allocation benchmark: Response objects vs writers.
+
+An auto-report used to be a new Response, its payload bytearray built
+up by append() calls, every MinDelayForAutoReportSecs for as long as
+the board runs.  The writers in spasic.cnc.response.writers hold the
+fields and write them straight into the arena.  Both are timed and
+measured here including construction, the way the main loop queues
+them: status, experiment and info, in turn, keyed into the telemetry
+arena.
+
+Run from the spasics/python directory, under CPython
+
+  python -m benchmarks.report_alloc
+
+or copied over to a board and imported under micropython, where the
+GC is disabled for the duration so the gc.mem_alloc() delta is every
+byte allocated, and the writers should come in at 0.  Under CPython, 
+tracemalloc's transient peak is what's comparable, though the 
+interpreter's own ints and frames show up in both.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import gc
+import time
+from spasic.i2c.tx_arena import TxArena, ReportStatus, ReportExperiment, ReportInfo
+import spasic.cnc.response.response as rsp
+import spasic.cnc.response.writers as wr
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+NumReports = 20000
+
+Result = bytearray(b'\x01\x02\x03\x04\x05\x06\x07\x08')
+Info = wr.InfoWriter(1, 1, 0, '')
+
+def responses(arena:TxArena, i:int):
+    kind = i % 3
+    if kind == 0:
+        arena.put(rsp.ResponseStatus(True, 3, 0, i, Result), ReportStatus)
+    elif kind == 1:
+        arena.put(rsp.ResponseExperiment(3, False, 0, Result), ReportExperiment)
+    else:
+        arena.put(rsp.ResponseInfo(1, 1, 0, '', i, i), ReportInfo)
+
+def writers(arena:TxArena, i:int):
+    kind = i % 3
+    if kind == 0:
+        arena.put(wr.status(True, 3, 0, i, Result), ReportStatus)
+    elif kind == 1:
+        arena.put(wr.experiment(3, False, 0, Result), ReportExperiment)
+    else:
+        arena.put(Info.set(i, i), ReportInfo)
+
+def measure(queue_report):
+    arena = TxArena(256, max_frames=32)
+    for i in range(50):
+        queue_report(arena, i)
+
+    gc.collect()
+    t_start = time.ticks_us() if hasattr(time, 'ticks_us') else None
+    if hasattr(gc, 'mem_alloc'):
+        gc.disable()
+        start = gc.mem_alloc()
+        for i in range(NumReports):
+            queue_report(arena, i)
+        allocated = gc.mem_alloc() - start
+        gc.enable()
+        elapsed_us = time.ticks_diff(time.ticks_us(), t_start)
+        return (allocated / NumReports, None, elapsed_us / NumReports)
+
+    t_start = time.perf_counter()
+    for i in range(NumReports):
+        queue_report(arena, i)
+    elapsed_us = (time.perf_counter() - t_start) * 1e6
+
+    tracemalloc.start()
+    start, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for i in range(NumReports):
+        queue_report(arena, i)
+    end, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ((end - start) / NumReports, peak - start, elapsed_us / NumReports)
+
+def run():
+    for (name, queue_report) in [('Response', responses), ('writers', writers)]:
+        (per_report, peak, us) = measure(queue_report)
+        if peak is None:
+            print(f'{name:>8}: {per_report:.1f} bytes allocated per report, {us:.1f}us')
+        else:
+            print(f'{name:>8}: {per_report:.2f} bytes heap growth per report, transient peak {peak} bytes, {us:.2f}us')
+
+if __name__ == '__main__':
+    run()
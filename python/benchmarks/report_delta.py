@@ -0,0 +1,106 @@
+'''
+Downlink bytes for auto-reports, in full vs as deltas, on recorded telemetry.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.report_delta [--keyframes 4,8,16] [FILE.csv ...]
+
+defaulting to the raw telemetry CSVs in doc/responses, i.e. what came
+down while the request schedules in doc/requested were being run.
+Every status, experiment and info report in there goes through the
+server's DeltaReports, in the order received, and what it would have
+queued is fed to a ground ResponseDecoder, which has to rebuild the
+very same report, or this complains.
+
+Command replies can't be told apart from auto-reports in a recording,
+so they're counted as reports too.  Every report is taken to have made
+it down: no slot superseding, no loss.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import csv
+import glob
+import os
+
+from spasic.cnc.response.decoder import ResponseDecoder
+from spasic.cnc.response.delta import DeltaReports
+import spasic.i2c.tx_arena as txa
+
+DefaultGlob = os.path.join(os.path.dirname(__file__), '..', '..', 'doc', 'responses', '*.csv')
+PayloadColumns = ['payload', 'telemetry', 'I2C_EXPS_STATUS_6']
+
+ReportKeys = {0x07: txa.ReportStatus, 0x09: txa.ReportExperiment, ord('I'): txa.ReportInfo}
+
+def load_reports(paths):
+    '''
+        (unix time, report) for every auto-report kind of
+        response in the recordings, and the hours they cover
+    '''
+    reports = []
+    hours = 0
+    for path in paths:
+        with open(path) as f:
+            reader = csv.DictReader(f, delimiter=',', quotechar='"')
+            if reader.fieldnames is None or 'timestampUnix' not in reader.fieldnames:
+                continue
+            column = None
+            for cname in PayloadColumns:
+                if cname in reader.fieldnames:
+                    column = cname
+            if column is None:
+                continue
+            decoder = ResponseDecoder()
+            times = []
+            for row in reader:
+                try:
+                    decoder.feed(bytes.fromhex(row[column]))
+                except (ValueError, TypeError):
+                    continue
+                times.append(int(row['timestampUnix']))
+                for r in decoder.responses():
+                    if r.Header[0] in ReportKeys:
+                        reports.append((times[-1], r))
+            if len(times):
+                hours += (max(times) - min(times)) / 3600
+    return (reports, hours)
+
+def replay(reports, keyframes:int):
+    deltas = DeltaReports(txa.NumReportKeys, keyframes)
+    ground = ResponseDecoder()
+    sent_bytes = 0
+    mismatches = 0
+    for (_t, report) in reports:
+        out = deltas.report(ReportKeys[report.Header[0]], report)
+        buf = bytearray(len(out))
+        out.encode_into(buf, 0)
+        sent_bytes += len(buf)
+        # one at a time: a status runs to the end of what's fed
+        ground.feed(buf)
+        ground.flush()
+        rebuilt = ground.responses()
+        if len(rebuilt) != 1 or bytes(rebuilt[0].bytes) != bytes(report.bytes):
+            mismatches += 1
+    return (sent_bytes, deltas, ground, mismatches)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Auto-report deltas on recorded telemetry")
+    parser.add_argument('files', nargs='*', help='telemetry CSVs (default: doc/responses)')
+    parser.add_argument('--keyframes', type=str, default='4,8,16', help='one full report in this many, to try')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    files = args.files if len(args.files) else sorted(glob.glob(DefaultGlob))
+    (reports, hours) = load_reports(files)
+    if not len(reports):
+        raise SystemExit('no reports found')
+    full = sum(len(r) for (_t, r) in reports)
+    print(f'{len(reports)} reports over {hours:.1f}h, from {len(files)} files')
+    print(f'\n{"keyframes":>9} {"bytes":>7} {"B/hour":>7} {"saved %":>7} {"deltas":>6} {"rebuilt":>7} {"mismatch":>8}')
+    print(f'{"full":>9} {full:>7} {full / hours:>7.0f} {0:>7.1f} {0:>6} {"-":>7} {"-":>8}')
+    for keyframes in [int(k) for k in args.keyframes.split(',')]:
+        (sent, deltas, ground, mismatches) = replay(reports, keyframes)
+        print(f'{keyframes:>9} {sent:>7} {sent / hours:>7.0f} {100 * (full - sent) / full:>7.1f} '
+              f'{deltas.deltas:>6} {ground.deltas:>7} {mismatches:>8}')
@@ -0,0 +1,178 @@
+'''
+Response parsing rate, on telemetry received from orbit.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.response_parse [--repeat 5] [FILE.csv ...]
+
+defaulting to the raw telemetry CSVs in doc/responses.  Each row's
+packet is appended to a byte stream and parsed until nothing more
+comes out, the way parse_telemetry used to do it.
+
+The old ResponseFactory built a prototype of every Response class for
+each packet and tried parseFrom() on each in turn, with ValueError
+as the signal to move on.  It's reproduced here as LegacyFactory; the
+current one goes by header straight to the right class.  Both have to
+come up with the same responses, or this complains.
+
+Last row is the ResponseDecoder, which parse_telemetry and the client
+now use: packets are fed in and it picks up where it left off, rather
+than starting over from the top of the stream each time.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import contextlib
+import csv
+import glob
+import os
+import time
+
+from spasic.cnc.response.response import *
+from spasic.cnc.response.decoder import ResponseDecoder
+
+DefaultGlob = os.path.join(os.path.dirname(__file__), '..', '..', 'doc', 'responses', '*.csv')
+PayloadColumns = ['payload', 'telemetry', 'I2C_EXPS_STATUS_6']
+
+class IncomingDataStream:
+    # the container the client used to parse from
+    def __init__(self):
+        self._data = bytearray()
+
+    def clone(self):
+        return bytearray(self._data)
+
+    def extend(self, withdata:bytearray):
+        self._data.extend(withdata)
+
+    def consume(self, length:int):
+        del self._data[:length]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+class LegacyFactory:
+    @classmethod
+    def candidates(cls):
+        return [
+                ResponseOK(),
+                ResponseOKMessage(b''),
+                ResponseBatch(0),
+                ResponseDataBytes(b''),
+                ResponseError(0, b''),
+                ResponseExperiment(0, False, 0, b''),
+                ResponseFile(b''),
+                ResponseInfo(0,0,0,'', 0, 0),
+                ResponseMetrics(0),
+                ResponseStatus(False, 0, 0, 0),
+                ResponseVariableValue(0, b'')
+            ]
+
+    @classmethod
+    def constructFrom(cls, blk):
+        if not len(blk):
+            return None
+        idx = 0
+        while idx < len(blk) and blk[idx] == 0:
+            idx += 1
+        if idx:
+            blk.consume(idx)
+        if not len(blk):
+            return None
+        for rt in cls.candidates():
+            try:
+                rt.parseFrom(blk)
+                blk.consume(len(rt))
+                return rt
+            except (ValueError, IndexError):
+                pass
+        if len(blk) > 16:
+            blk.consume(1)
+        return None
+
+def load_packets(paths):
+    packets = []
+    for path in paths:
+        with open(path) as f:
+            reader = csv.DictReader(f, delimiter=',', quotechar='"')
+            if reader.fieldnames is None:
+                continue
+            column = None
+            for cname in PayloadColumns:
+                if cname in reader.fieldnames:
+                    column = cname
+            if column is None:
+                # not raw telemetry (e.g. already parsed)
+                continue
+            for row in reader:
+                try:
+                    packets.append(bytes.fromhex(row[column]))
+                except (ValueError, TypeError):
+                    pass
+    return packets
+
+def parse_all(factory, packets):
+    stream = IncomingDataStream()
+    parsed = []
+    for pkt in packets:
+        stream.extend(pkt)
+        while True:
+            r = factory.constructFrom(stream)
+            if r is None:
+                break
+            parsed.append(r)
+    return parsed
+
+def decode_all(_factory, packets):
+    decoder = ResponseDecoder()
+    parsed = []
+    for pkt in packets:
+        decoder.feed(pkt)
+        decoder.end_transfer()
+        parsed.extend(decoder.responses())
+    decoder.flush()
+    parsed.extend(decoder.responses())
+    return parsed
+
+def run(factory, packets, repeat:int, parser=parse_all):
+    best = None
+    for _i in range(repeat):
+        # resync chatter would swamp the timing
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            t_start = time.perf_counter()
+            parsed = parser(factory, packets)
+            elapsed = time.perf_counter() - t_start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (parsed, best)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Response parsing benchmark")
+    parser.add_argument('files', nargs='*', help='telemetry CSVs (default: doc/responses)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per parser, best is kept')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    files = args.files if len(args.files) else sorted(glob.glob(DefaultGlob))
+    packets = load_packets(files)
+    print(f'{len(packets)} packets from {len(files)} files')
+
+    results = []
+    for (name, factory, parser) in [('legacy', LegacyFactory, parse_all), 
+                                    ('indexed', ResponseFactory, parse_all),
+                                    ('stream', None, decode_all)]:
+        (parsed, elapsed) = run(factory, packets, args.repeat, parser)
+        results.append(parsed)
+        print(f'{name:>8}: {len(parsed)} responses, {len(packets) / elapsed:10.0f} packets/s')
+
+    legacy = results[0]
+    for (name, parsed) in [('indexed', results[1]), ('stream', results[2])]:
+        same = len(legacy) == len(parsed) and all(
+            a.__class__ is b.__class__ and a.bytes == b.bytes for (a, b) in zip(legacy, parsed))
+        if not same:
+            print(f'MISMATCH: {name} disagrees with legacy')
@@ -0,0 +1,130 @@
+'''
+Outbound response path allocation benchmark.
+
+Compares the old path (Response.bytes into a list, concatenated into 
+out_data, appended to the device's bytearray queue and sliced off 112 
+bytes at a time) with responses encoded straight into the TxArena and 
+handed to the slave as memoryviews.  The responses are built once, up 
+front: only what it takes to get them from the queue, through the 
+arena, to the slave is measured.
+
+Run from the spasics/python directory, under CPython 
+
+  python -m benchmarks.tx_alloc
+
+or copied over to a board and imported under micropython.
+
+Under micropython the GC is disabled for the duration, so the gc.mem_alloc() 
+delta is every byte allocated.  CPython frees through refcounting as it goes, 
+and boxes its ints, so there only the heap growth per steady-state response
+is comparable: the blocks (and bytes) a tracemalloc snapshot diff finds 
+still allocated at the end.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import gc
+from spasic.i2c.device_sim import I2CDevice, i2cslave
+from spasic.i2c.tx_arena import TxArena
+import spasic.cnc.response.response as rsp
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+NumResponses = 20000
+SlaveBufferSize = 16*7
+
+Payload = bytearray(b'\x01\x02\x03\x04\x05\x06\x07\x08')
+
+Responses = [
+    rsp.ResponseStatus(True, 3, 0, 1234, Payload),
+    rsp.ResponseExperiment(3, False, 0, Payload[:4]),
+    rsp.ResponseOKMessage(b'EXP\x03\x00'),
+    rsp.ResponseInfo(1, 1, 0, '', 123456, 654321),
+]
+
+MasterBuf = bytearray(16)
+
+def master_drain(dev):
+    # read everything out, like the master would
+    while True:
+        dev.push_outgoing_data()
+        if not dev.outdata_queue_size and i2cslave._out_idx >= i2cslave._out_len:
+            return
+        i2cslave.master_request_into(MasterBuf)
+
+class LegacyPath:
+    def __init__(self):
+        self.pending = []
+        self.dataqueue = bytearray()
+        
+    def send(self, response):
+        self.pending.append(response.bytes)
+        out_data = bytearray()
+        for outbytes in self.pending:
+            out_data += outbytes
+        self.pending = []
+        self.dataqueue += out_data
+        while len(self.dataqueue):
+            if len(self.dataqueue) > SlaveBufferSize:
+                to_send = self.dataqueue[:SlaveBufferSize]
+                self.dataqueue = self.dataqueue[SlaveBufferSize:]
+            else:
+                to_send = self.dataqueue
+                self.dataqueue = bytearray()
+            i2cslave.write_bytes(len(to_send), to_send)
+            while i2cslave._out_idx < i2cslave._out_len:
+                i2cslave.master_request_into(MasterBuf)
+        
+class ArenaPath:
+    def __init__(self):
+        self.arena = TxArena(1024)
+        self.dev = I2CDevice(txqueue=self.arena)
+        self.dev.begin()
+        
+    def send(self, response):
+        self.arena.put(response)
+        self.dev.queue_outdata()
+        master_drain(self.dev)
+
+def measure(path):
+    # warm up, so any lazy allocations are out of the way (the 
+    # arena's staging buffer only gets made once it wraps around)
+    for i in range(200):
+        path.send(Responses[i % len(Responses)])
+    
+    gc.collect()
+    if hasattr(gc, 'mem_alloc'):
+        # micropython: nothing gets freed while disabled
+        gc.disable()
+        start = gc.mem_alloc()
+        for i in range(NumResponses):
+            path.send(Responses[i % len(Responses)])
+        allocated = gc.mem_alloc() - start
+        gc.enable()
+        return (allocated / NumResponses, None)
+    
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    for i in range(NumResponses):
+        path.send(Responses[i % len(Responses)])
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = end.filter_traces(ignore).compare_to(start.filter_traces(ignore), 'lineno')
+    blocks = sum([st.count_diff for st in stats])
+    size = sum([st.size_diff for st in stats])
+    return (size / NumResponses, blocks)
+
+def run():
+    for (name, path) in [('legacy', LegacyPath()), ('arena', ArenaPath())]:
+        (per_response, blocks) = measure(path)
+        if blocks is None:
+            print(f'{name:>8}: {per_response:.1f} bytes allocated per response')
+        else:
+            print(f'{name:>8}: heap grew {blocks} blocks over {NumResponses} responses, {per_response:.3f} bytes per response')
+
+if __name__ == '__main__':
+    run()
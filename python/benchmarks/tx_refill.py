@@ -0,0 +1,84 @@
+'''
+Slave buffer refill cost against outbound backlog.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.tx_refill [--refills 20000]
+
+The old outbound queue was a bytearray, dequeued by slicing 112 bytes
+off the front, so every refill copied the whole remaining backlog.  The
+TxArena hands the chunk out as a memoryview and just moves its read
+cursor.  For each backlog size, the queue is kept topped up (one 112 byte
+write per refill) and we time the refills: the arena's cost per refill
+should stay flat as the backlog grows (under CPython, slicing is a 
+memcpy and only shows past a few hundred kB: on the RP2040 it's far
+slower per byte).
+
+The second table fills a small arena with the telemetry drop policies, to
+show what's kept when the master has been away: DropNewest keeps the
+oldest responses, DropOldest the latest.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import time
+
+from spasic.i2c.device_sim import i2cslave
+from spasic.i2c.tx_arena import TxArena, DropNewest, DropOldest
+import spasic.cnc.response.response as rsp
+
+SlaveBufferSize = 16*7
+Backlogs = [SlaveBufferSize, 1024, 16384, 262144, 1048576]
+
+def run_legacy(backlog:int, refills:int):
+    chunk = bytearray(SlaveBufferSize)
+    queue = bytearray(backlog)
+    t_start = time.perf_counter()
+    for _i in range(refills):
+        to_send = queue[:SlaveBufferSize]
+        queue = queue[SlaveBufferSize:]
+        i2cslave.write_bytes(len(to_send), to_send)
+        queue += chunk
+    return (time.perf_counter() - t_start) * 1e6 / refills
+
+def run_arena(backlog:int, refills:int):
+    chunk = bytearray(SlaveBufferSize)
+    arena = TxArena(backlog + SlaveBufferSize)
+    arena.write(bytearray(backlog))
+    t_start = time.perf_counter()
+    for _i in range(refills):
+        to_send = arena.peek_chunk(SlaveBufferSize)
+        i2cslave.write_bytes(len(to_send), to_send)
+        arena.consume(len(to_send))
+        arena.write(chunk)
+    return (time.perf_counter() - t_start) * 1e6 / refills
+
+def run_policy(policy:int, num_responses:int):
+    arena = TxArena(256, max_frames=32, drop_policy=policy)
+    for i in range(num_responses):
+        response = rsp.ResponseExperiment(3, False, 0, i.to_bytes(4, 'little'))
+        arena.put(response)
+    # first and last result still queued
+    first = int.from_bytes(arena.peek_chunk(16)[5:9], 'little')
+    arena.consume(len(arena) - len(response))
+    last = int.from_bytes(arena.peek_chunk(16)[5:9], 'little')
+    return (first, last, arena.bytes_discarded, arena.responses_evicted)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Slave buffer refill benchmark")
+    parser.add_argument('--refills', type=int, default=20000, help='refills timed per backlog size')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    print(f'{"backlog":>8} {"slicing us":>11} {"arena us":>9}')
+    for backlog in Backlogs:
+        legacy = run_legacy(backlog, args.refills)
+        arena = run_arena(backlog, args.refills)
+        print(f'{backlog:>8} {legacy:>11.2f} {arena:>9.2f}')
+
+    print(f'\n{"policy":>10} {"oldest kept":>11} {"newest kept":>11} {"discarded":>9} {"evicted":>7}')
+    for (name, policy) in [('newest', DropNewest), ('oldest', DropOldest)]:
+        (first, last, discarded, evicted) = run_policy(policy, 100)
+        print(f'{name:>10} {first:>11} {last:>11} {discarded:>9} {evicted:>7}')
@@ -0,0 +1,65 @@
+'''
+Empty master reads, with and without double-buffered transmit staging.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.tx_staging [--kbytes 32]
+
+The simulated master does back-to-back 16-byte reads, while the "main
+loop" only gets around to servicing the device every --loop-reads reads
+(the slave buffer holds 7 reads' worth).  Replies are kept queued the
+whole time, so any read that comes back empty is a wasted bus transaction.
+
+Without staging, the next chunk is only gathered on the main loop pass
+after the slave buffer ran dry.  With it, the next chunk is ready and
+goes in from the tx done callback itself.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+
+from spasic.i2c.device_sim import I2CDevice, i2cslave
+from spasic.i2c.tx_arena import TxArena
+import spasic.cnc.response.response as rsp
+
+def run(total_bytes:int, loop_reads:int, double_buffer:bool):
+    hi = TxArena(1024)
+    dev = I2CDevice(txqueue=hi, txqueue_low=TxArena(256, max_frames=32),
+                    double_buffer=double_buffer)
+    dev.begin()
+
+    response = rsp.ResponseExperiment(3, False, 0, bytearray(b'\x01\x02\x03\x04\x05\x06\x07\x08'))
+    readbuf = bytearray(16)
+    reads_start = i2cslave.reads
+    empty_start = i2cslave.empty_reads
+    delivered = 0
+    tick = 0
+    while delivered < total_bytes:
+        if tick % loop_reads == 0:
+            # main loop pass: keep replies queued, service the device
+            while hi.free > len(response):
+                hi.put(response)
+            dev.push_outgoing_data()
+            dev.queue_outdata()
+        tick += 1
+        avail = i2cslave._out_len - i2cslave._out_idx
+        i2cslave.master_request_into(readbuf)
+        delivered += avail if avail < 16 else 16
+
+    return (i2cslave.reads - reads_start, i2cslave.empty_reads - empty_start,
+            delivered, dev.tx_swaps, dev.tx_underruns)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Transmit staging benchmark")
+    parser.add_argument('--kbytes', type=int, default=32, help='payload to deliver, per run')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    print(f'{"loop every":>10} {"staging":>8} {"reads":>7} {"empty":>7} {"empty/KB":>9} {"swaps":>6} {"underruns":>9}')
+    for loop_reads in [1, 3, 7, 10]:
+        for double_buffer in [False, True]:
+            (reads, empty, delivered, swaps, underruns) = run(args.kbytes * 1024, loop_reads, double_buffer)
+            per_kb = empty * 1024 / delivered
+            print(f'{loop_reads:>10} {"on" if double_buffer else "off":>8} {reads:>7} {empty:>7} {per_kb:>9.2f} {swaps:>6} {underruns:>9}')
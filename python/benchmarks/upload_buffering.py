@@ -0,0 +1,109 @@
+'''
+File uploads ('FW'), written straight through vs buffered a block at a time.
+
+Runs under CPython, from the spasics/python directory:
+
+  python -m benchmarks.upload_buffering [--size 16] [--block 4096]
+
+A --size KB upload goes through FSAccess the way 'FW' hands it over,
+7 bytes at a time, then gets closed: once unbuffered, once with the
+block sized write buffer.  The file underneath is a simulated flash
+file, worst case: no write cache of its own, so every write call that
+lands in a partly programmed block has that block copied to a freshly
+erased one (as a copy-on-write filesystem does without caching), and
+every block started is erased.  Flash time uses RP2040 QSPI flash
+figures, EraseMs per 4K sector and ProgramMs per 256 byte page.
+
+Rows give the write calls reaching the file, blocks erased, bytes
+programmed, the simulated flash time, and host time spent in
+FSAccess (i.e. not counting the flash).
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import random
+import time
+
+import hostsim
+hostsim.install()
+
+import spasic.fs.filesystem as filesystem
+from spasic.fs.filesystem import FSAccess
+
+EraseMs = 45.0
+ProgramMs = 0.4
+PageSize = 256
+
+class SimFlashFile:
+    def __init__(self, block_size:int):
+        self.block_size = block_size
+        self.data = bytearray()
+        self.writes = 0
+        self.erases = 0
+        self.programmed = 0
+
+    def write(self, bts):
+        n = len(bts)
+        self.writes += 1
+        pos = len(self.data)
+        tail = pos % self.block_size
+        remaining = n
+        if tail:
+            # partly used block: copied, with the new bytes, to a fresh one
+            first = min(remaining, self.block_size - tail)
+            self.erases += 1
+            self.programmed += tail + first
+            remaining -= first
+        while remaining > 0:
+            chunk = min(remaining, self.block_size)
+            self.erases += 1
+            self.programmed += chunk
+            remaining -= chunk
+        self.data += bts
+        return n
+
+    def close(self):
+        pass
+
+    @property
+    def flash_ms(self):
+        pages = (self.programmed + PageSize - 1) // PageSize
+        return self.erases * EraseMs + pages * ProgramMs
+
+def upload(data:bytes, block_size:int, buffer_size:int):
+    sim = SimFlashFile(block_size)
+    real_open = filesystem.__dict__.get('open')
+    filesystem.open = lambda _path, _mode: sim
+    try:
+        fs = FSAccess(None, buffer_size)
+        fs.open_for_write('/upload.bin')
+        t_start = time.perf_counter()
+        for i in range(0, len(data), 7):
+            fs.write_bytes(memoryview(data)[i:(i + 7)])
+        fs.close()
+        elapsed = time.perf_counter() - t_start
+    finally:
+        if real_open is None:
+            del filesystem.open
+        else:
+            filesystem.open = real_open
+    if bytes(sim.data) != data:
+        print('MISMATCH: file contents differ')
+    return (sim, elapsed)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Uploads, unbuffered vs block buffered")
+    parser.add_argument('--size', type=int, default=16, help='upload size, in KB')
+    parser.add_argument('--block', type=int, default=4096, help='filesystem block size')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    data = random.Random(1).randbytes(args.size * 1024)
+    print(f'{args.size}KB upload, {(len(data) + 6) // 7} FW payloads, {args.block} byte blocks\n')
+    print(f'{"mode":>10} {"writes":>7} {"erases":>7} {"programmed":>10} {"flash ms":>9} {"host ms":>8}')
+    for (name, buffer_size) in [('direct', 0), ('buffered', args.block)]:
+        (sim, elapsed) = upload(data, args.block, buffer_size)
+        print(f'{name:>10} {sim.writes:>7} {sim.erases:>7} {sim.programmed:>10} '
+              f'{sim.flash_ms:>9.0f} {elapsed * 1000:>8.1f}')
@@ -0,0 +1,195 @@
+'''
+Host (CPython) harness for the spasics I2C server.
+
+Lets i2c_server run, unmodified, on a regular Linux box: install() 
+provides stand-ins for the micropython-only modules (machine, 
+micropython, _thread and ttboard, with an inert DemoBoard) and the 
+micropython extras in time and gc, then HostHarness runs main_loop in 
+a thread against the simulated slave in spasic.i2c.device_sim.
+
+The extras time doesn't otherwise have (sleep_ms, ticks_ms...) are 
+added to it, for everyone.  What would change how CPython code 
+behaves -- an int time.time(), a gc with mem_free() and threshold() --
+is only what the server sees: it's imported inside server_imports(),
+which puts its time and gc in sys.modules for the duration, and 
+attach_server() binds them into its modules (ServerModules), along 
+with an os and open() that keep its files under a host directory.  
+detach_server() puts the real ones back.  Everything else, the 
+harness and benchmarks included, only ever sees the real modules.
+
+The master side is the regular satellite simulator: with these 
+stand-ins, machine.I2C is wired to the simulated slave, so
+
+  from hostsim import HostHarness
+  
+  with HostHarness() as h:
+      sim = h.master()
+      sim.ping()
+      sim.status()
+
+works the same as it would from a pico hooked up to the real thing.
+
+Run from the spasics/python directory. 
+
+  python -m hostsim
+
+does a quick round of commands.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import contextlib
+import os
+import sys
+import gc
+import time
+import types
+
+StandInsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upy')
+
+# what gc.mem_free() reports, roughly what's left on the RP2040 once running
+HostHeapFree = 100000
+
+# top level modules that get the server's view of time, gc and files
+ServerModules = ['main', 'i2c_server', 'i2c_server_globals', 'i2c_server_handlers', 
+                 'spasic', 'ttboard']
+
+_installed = False
+
+def _ticks_us():
+    return int(time.perf_counter() * 1000000) & 0x3fffffff
+
+def _ticks_ms():
+    return int(time.perf_counter() * 1000) & 0x3fffffff
+
+def _ticks_diff(a:int, b:int):
+    return ((a - b + 0x20000000) & 0x3fffffff) - 0x20000000
+
+def _ticks_add(a:int, b:int):
+    return (a + b) & 0x3fffffff
+
+_gc_threshold = -1
+def _gc_threshold_fn(amount:int=None):
+    global _gc_threshold
+    if amount is None:
+        return _gc_threshold 
+    _gc_threshold = amount
+
+def _server_view(module, name:str, extras:dict):
+    view = types.ModuleType(name)
+    view.__dict__.update(module.__dict__)
+    view.__dict__.update(extras)
+    return view
+
+_views = dict()
+_attached = []
+
+def _is_server(modname:str):
+    return modname.split('.')[0] in ServerModules
+
+def _rooted(root:str):
+    def path(p):
+        # the board's / is root, and there's no climbing out of it
+        return os.path.join(root, os.path.normpath('/' + p).lstrip('/'))
+    rooted_os = _server_view(os, 'os', {
+        'stat': lambda p: os.stat(path(p)),
+        'statvfs': lambda p: os.statvfs(path(p)),
+        'remove': lambda p: os.remove(path(p)),
+        'rename': lambda a, b: os.rename(path(a), path(b)),
+        'listdir': lambda p='/': os.listdir(path(p)),
+        'mkdir': lambda p: os.mkdir(path(p)),
+    })
+    return (rooted_os, lambda p, mode='r': open(path(p), mode))
+
+@contextlib.contextmanager
+def server_imports():
+    '''
+        Import the server inside this, so what it does as it 
+        loads (gc.threshold()...) runs against its time and gc.
+        Anything else that gets imported along the way keeps
+        the real ones.
+    '''
+    install()
+    saved = dict((name, sys.modules[name]) for name in _views)
+    before = set(sys.modules.keys())
+    sys.modules.update(_views)
+    try:
+        yield
+    finally:
+        sys.modules.update(saved)
+        for modname in set(sys.modules.keys()) - before:
+            if _is_server(modname):
+                continue
+            mod = sys.modules[modname]
+            for (name, view) in _views.items():
+                if getattr(mod, name, None) is view:
+                    setattr(mod, name, saved[name])
+
+def attach_server(root:str=None):
+    '''
+        Give the server modules loaded so far their time and gc and, 
+        with root, an os and open() that put the board's / there.
+        Undone by detach_server().
+    '''
+    install()
+    detach_server()
+    views = dict(_views)
+    rooted_open = None
+    if root is not None:
+        (views['os'], rooted_open) = _rooted(root)
+    for (modname, mod) in list(sys.modules.items()):
+        if mod is None or not _is_server(modname):
+            continue
+        for (name, view) in views.items():
+            real = sys.modules[name]
+            bound = getattr(mod, name, None)
+            # those imported in server_imports() already have it
+            if bound is not None and (bound is real or bound is _views.get(name)):
+                setattr(mod, name, view)
+                _attached.append((mod, name, real))
+        if rooted_open is not None and 'open' not in mod.__dict__:
+            mod.open = rooted_open
+            _attached.append((mod, 'open', None))
+
+def detach_server():
+    '''
+        Put back what attach_server() changed.
+    '''
+    while len(_attached):
+        (mod, name, real) = _attached.pop()
+        if real is None:
+            delattr(mod, name)
+        else:
+            setattr(mod, name, real)
+
+def install():
+    '''
+        Make micropython-flavoured imports work under CPython.
+        Safe to call more than once.
+    '''
+    global _installed
+    if _installed:
+        return 
+    _installed = True
+    
+    # our stand-ins win over anything else called ttboard/machine
+    if StandInsPath not in sys.path:
+        sys.path.insert(0, StandInsPath)
+    
+    if not hasattr(time, 'sleep_ms'):
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000.0)
+        time.sleep_us = lambda us: time.sleep(us / 1000000.0)
+        time.ticks_ms = _ticks_ms
+        time.ticks_us = _ticks_us
+        time.ticks_cpu = _ticks_us
+        time.ticks_diff = _ticks_diff
+        time.ticks_add = _ticks_add
+    
+    # micropython's time() is an int, and gets used as such
+    _views['time'] = _server_view(time, 'time', {'time': lambda: int(time.time())})
+    if not hasattr(gc, 'mem_free'):
+        _views['gc'] = _server_view(gc, 'gc', {'threshold': _gc_threshold_fn, 
+                                               'mem_free': lambda: HostHeapFree, 
+                                               'mem_alloc': lambda: 0})
+
+from hostsim.harness import HostHarness
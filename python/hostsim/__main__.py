@@ -0,0 +1,63 @@
+'''
+Quick tour of the server, running on the host.
+
+  python -m hostsim [--connect HOST:PORT]
+  
+or keep a server up, for masters in other processes
+
+  python -m hostsim --listen PORT
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import argparse
+import time
+
+from hostsim import HostHarness
+
+def tour(sim):
+    sim.ping()
+    sim.info()
+    sim.status()
+    sim.metrics(0)
+    sim.variable_set(3, 'hello')
+    sim.variable_get(3)
+    # and again, with framed responses
+    sim.protocol(2)
+    sim.poll()
+    sim.variable_get(3)
+    sim.protocol(1)
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="spasics server on the host")
+    parser.add_argument('--listen', type=int, default=None, 
+                        help='serve the slave on this TCP port until interrupted')
+    parser.add_argument('--connect', type=str, default=None,
+                        help='HOST:PORT of a server started with --listen, to tour that instead')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = getArgs()
+    if args.connect is not None:
+        import hostsim
+        import hostsim.bus
+        (host, port) = args.connect.rsplit(':', 1)
+        hostsim.install()
+        hostsim.bus.use_remote(host, int(port))
+        from i2c_client_test import SatelliteSimulator
+        tour(SatelliteSimulator(run_quiet=False))
+    elif args.listen is not None:
+        with HostHarness(listen_port=args.listen) as harness:
+            print(f'slave on port {harness.loopback.port}, ctrl-c to stop')
+            try:
+                while harness.running:
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                pass
+        if harness.error is not None:
+            raise harness.error
+    else:
+        with HostHarness() as harness:
+            tour(harness.master(run_quiet=False))
+        if harness.error is not None:
+            raise harness.error
@@ -0,0 +1,142 @@
+'''
+machine.I2C, as seen by the master, wired straight to 
+the simulated spasics slave (device_sim.i2cslave) or, once
+use_remote() has been called, to one served over a socket 
+(see hostsim.loopback).
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import socket
+
+from spasic.i2c.device_sim import i2cslave
+import hostsim.loopback as loopback
+
+# what a real bus raises on a NAK
+EIO = 5
+
+class SimulatedI2CMaster:
+    ReadSize = 16
+    
+    def __init__(self, bus_id:int=0, freq:int=100000):
+        self.bus_id = bus_id
+        self.freq = freq
+        self._readbuf = bytearray(self.ReadSize)
+        self.writes = 0
+        self.reads = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        
+    def _check(self, addr:int):
+        if addr != i2cslave.addr:
+            raise OSError(EIO)
+        
+    def scan(self):
+        if i2cslave.addr:
+            return [i2cslave.addr]
+        return []
+    
+    def writeto(self, addr:int, buf, stop:bool=True):
+        self._check(addr)
+        i2cslave.master_send_data(buf)
+        self.writes += 1
+        self.bytes_written += len(buf)
+        return len(buf)
+    
+    def readfrom_into(self, addr:int, buf, stop:bool=True):
+        self._check(addr)
+        idx = 0
+        while idx < len(buf):
+            i2cslave.master_request_into(self._readbuf)
+            cplen = len(buf) - idx 
+            if cplen > self.ReadSize:
+                cplen = self.ReadSize
+            buf[idx:idx + cplen] = self._readbuf[0:cplen]
+            idx += cplen
+        self.reads += 1
+        self.bytes_read += len(buf)
+        
+    def readfrom(self, addr:int, nbytes:int, stop:bool=True):
+        buf = bytearray(nbytes)
+        self.readfrom_into(addr, buf)
+        return bytes(buf)
+
+
+Remote = None
+
+def use_remote(host:str, port:int=loopback.DefaultPort):
+    '''
+        machine.I2C hands out SocketI2CMasters from now on,
+        None as host goes back to the in-process slave.
+    '''
+    global Remote
+    Remote = (host, port) if host is not None else None
+
+def master(bus_id:int=0, freq:int=100000):
+    if Remote is not None:
+        return SocketI2CMaster(Remote[0], Remote[1], bus_id, freq)
+    return SimulatedI2CMaster(bus_id, freq)
+
+class SocketI2CMaster:
+    '''
+        Same as SimulatedI2CMaster, but the slave is on the 
+        other end of a LoopbackServer connection.
+    '''
+    MaxTransfer = 255
+    
+    def __init__(self, host:str, port:int=loopback.DefaultPort, bus_id:int=0, freq:int=100000):
+        self.bus_id = bus_id
+        self.freq = freq
+        self.writes = 0
+        self.reads = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._sock = socket.create_connection((host, port))
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        
+    def _recv(self, num_bytes:int):
+        bts = loopback.recv_exactly(self._sock, num_bytes)
+        if bts is None:
+            raise OSError(EIO)
+        return bts
+    
+    def _check(self, status:int):
+        if status != loopback.StatusOK:
+            raise OSError(status)
+        
+    def scan(self):
+        self._sock.sendall(bytes([loopback.OpScan]))
+        count = self._recv(1)[0]
+        return list(self._recv(count)) if count else []
+    
+    def writeto(self, addr:int, buf, stop:bool=True):
+        if len(buf) > self.MaxTransfer:
+            raise ValueError('write too long')
+        self._sock.sendall(bytes([loopback.OpWrite, addr, len(buf)]) + bytes(buf))
+        self._check(self._recv(1)[0])
+        self.writes += 1
+        self.bytes_written += len(buf)
+        return len(buf)
+    
+    def readfrom_into(self, addr:int, buf, stop:bool=True):
+        idx = 0
+        while idx < len(buf):
+            cplen = len(buf) - idx
+            if cplen > self.MaxTransfer:
+                cplen = self.MaxTransfer
+            self._sock.sendall(bytes([loopback.OpRead, addr, cplen]))
+            self._check(self._recv(1)[0])
+            buf[idx:idx + cplen] = self._recv(cplen)
+            idx += cplen
+        self.reads += 1
+        self.bytes_read += len(buf)
+        
+    def readfrom(self, addr:int, nbytes:int, stop:bool=True):
+        buf = bytearray(nbytes)
+        self.readfrom_into(addr, buf)
+        return bytes(buf)
@@ -0,0 +1,136 @@
+'''
+Runs i2c_server.main_loop in a thread, against the simulated slave.
+With listen_port, that slave is also served over TCP (see 
+hostsim.loopback), for masters in other processes.
+
+The server's file system is rooted in a host directory: root, or a 
+temporary one that goes away on stop().
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import os
+import tempfile
+import threading
+import time
+
+class HostHarness:
+    def __init__(self, raise_on_exception:bool=True, listen_port:int=None, root:str=None):
+        self.raise_on_exception = raise_on_exception
+        self.listen_port = listen_port
+        self.root = root
+        self._tmpdir = None
+        self.server = None 
+        self.loopback = None
+        self.error = None
+        self._thread = None
+        
+    def start(self):
+        if self._thread is not None:
+            return self
+        
+        import hostsim
+        hostsim.install()
+        try:
+            import spasic.settings as sts
+        except:
+            import spasic.settings_safe as sts
+        sts.DebugUseSimulatedI2CDevice = True
+        sts.RaiseAndBreakMainOnException = self.raise_on_exception
+        
+        # the index only gets loaded once the file system is rooted
+        index_path = sts.ChecksumIndexPath
+        sts.ChecksumIndexPath = None
+        try:
+            with hostsim.server_imports():
+                import i2c_server
+                import i2c_server_globals as i2cglb
+        finally:
+            sts.ChecksumIndexPath = index_path
+        
+        if self.root is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='spasics-')
+            self.root = self._tmpdir.name
+        hostsim.attach_server(self.root)
+        i2cglb.FileSystem.checksums.index_path = index_path
+        i2cglb.FileSystem.checksums.load()
+        
+        self.server = i2c_server
+        self.globals = i2cglb
+        i2cglb.MainLoopStopRequested = False
+        if not i2c_server.begin():
+            raise RuntimeError('Could not begin i2c server')
+        
+        if self.listen_port is not None:
+            from hostsim.loopback import LoopbackServer
+            self.loopback = LoopbackServer(i2c_server.get_i2c_device().backend, 
+                                           self.listen_port).start()
+        
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        try:
+            self.server.main_loop()
+        except Exception as e:
+            self.error = e
+            print(f'main_loop died: {e}')
+            
+    @property 
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property 
+    def device(self):
+        return self.server.get_i2c_device()
+            
+    def stop(self, timeout:float=2.0):
+        if self._thread is None:
+            return
+        self.globals.MainLoopStopRequested = True
+        self._thread.join(timeout)
+        self._thread = None
+        if self.loopback is not None:
+            self.loopback.stop()
+            self.loopback = None
+        
+        import hostsim
+        hostsim.detach_server()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+            self.root = None
+        
+    def host_path(self, path:str):
+        '''
+            Where the server's path is, on this host.
+        '''
+        return os.path.join(self.root, os.path.normpath('/' + path).lstrip('/'))
+        
+    def master(self, run_quiet:bool=True):
+        '''
+            A SatelliteSimulator, talking to the server 
+            through the simulated bus.
+        '''
+        from i2c_client_test import SatelliteSimulator
+        return SatelliteSimulator(run_quiet=run_quiet)
+    
+    def wait_idle(self, timeout:float=1.0):
+        '''
+            Wait until everything sent has been fetched and processed.
+        '''
+        from spasic.i2c.device_sim import i2cslave
+        t_end = time.monotonic() + timeout
+        while time.monotonic() < t_end:
+            if not i2cslave.have_pending_data() and not len(self.globals.PendingDataIn):
+                return True
+            time.sleep(0.001)
+        return False
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,157 @@
+'''
+Socket loopback: puts a slave backend on a TCP port, so the master
+can be another process (or another box) while the server runs here.
+
+Each master request is one op byte, the address and a length:
+
+  W ADDR LEN DATA[LEN]    write, answered with a status byte
+  R ADDR LEN              read, answered with status then LEN bytes
+  S                       scan, answered with a count then the addresses
+
+status is 0 for ACK, EIO if nobody answers at that address.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import socket
+import threading
+
+OpWrite = ord('W')
+OpRead = ord('R')
+OpScan = ord('S')
+
+StatusOK = 0
+StatusNAK = 5 # EIO
+
+DefaultPort = 2051
+
+def recv_exactly(conn:socket.socket, num_bytes:int):
+    '''
+        num_bytes from conn, or None if the other side went away.
+    '''
+    buf = bytearray(num_bytes)
+    view = memoryview(buf)
+    got = 0
+    while got < num_bytes:
+        n = conn.recv_into(view[got:], num_bytes - got)
+        if not n:
+            return None
+        got += n
+    return buf
+
+class LoopbackServer:
+    '''
+        Serves master requests for a SlaveSim-like backend,
+        a thread per connection (any number of masters may
+        share the bus).
+    '''
+    ReadSize = 16
+
+    def __init__(self, slave, port:int=DefaultPort, host:str='127.0.0.1'):
+        self.slave = slave
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        # port 0 picks a free one
+        self.port = self._sock.getsockname()[1]
+        self._sock.listen(4)
+        self._sock.settimeout(0.2)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout:float=2.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._sock.close()
+        self._sock = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                conn, _addr = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.connections += 1
+            threading.Thread(target=self._client, args=(conn,), daemon=True).start()
+            
+    def _client(self, conn:socket.socket):
+        conn.settimeout(0.2)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            self._serve(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _serve(self, conn:socket.socket):
+        readbuf = bytearray(self.ReadSize)
+        while not self._stop.is_set():
+            try:
+                op = conn.recv(1)
+            except socket.timeout:
+                continue
+            if not op:
+                return
+            op = op[0]
+            if op == OpScan:
+                addrs = [self.slave.addr] if self.slave.addr else []
+                conn.sendall(bytes([len(addrs)] + addrs))
+                continue
+            hdr = recv_exactly(conn, 2)
+            if hdr is None:
+                return
+            (addr, length) = (hdr[0], hdr[1])
+            if op == OpWrite:
+                data = recv_exactly(conn, length) if length else bytearray()
+                if data is None:
+                    return
+                if addr != self.slave.addr:
+                    conn.sendall(bytes([StatusNAK]))
+                    continue
+                with self._lock:
+                    self.slave.master_send_data(data)
+                conn.sendall(bytes([StatusOK]))
+            elif op == OpRead:
+                if addr != self.slave.addr:
+                    conn.sendall(bytes([StatusNAK]))
+                    continue
+                out = bytearray(1 + length)
+                out[0] = StatusOK
+                idx = 1
+                with self._lock:
+                    while idx < len(out):
+                        self.slave.master_request_into(readbuf)
+                        cplen = len(out) - idx
+                        if cplen > self.ReadSize:
+                            cplen = self.ReadSize
+                        out[idx:idx + cplen] = readbuf[0:cplen]
+                        idx += cplen
+                conn.sendall(out)
+            else:
+                # lost sync, nothing sensible to do but hang up
+                return
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,25 @@
+'''
+Host stand-in for micropython's _thread, where the second 
+core is just another (daemon) thread.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import threading
+
+def start_new_thread(func, args:tuple, kwargs:dict=None):
+    t = threading.Thread(target=func, args=args, kwargs=kwargs or {}, daemon=True)
+    t.start()
+    return t.ident
+
+def allocate_lock():
+    return threading.Lock()
+
+def get_ident():
+    return threading.get_ident()
+
+def stack_size(size:int=0):
+    return 0
+
+def exit():
+    raise SystemExit()
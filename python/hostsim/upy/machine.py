@@ -0,0 +1,103 @@
+'''
+Host stand-in for the micropython machine module.
+
+Only what spasics touches: pins, timers, watchdog, reset and mem32
+are inert; I2C talks to the simulated spasics slave, see hostsim.bus.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+    
+    def __init__(self, pin_id, mode:int=-1, pull:int=-1, value:int=None):
+        self.id = pin_id 
+        self.mode = mode 
+        self._value = value if value is not None else 0
+        
+    def init(self, mode:int=-1, pull:int=-1, value:int=None):
+        self.mode = mode 
+        if value is not None:
+            self._value = value
+        
+    def value(self, v:int=None):
+        if v is None:
+            return self._value 
+        self._value = 1 if v else 0
+    
+    def on(self):
+        self._value = 1
+    def off(self):
+        self._value = 0
+    def toggle(self):
+        self._value = 0 if self._value else 1
+    def irq(self, handler=None, trigger:int=0):
+        return None
+    
+    def __call__(self, v:int=None):
+        return self.value(v)
+        
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+    def __init__(self, timer_id:int=-1, **kwargs):
+        pass
+    def init(self, **kwargs):
+        pass
+    def deinit(self):
+        pass
+    
+class WDT:
+    def __init__(self, timeout:int=5000):
+        self.timeout = timeout 
+    def feed(self):
+        pass
+    
+class UART:
+    def __init__(self, *args, **kwargs):
+        pass 
+    def read(self, nbytes:int=-1):
+        return None 
+    def write(self, bts):
+        return len(bts)
+    def any(self):
+        return 0
+    
+class _Mem32(dict):
+    # register writes just land here
+    def __missing__(self, addr):
+        return 0
+    
+mem32 = _Mem32()
+
+ResetCount = 0
+def reset():
+    global ResetCount
+    ResetCount += 1
+    print("machine.reset() -- ignored on host")
+    
+def soft_reset():
+    reset()
+    
+_freq = 125000000
+def freq(hz:int=None):
+    global _freq
+    if hz is None:
+        return _freq 
+    _freq = hz
+
+def unique_id():
+    return b'\xde\xad\xbe\xef\x00\x00\x00\x01'
+
+def I2C(bus_id:int=0, scl=None, sda=None, freq:int=100000):
+    # imported late so hostsim.bus can pick the device_sim flavour,
+    # or a remote slave
+    import hostsim.bus
+    return hostsim.bus.master(bus_id, freq)
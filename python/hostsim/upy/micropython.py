@@ -0,0 +1,19 @@
+'''
+Host stand-in for the micropython module.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+
+def const(v):
+    return v
+
+def mem_info(verbose:int=0):
+    print("mem_info: n/a on host")
+
+def schedule(func, arg):
+    func(arg)
+    return True
+
+def alloc_emergency_exception_buf(size:int):
+    pass
@@ -0,0 +1,50 @@
+'''
+Host stand-in for the TT demoboard.
+
+Anything an experiment asks of it, attributes or calls, 
+just returns another inert stand-in, so experiments that 
+only poke the board run (though get nothing meaningful back).
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from ttboard.mode import RPMode
+
+class Inert:
+    def __init__(self, name:str='inert'):
+        self._name = name
+        
+    def __getattr__(self, name:str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        v = Inert(f'{self._name}.{name}')
+        setattr(self, name, v)
+        return v 
+    
+    def __call__(self, *args, **kwargs):
+        return Inert(f'{self._name}()')
+    
+    def __int__(self):
+        return 0
+    
+    def __index__(self):
+        return 0
+    
+    def __bool__(self):
+        return False
+    
+    def __repr__(self):
+        return f'<{self._name}>'
+
+class DemoBoard(Inert):
+    _instance = None
+    
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+    
+    def __init__(self):
+        super().__init__('DemoBoard')
+        self.mode = RPMode.ASIC_RP_CONTROL
@@ -0,0 +1,12 @@
+'''
+Host stand-in for ttboard.mode
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+
+class RPMode:
+    SAFE = 0
+    ASIC_RP_CONTROL = 1
+    ASIC_MANUAL_INPUTS = 2
+    STANDALONE = 3
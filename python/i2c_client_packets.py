@@ -13,13 +13,60 @@ ErrorCodes = {
     0x0B: 'MakeDir Failure',
     0x0C: 'Delete File Failure',
     0x0D: 'Rename File Failure',
-    0x0E: 'POST Fail'
+    0x0E: 'POST Fail',
+    0x0F: 'Patch Failure'
 }
 
 class ClientPacketGenerator:
+    # commands are sent as single writes of (up to) this many bytes
+    FrameSize = 8
+    
+    def __init__(self, batch_commands:bool=True):
+        # the *_list() polls go out as batch frames
+        self.batch_commands = batch_commands
+    
+    def batch_list(self, packets):
+        '''
+            Packs runs of short commands (up to 6 bytes) into 
+            batch frames: b'B' [LEN CMD[LEN]]...
+            The server runs them in order and replies with a single
+            ResponseBatch.  Longer commands are left as-is.
+        '''
+        ret_list = []
+        current = None
+        count = 0
+        for p in packets:
+            plen = len(p)
+            if current is not None and len(current) + 1 + plen > self.FrameSize:
+                ret_list.append(current if count > 1 else current[2:])
+                current = None
+                
+            if 2 + plen > self.FrameSize:
+                # too long to go in a batch
+                ret_list.append(p)
+                continue
+            
+            if current is None:
+                current = bytearray([ord('B')])
+                count = 0
+            current.append(plen)
+            current.extend(p)
+            count += 1
+        
+        if current is not None:
+            ret_list.append(current if count > 1 else current[2:])
+            
+        return ret_list
     
-    def __init__(self):
-        pass 
+    def poll_list(self):
+        '''
+            status, info and current experiment result: a single 
+            batch frame, unless batch_commands is off
+        '''
+        packets = [self.status(), self.info(), self.experiment_result()]
+        if not self.batch_commands:
+            return packets
+        return self.batch_list(packets)
     
     def abort(self):
         return  bytearray([ord('A')])
@@ -40,6 +87,15 @@ class ClientPacketGenerator:
     def info(self):
         return bytearray([ord('I')])
     
+    def protocol(self, version:int=0):
+        return bytearray([ord('P') + ord('V'), version])
+    
+    def report_deltas(self, keyframes:int=0):
+        return bytearray([ord('P') + ord('D'), keyframes])
+    
+    def metrics(self, page:int=0):
+        return bytearray([ord('M'), page])
+    
     
     def reboot(self, safe_mode:bool=False):
         return bytearray([ord('R'), 1 if safe_mode else 0])
@@ -47,6 +103,12 @@ class ClientPacketGenerator:
     def experiment_result(self):
         return bytearray([ord('E') + ord('I')])
     
+    def experiment_fragment(self, offset:int, size:int=0):
+        bts = bytearray([ord('E') + ord('F')])
+        bts += offset.to_bytes(2, 'little')
+        bts.append(size)
+        return bts
+    
     def experiment_packets_list(self, cmd:int, experiment_id:int, args:bytearray=None):
         ret_list = []
         if args is not None and len(args):
@@ -78,6 +140,9 @@ class ClientPacketGenerator:
     
     def file_move(self, srcvarid:int, destvarid:int):
         return bytearray([ord('F'), ord('M'), srcvarid, destvarid])
+    
+    def file_patch(self, oldvarid:int, patchvarid:int, newvarid:int):
+        return bytearray([ord('F'), ord('P'), oldvarid, patchvarid, newvarid])
         
     def open_read(self, varid:int):
         return bytearray([ord('F'), ord('O'), varid, ord('R')])
@@ -91,6 +156,14 @@ class ClientPacketGenerator:
         else:
             return bytearray([ord('F') + ord('R')])
             
+    def file_stream(self, offset:int, window:int, chunk:int=0):
+        bts = bytearray([ord('F') + ord('T')])
+        bts += offset.to_bytes(4, 'little')
+        bts += window.to_bytes(2, 'little')
+        if chunk:
+            bts.append(chunk)
+        return bts
+            
     def file_write_list(self, bts_to_write:bytearray):
         cmdPrefix = ord('F') + ord('W')
         ret_list = []
@@ -102,6 +175,23 @@ class ClientPacketGenerator:
     def open_write(self, varid:int):
         return bytearray([ord('F'), ord('O'), varid, ord('W')])
     
+    def open_update(self, varid:int):
+        return bytearray([ord('F'), ord('O'), varid, ord('U')])
+    
+    def file_write_at(self, offset:int, length:int=0):
+        bts = bytearray([ord('F') + ord('A')])
+        bts += offset.to_bytes(4, 'little')
+        if length:
+            bts += length.to_bytes(2, 'little')
+        return bts
+    
+    def block_checksums(self, varid:int, offset:int, shift:int, count:int):
+        bts = bytearray([ord('F') + ord('K'), varid])
+        bts += offset.to_bytes(4, 'little')
+        bts.append(shift)
+        bts.append(count)
+        return bts
+    
     def checksum(self, varid:int):
         return bytearray([ord('F'), ord('Z'), varid])
     def getvar(self, v:int):
@@ -0,0 +1,108 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Patches (deltas), made on the ground, for the module to turn an old
+version of a file into a new one (spasic.fs.patch has the format,
+and applies them).
+
+make_patch() goes through the new version looking each run of
+MatchLength bytes up in an index of the old one, extends whatever
+matches as far as it goes, and codes the longest as a copy.  Whatever
+isn't found goes in as is.  Copies that pick up where the last one
+left off are preferred, on a tie, as they're what an edit leaves.
+'''
+from spasic.fs.checksum import crc32
+import spasic.fs.patch as patch
+
+MatchLength = 8 # bytes that have to match for a copy to be considered
+MinCopy = 12 # shorter matches cost about as much as inserting them
+MaxCandidates = 16 # old offsets tried per lookup
+
+def _varint(v:int):
+    bts = bytearray()
+    while v >= 0x80:
+        bts.append((v & 0x7f) | 0x80)
+        v >>= 7
+    bts.append(v)
+    return bts
+
+def _old_index(old:bytes):
+    index = dict()
+    for i in range(len(old) - MatchLength + 1):
+        key = old[i:(i + MatchLength)]
+        offsets = index.get(key)
+        if offsets is None:
+            index[key] = [i]
+        elif len(offsets) < MaxCandidates:
+            offsets.append(i)
+    return index
+
+def _match_length(old:bytes, old_pos:int, new:bytes, new_pos:int):
+    n = 0
+    limit = min(len(old) - old_pos, len(new) - new_pos)
+    while n < limit and old[old_pos + n] == new[new_pos + n]:
+        n += 1
+    return n
+
+def make_patch(old:bytes, new:bytes):
+    '''
+        Delta turning old into new (bytes), see spasic.fs.patch
+    '''
+    out = bytearray(patch.Magic)
+    out += crc32(old).to_bytes(4, 'little')
+    out += len(new).to_bytes(4, 'little')
+    out += crc32(new).to_bytes(4, 'little')
+
+    index = _old_index(old)
+    pending = bytearray() # to insert
+    expected = -1 # old offset following the last copy
+    pos = 0
+    while pos < len(new):
+        best_len = 0
+        best_off = 0
+        candidates = index.get(new[pos:(pos + MatchLength)], [])
+        if expected >= 0 and expected not in candidates:
+            candidates = [expected] + candidates
+        for off in candidates:
+            n = _match_length(old, off, new, pos)
+            if n > best_len or (n == best_len and off == expected):
+                best_len = n
+                best_off = off
+
+        if best_len < MinCopy:
+            pending.append(new[pos])
+            pos += 1
+            continue
+
+        if len(pending):
+            out.append(patch.OpInsert)
+            out += _varint(len(pending))
+            out += pending
+            pending = bytearray()
+        out.append(patch.OpCopy)
+        out += _varint(best_off)
+        out += _varint(best_len)
+        pos += best_len
+        expected = best_off + best_len
+
+    if len(pending):
+        out.append(patch.OpInsert)
+        out += _varint(len(pending))
+        out += pending
+    out.append(patch.OpEnd)
+    return bytes(out)
+
+def make_patch_file(oldpath:str, newpath:str, patchpath:str):
+    '''
+        Writes the delta from file oldpath to file newpath
+        to patchpath, returns its size.
+    '''
+    with open(oldpath, 'rb') as f:
+        old = f.read()
+    with open(newpath, 'rb') as f:
+        new = f.read()
+    delta = make_patch(old, new)
+    with open(patchpath, 'wb') as f:
+        f.write(delta)
+    return len(delta)
@@ -75,8 +75,12 @@ SimI2CSCL= 7
 SimI2CSDA = 6
 SimI2CDevice = 1
 
-from spasic.cnc.response.response import ResponseFactory
+from spasic.cnc.response.decoder import ResponseDecoder
+from spasic.cnc.response.response import ResponseOKMessage, ResponseExperimentFragment, ResponseFileData, ResponseError, ResponseFile, ResponseBlockChecksums
+from spasic.fs.checksum import file_crc32, crc32
+from spasic.cnc.response.fragments import ResultAssembler
 from i2c_client_packets import ClientPacketGenerator, ErrorCodes
+from i2c_client_patch import make_patch
 
 
 
@@ -118,39 +122,20 @@ class ExpResultCache:
             res = self.result
         return f'ID: {self.id} {run_str}{ex_str}: {res}'
 
-class IncomingDataStream:
-    def __init__(self):
-        self._data = bytearray()
-        
-    def reset(self):
-        self._data = bytearray()
-        
-    def clone(self):
-        return bytearray(self._data)
-    def extend(self, withdata:bytearray):
-        self._data.extend(withdata)
-        
-    def consume(self, length:int):
-        try:
-            del self._data[:length]
-        except TypeError:
-            self._data = self._data[length:]
-        
-    def __len__(self):
-        return len(self._data)
-    
-    def __eq__(self, other):
-        return self._data == other
-
-    def __getitem__(self, key):
-        return self._data[key]
-    
-    def __repr__(self):
-        if len(self._data) > 20:
-            return f'<IncomingDataStream {self._data[:20]}...>'
-        return f'<IncomingDataStream {self._data}>'
-
-
+def _missing_ranges(have:bytearray, end:int):
+    # (offset, length) of each run of bytes not received, up to end
+    ranges = []
+    start = -1
+    for i in range(end):
+        got = i < len(have) and have[i]
+        if not got and start < 0:
+            start = i
+        elif got and start >= 0:
+            ranges.append((start, i - start))
+            start = -1
+    if start >= 0:
+        ranges.append((start, end - start))
+    return ranges
 
 class SatelliteSimulator:
     '''
@@ -171,7 +156,10 @@ class SatelliteSimulator:
         self.echo_blocks = False # echo blocks received
         self.manual_response_fetching = False # don't auto-fetch responses on commands
         
-        self.incoming_data = IncomingDataStream()
+        # responses are put together as blocks come in, 
+        # however they're split across reads
+        self.decoder = ResponseDecoder()
+        self.raw_log = None # bytearray, to also keep every block received
         
     def output_msg(self, msg, force:bool=False):
         if force or not self.run_quiet:
@@ -208,6 +196,44 @@ class SatelliteSimulator:
         return self.print_response()
         
     
+    def protocol(self, version:int=0):
+        '''
+            Switch response framing: 1 is plain, 2 wraps every response 
+            in a frame with a CRC, so garbled ones get dropped whole
+            (the info comment says what the board supports, 'P2').
+            With version 0, just asks which is in use.
+        '''
+        self.output_msg(f"Requesting protocol {version}")
+        self.send(self.packet_gen.protocol(version))
+        self.wait(ResponseDelayMs)
+        v = self.print_response()
+        for r in (v or []):
+            if isinstance(r, ResponseOKMessage) and r.message[:2] == b'PV':
+                # from here on, anything outside a frame is garbage
+                self.decoder.framed_only = r.message[2] == 2
+        return v
+        
+    def report_deltas(self, keyframes:int=0):
+        '''
+            Have auto-reports sent in full only one time in keyframes,
+            per kind, and as the bytes that changed otherwise.  They
+            come out of the decoder whole.  0 to always send them in full.
+            Best with protocol(2): a plain status has no length to it.
+        '''
+        self.output_msg(f"Requesting report deltas, keyframes {keyframes}")
+        self.send(self.packet_gen.report_deltas(keyframes))
+        self.wait(ResponseDelayMs)
+        return self.print_response()
+        
+    def metrics(self, page:int=0):
+        '''
+            Request a page of runtime metrics 
+            (0: main loop, 1: i2c in, 2: i2c out, 3: memory, 4: files)
+        '''
+        self.send(self.packet_gen.metrics(page))
+        self.wait(ResponseDelayMs)
+        return self.print_response()
+        
     def run_experiment_now(self, experiment_id:int, args:bytearray=None):
         '''
             run_experiment_now -- launch experiment immediately
@@ -249,6 +275,55 @@ class SatelliteSimulator:
         self.wait(ResponseDelayMs)
         return self.print_response()
     
+    def experiment_result_full(self, fragment_size:int=0, max_requests:int=32):
+        '''
+            experiment_result_full 
+            Pulls the whole result of the current (or last) experiment,
+            beyond the 11 bytes experiment reports carry, a fragment 
+            at a time ('EF', fragment_size bytes each, 0 for the board's
+            default).  Returns the result, or None if it couldn't be
+            put together.
+        '''
+        self.output_msg("Requesting experiment full result")
+        assembler = ResultAssembler()
+        offset = 0
+        for _i in range(max_requests):
+            self.send(self.packet_gen.experiment_fragment(offset, fragment_size))
+            self.wait(ResponseDelayMs)
+            partial = None
+            for r in (self.read_pending() or []):
+                if isinstance(r, ResponseExperimentFragment):
+                    partial = assembler.add(r)
+                else:
+                    self.output_msg(f'Response: {r}')
+            
+            if assembler.latest is not None:
+                done = assembler.latest
+                self.exp_result.id = done.exp_id
+                self.exp_result.result = done.data
+                self.output_msg(f'Result {done.exp_id} ({done.total} bytes): {done.data}')
+                return done.data
+            if partial is None:
+                # error (or nothing at all) came back
+                return None
+            # the result may have changed under us, in which case 
+            # this starts over on the new one
+            offset = partial.next_missing()
+            if offset < 0:
+                offset = 0
+        
+        return None
+    
+    def poll(self):
+        '''
+            status, info and current experiment results, 
+            in a single batch write
+        '''
+        self.output_msg("Polling status, info and results")
+        self.send_all(self.packet_gen.poll_list())
+        self.wait(ResponseDelayMs)
+        return self.print_response()
+    
     def abort(self):
         '''
             abort -- request an experiment terminate immediately
@@ -318,67 +393,254 @@ class SatelliteSimulator:
         return self.print_response()
         
     
-    def upload_file(self, srcfile:str, destpath:str, swap_name:str='/mytmp.txt'):
+    def upload_file(self, srcfile:str, destpath:str, swap_name:str='/mytmp.txt', block_shift:int=9, max_passes:int=8):
         '''
             upload_file
             @param source: source file path (local)
             @param destination: destination full file path (remote, on module)
             @param swap_name: optional swap file (full path) to use for storage during upload
+            @param block_shift: sent and checked in blocks of 1 << block_shift bytes
+            @param max_passes: rounds of checking and resending, at most
             
             Utility method that sets up the variables (slots), uploads the file to the 
-            temp file and then moves it to its destination on completion.
+            swap file and then moves it to its destination once its size and 
+            checksum match.
             
-            @note: should be checking the size and checksum prior to rename/move
+            Resumable: the swap file is opened for update, not truncated, and the 
+            CRC-32s of its blocks ('FK') are compared with those of the local file, 
+            so only blocks that are missing or differ get sent, each at its offset 
+            ('FA').  Lost packets just leave bad blocks for the next pass and 
+            calling this again, after a pass was cut short or the module rebooted, 
+            picks up from what's already there.
+            Returns True once the file is in place.
         '''
-        infile = open(srcfile, 'rb')
+        with open(srcfile, 'rb') as infile:
+            data = infile.read()
         
         swapid = 1
         destid = 2
+        block_size = 1 << block_shift
+        num_blocks = (len(data) + block_size - 1) // block_size
         
-        # setup our swap file name 
-        # and our destination file name
+        # setup our swap file name and our destination 
+        # file name, and make sure the swap file exists
         packets = self.packet_gen.setvar_list(swapid, swap_name)
         packets.extend(self.packet_gen.setvar_list(destid, destpath))
-        
-        # open the swap file for writes
-        packets.append(self.packet_gen.open_write(swapid))
-        
-        # get all the data from input file (on this MCU)
-        # and create write packets, shoot those out as we go
-        # to not eat up a bunch of mem
-        bts = infile.read(16*6)
-        while len(bts):
-            new_packets = self.packet_gen.file_write_list(bts)
-            # self.output_msg(f'New packets:\n{new_packets}')
-            packets.extend(new_packets)
-            
-            self.send_all(packets)
-            packets = []
-            
-            bts = infile.read(16*6)
-            
-        # close the file we just wrote... should check that it's
-        # size/checksum match but meh
+        packets.append(self.packet_gen.open_update(swapid))
         packets.append(self.packet_gen.file_close())
+        self.send_all(packets)
+        self.wait(ResponseDelayMs)
+        self.read_pending()
+        
+        remote_size = self._remote_file_size(swapid)
+        if remote_size is not None and remote_size > len(data):
+            # left over from something longer, and there's no truncating
+            self.output_msg(f"Swap file has {remote_size} bytes, starting over")
+            self.send_all([self.packet_gen.file_unlink(swapid), 
+                           self.packet_gen.open_update(swapid), 
+                           self.packet_gen.file_close()])
+            self.wait(ResponseDelayMs)
+            self.read_pending()
+            remote_size = 0
+        
+        for pass_num in range(max_passes):
+            bad = self._bad_blocks(swapid, data, block_shift, remote_size)
+            if not len(bad):
+                break
+            self.output_msg(f"Pass {pass_num}: sending {len(bad)} of {num_blocks} blocks")
+            self.send(self.packet_gen.open_update(swapid))
+            for blk in bad:
+                offset = blk * block_size
+                chunk = data[offset:(offset + block_size)]
+                packets = [self.packet_gen.file_write_at(offset, len(chunk))]
+                packets.extend(self.packet_gen.file_write_list(chunk))
+                self.send_all(packets)
+            self.send(self.packet_gen.file_close())
+            self.wait(ResponseDelayMs)
+            self.read_pending()
+            remote_size = None # ask about every block, from now on
+        else:
+            self.output_msg(f"Upload of {srcfile} incomplete, call again to resume")
+            return False
         
-        # TODO: we should interrupt this process and do a file check
-        # prior to moving it to destination
+        # the whole thing, before it goes in place
+        if self._remote_file_size(swapid) != len(data) or self._remote_checksum(swapid) != crc32(data):
+            self.output_msg(f"Upload of {srcfile} doesn't check out, call again to resume")
+            return False
         
         # move the swap file to the destination file
-        packets.append(self.packet_gen.file_move(swapid, destid))
+        self.send(self.packet_gen.file_move(swapid, destid))
+        self.wait(ResponseDelayMs)
+        self.output_msg(self.read_pending())
+        self.output_msg(f"File uploaded to {destpath}")
+        return True
+    
+    def patch_file(self, oldfile:str, newfile:str, remotepath:str, patch_name:str='/mypatch.bin', swap_name:str='/mytmp.txt'):
+        '''
+            patch_file
+            @param oldfile: local copy of what's at remotepath now
+            @param newfile: what it should become (local)
+            @param remotepath: the file to update (remote, on module)
+            @param patch_name: where the patch goes on the module
+            @param swap_name: where it's applied to, before being moved in place
+            
+            Sends a patch (see i2c_client_patch) rather than the whole new file, 
+            uploaded like any other file (so resumable too), has the module 
+            apply it ('FP') and moves the result in place.  The module checks 
+            remotepath really is oldfile first, and the result.
+            Returns True once the new version is in place.
+        '''
+        with open(oldfile, 'rb') as f:
+            old = f.read()
+        with open(newfile, 'rb') as f:
+            new = f.read()
+        delta = make_patch(old, new)
+        self.output_msg(f"Patch for {remotepath}: {len(delta)} bytes, vs {len(new)}")
+        
+        localpatch = newfile + '.spd'
+        with open(localpatch, 'wb') as f:
+            f.write(delta)
+        try:
+            if not self.upload_file(localpatch, patch_name, patch_name + '.part'):
+                return False
+        finally:
+            os.remove(localpatch)
+        
+        oldid = 1
+        patchid = 2
+        newid = 3
+        packets = self.packet_gen.setvar_list(oldid, remotepath)
+        packets.extend(self.packet_gen.setvar_list(patchid, patch_name))
+        packets.extend(self.packet_gen.setvar_list(newid, swap_name))
+        packets.append(self.packet_gen.file_patch(oldid, patchid, newid))
         self.send_all(packets)
+        # applied in the background, bigger files take a bit
+        r = self._wait_for(lambda r: (isinstance(r, ResponseOKMessage) and r.message == b'PATCH') or 
+                           (isinstance(r, ResponseError) and r.code == 0x0F), 40, ResponseDelayMs*4)
+        self.send(self.packet_gen.file_unlink(patchid))
+        if not isinstance(r, ResponseOKMessage):
+            self.output_msg(f"Patch of {remotepath} failed: {r}")
+            return False
+        
+        self.send(self.packet_gen.file_move(newid, oldid))
         self.wait(ResponseDelayMs)
-        self.output_msg(f"File uploaded to {destpath}.  Getting any pending data")
         self.output_msg(self.read_pending())
+        self.output_msg(f"Patched {remotepath}")
+        return True
+    
+    def _bad_blocks(self, varid:int, data:bytes, block_shift:int, remote_size:int=None):
+        # indices of the blocks of data the remote file doesn't (yet) match
+        R = ResponseBlockChecksums
+        block_size = 1 << block_shift
+        num_blocks = (len(data) + block_size - 1) // block_size
+        bad = []
+        for first in range(0, num_blocks, R.MaxBlocks):
+            count = min(R.MaxBlocks, num_blocks - first)
+            offset = first * block_size
+            if remote_size is not None and offset >= remote_size:
+                # not there at all, no need to ask
+                bad.extend(range(first, first + count))
+                continue
+            self.send(self.packet_gen.block_checksums(varid, offset, block_shift, count))
+            crcs = self._wait_for(lambda r: isinstance(r, R) and r.offset == offset and r.shift == block_shift)
+            crcs = crcs.crcs if crcs is not None else []
+            for i in range(count):
+                start = offset + i*block_size
+                if i >= len(crcs) or crcs[i] != crc32(data[start:(start + block_size)]):
+                    bad.append(first + i)
+        return bad
+    
+    def _remote_file_size(self, varid:int):
+        self.send(self.packet_gen.filesize(varid))
+        r = self._wait_for(lambda r: isinstance(r, ResponseFile) and r.rtype == b'SZ')
+        if r is None or r.value == 0xffffff:
+            return None
+        return r.value
+    
+    def _remote_checksum(self, varid:int):
+        self.send(self.packet_gen.checksum(varid))
+        # worked out in the background, for big files it may take a bit
+        r = self._wait_for(lambda r: isinstance(r, ResponseFile) and r.rtype == b'CS', 20, ResponseDelayMs*4)
+        return r.value if r is not None else None
+    
+    def _wait_for(self, accept, tries:int=10, delay_ms:int=ResponseDelayMs):
+        # first response accept() takes, None if it doesn't show
+        for _i in range(tries):
+            self.wait(delay_ms)
+            for r in self.read_pending() or []:
+                if accept(r):
+                    return r
+        return None
         
-        self.output_msg(f"Issuing request for size and checksum now")
-        self.send(self.packet_gen.filesize(destid))
-        self.send(self.packet_gen.checksum(destid))
+    
+    def download_file(self, filepath:str, localpath:str=None, window:int=1024, chunk:int=0, max_requests:int=256):
+        '''
+            download_file
+            @param filepath: full path of the (remote) file
+            @param localpath: optional local file to save it to
+            @param window: bytes streamed per request (up to 65535)
+            @param chunk: bytes per response (0 for the board's default)
+            
+            Opens the file for reading and has it streamed down ('FT') a 
+            window at a time.  Every chunk says where it's from, so whatever
+            didn't make it is asked for again, range by range, until the 
+            end of the file has been seen and nothing is missing.
+            Returns the contents, or None if that didn't happen.
+        '''
+        varid = 1
+        self.output_msg(f"Download {filepath}")
+        packets = self.packet_gen.setvar_list(varid, filepath)
+        packets.append(self.packet_gen.open_read(varid))
+        self.send_all(packets)
+        self.wait(ResponseDelayMs)
+        self.read_pending()
         
-        self.output_msg(f"Gimme a sec")
-        self.wait(ResponseDelayMs * 5)
-        self.output_msg(self.fetch_pending())
+        data = bytearray()
+        have = bytearray() # 1 for every byte received
+        file_end = -1
+        for _i in range(max_requests):
+            missing = _missing_ranges(have, len(have) if file_end < 0 else file_end)
+            if len(missing):
+                (offset, length) = missing[0]
+            elif file_end < 0:
+                (offset, length) = (len(have), window)
+            else:
+                break
+            if length > 0xffff:
+                length = 0xffff
+            self.send(self.packet_gen.file_stream(offset, length, chunk))
+            
+            idle = 0
+            while idle < 3:
+                self.wait(ResponseDelayMs)
+                got = self.read_pending() or []
+                idle = idle + 1 if not len(got) else 0
+                for r in got:
+                    if isinstance(r, ResponseFileData):
+                        end = r.offset + len(r.data)
+                        if end > len(data):
+                            data.extend(bytearray(end - len(data)))
+                            have.extend(bytearray(end - len(have)))
+                        data[r.offset:end] = r.data
+                        have[r.offset:end] = b'\x01' * len(r.data)
+                    elif isinstance(r, ResponseError) and r.code == 0x09 and len(r.message) == 4:
+                        # EOF, and where
+                        file_end = int.from_bytes(r.message, 'little')
+                    else:
+                        self.output_msg(f'Response: {r}')
+        else:
+            self.output_msg(f"Download of {filepath} incomplete")
+            return None
         
+        self.send(self.packet_gen.file_close())
+        self.wait(ResponseDelayMs)
+        self.read_pending()
+        data = data[:file_end]
+        self.output_msg(f"Downloaded {filepath}: {len(data)} bytes")
+        if localpath is not None:
+            with open(localpath, 'wb') as f:
+                f.write(data)
+        return data
     
     def check_file(self, filepath:str):
         '''
@@ -400,8 +662,15 @@ class SatelliteSimulator:
         self.print_response()
         self.send(self.packet_gen.checksum(varid))
         self.output_msg("Getting checksum... give it a sec")
-        self.wait(ResponseDelayMs*4)
-        return self.print_response()
+        # worked out in the background, for big files it may take a bit
+        rcvd = []
+        for _i in range(20):
+            self.wait(ResponseDelayMs*4)
+            v = self.print_response() or []
+            rcvd.extend(v)
+            if any(isinstance(r, ResponseFile) and r.rtype == b'CS' for r in v):
+                break
+        return rcvd
         
     def file_move(self, srcpath:str, destpath:str):
         '''
@@ -462,20 +731,10 @@ class SatelliteSimulator:
         '''
             check_file_local
             Check the size and calculate the same checksum as is 
-            done on the spasic module.
+            done on the spasic module (CRC-32).
         '''
         sz = os.stat(filepath)[6]
-        
-        f = open(filepath, 'rb')
-        
-        csum = 0
-        v = f.read(4)
-        while len(v):
-            nval = int.from_bytes(v, 'little')
-            csum = csum ^ nval
-            v = f.read(4)
-            
-        f.close()
+        csum = file_crc32(filepath)
             
         print(f'Local file {filepath}:\n size: {sz}\n checksum: {hex(csum)}')
         
@@ -497,13 +756,13 @@ class SatelliteSimulator:
         
         
     def csv_sequence_get_responses(self, outfile):
-        self.read_block()
-        pending_data = None 
         if outfile is not None:
-            pending_data = self.incoming_data.clone()
+            self.raw_log = bytearray()
         responses = self.fetch_pending()
         blkidx = 0
         if outfile is not None:
+            pending_data = self.raw_log
+            self.raw_log = None
             while len(pending_data) >= (blkidx*16)+16:
                 start = blkidx*16
                 rawdata = pending_data[start:start+16]
@@ -528,7 +787,7 @@ class SatelliteSimulator:
         if output_csv is not None:
             outfile = open(output_csv, 'w')
             
-        self.incoming_data.reset()
+        self.decoder.reset()
             
         with open(csvfilepath, 'r') as csv:
             lastActionDateTime = time.time()
@@ -680,13 +939,21 @@ class SatelliteSimulator:
             while blk != empty:
                 if self.echo_blocks:
                     print(','.join(map(lambda x: hex(x) if x>15 else f' {hex(x)}', blk)))
-                self.incoming_data.extend(blk)
+                self.received(blk)
                 self.wait(2)
                 blk = self._i2c.readfrom(SlaveAddress, 16)
                 
         except Exception as e:
             print(e)
-            self.incoming_data.extend(empty)
+        
+        # a status' result (no length byte) runs 
+        # to the end of what was read
+        self.decoder.end_transfer()
+            
+    def received(self, bts:bytearray):
+        if self.raw_log is not None:
+            self.raw_log.extend(bts)
+        self.decoder.feed(bts)
     
     
         
@@ -805,37 +1072,23 @@ class SatelliteSimulator:
         '''
             read blocks of 16 bytes until you hit 
             and "empty" response (all 0x00)
-            and interpret the data
+            and interpret the data.  A response that's only 
+            partly in gets finished on the next read, if it's 
+            coming, or the next call.
         '''
-        empty = bytearray([0x00]*16)
-        rcvd = []
         self.read_block()
+        rcvd = self.decoder.responses()
         num_attempts = 0
-        while len(self.incoming_data) and num_attempts < 20:
-            # read til empty
-            while len(self.incoming_data) >= len(empty) and self.incoming_data[:len(empty)] == empty:
-                self.incoming_data.consume(len(empty))
-            
-            try:
-                # print(f"Parsing {self.incoming_data}")
-                parsed_resp =  ResponseFactory.constructFrom(self.incoming_data)
-                if parsed_resp is not None:
-                    rcvd.append(parsed_resp)
-                else:
-                    num_attempts += 1
-                    curlen = len(self.incoming_data)
-                    self.read_block()
-                    if curlen == len(self.incoming_data):
-                        # nothing new coming in... forget it.
-                        return rcvd
-                    
-            except:
-                print(f"Issue parsing block (partial?) {self.incoming_data}")
-                self.wait(35)
-                return rcvd
-                
-            
+        while self.decoder.partial and num_attempts < 20:
+            # rest of it may not be in the slave buffer yet
+            num_attempts += 1
             self.wait(35)
+            fed = self.decoder.bytes_fed
+            self.read_block()
+            if fed == self.decoder.bytes_fed:
+                # nothing new coming in... leave it for next time
+                break
+            rcvd.extend(self.decoder.responses())
             
         return rcvd
                 
@@ -848,15 +1101,17 @@ class PacketConstructor(SatelliteSimulator):
         self.dump_ascii = dumpAscii
         self.accumulate_packets = accumulate_packets
         self.extend_packets = True
+        self.batch_packets = False # pack short commands into batch frames
         self.prefix = prefix
         self._packets = []
+        self._unbatched = []
         self.ReadAction = 'READ'
         self._pending_responses = []
         self._pending_resp_idx = 0
         
     def have_pending(self):
-        print(f"HAVE PENDING {len(self.incoming_data)}")
-        return len(self.incoming_data)
+        print(f"HAVE PENDING {len(self.decoder)}")
+        return len(self.decoder)
     def set_simulated_pending(self, resps):
         
         self._pending_responses = []
@@ -867,12 +1122,17 @@ class PacketConstructor(SatelliteSimulator):
                 rbytes = bytes.fromhex(r)
             
             
-            self.incoming_data.extend(rbytes)
+            self.received(rbytes)
+            self.decoder.end_transfer()
             # self._pending_responses.append(rbytes)
             
             
     
     def packets(self):
+        if len(self._unbatched):
+            for p in self.packet_gen.batch_list(self._unbatched):
+                self._accumulate(p)
+            self._unbatched = []
         pkts = self._packets 
         self._packets = []
         return pkts
@@ -880,8 +1140,6 @@ class PacketConstructor(SatelliteSimulator):
     def read_block(self):
         # self._packets.append(self.ReadAction)
         #print("READBLK")
-        #if not len(self.incoming_data):
-        #    self.incoming_data.extend(bytearray(16))
         pass
     
     def wait(self, ms:int):
@@ -896,25 +1154,11 @@ class PacketConstructor(SatelliteSimulator):
             send raw bytes over to device
         '''
         if self.accumulate_packets:
-            saved_bts = bytearray(bts)
-            nb = len(saved_bts)
-            
-            if self.extend_packets:
-                if nb < 8:
-                    saved_bts.extend(bytearray(8 - nb))
-                
-                self._packets.append(saved_bts)
+            if self.batch_packets:
+                # packed when packets() gets called
+                self._unbatched.append(bytearray(bts))
             else:
-                i=0
-                if len(self._packets):
-                    while len(self._packets[-1]) < 8 and i<len(saved_bts):
-                        self._packets[-1] += bytearray([saved_bts[i]])
-                        i+=1
-                        
-                for j in range(i, len(saved_bts), 8):
-                    chunk = saved_bts[j:j + 8]
-                    self._packets.append(chunk)
-
+                self._accumulate(bts)
                 
         hexbts = bytearray(bts)
         if len(hexbts) < 8:
@@ -933,6 +1177,25 @@ class PacketConstructor(SatelliteSimulator):
         for p in packets:
             self.send(p)
     
+    def _accumulate(self, bts:bytearray):
+        saved_bts = bytearray(bts)
+        nb = len(saved_bts)
+        
+        if self.extend_packets:
+            if nb < 8:
+                saved_bts.extend(bytearray(8 - nb))
+            
+            self._packets.append(saved_bts)
+        else:
+            i=0
+            if len(self._packets):
+                while len(self._packets[-1]) < 8 and i<len(saved_bts):
+                    self._packets[-1] += bytearray([saved_bts[i]])
+                    i+=1
+                    
+            for j in range(i, len(saved_bts), 8):
+                chunk = saved_bts[j:j + 8]
+                self._packets.append(chunk)
         
 
     def __repr__(self):
@@ -14,7 +14,7 @@ import machine
 import _thread
 from ttboard.demoboard import DemoBoard # keep this
 import i2c_server_globals as i2cglb
-import spasic.cnc.response.response as rsp
+import spasic.cnc.response.writers as wr
 
 try:
     import spasic.settings as sts
@@ -31,8 +31,11 @@ from spasic.experiment.experiment_list import getExperiment
 from ttboard.mode import RPMode
 import spasic.util.watchdog
 
+from spasic.cnc.dispatch import command, dispatch
+import spasic.cnc.metrics as metrics
 import i2c_server_handlers as handlers
-from i2c_server_handlers import queue_response
+from i2c_server_handlers import queue_response, queue_telemetry
+import spasic.i2c.tx_arena as txa
 
 
 
@@ -46,200 +49,191 @@ def tx_buffer_empty_cb():
 
 
 def i2c_data_in(numbytes:int, bts:bytearray):
+    # commands are 8 byte writes: if the low-level 
+    # side hands us more than that in one go, it's 
+    # a number of frames back to back
     btslen = int(numbytes)
-    if btslen > 8:
-        btslen = 8
-        
-    if len(bts) and btslen:
-        i2cglb.PendingDataIn[i2cglb.PendingDataNum][0] = btslen
-        for i in range(btslen):
-            i2cglb.PendingDataIn[i2cglb.PendingDataNum][i+1] = bts[i]
-        i2cglb.PendingDataNum += 1
+    if btslen > len(bts):
+        btslen = len(bts)
+    
+    offset = 0
+    while offset < btslen:
+        framelen = btslen - offset
+        if framelen > 8:
+            framelen = 8
+        i2cglb.PendingDataIn.push(framelen, bts, offset)
+        offset += framelen
 
 
     
 def out_queue_length():
-    return len(i2cglb.PendingDataOut)
-    
-def get_and_flush_pending_in():
-    if not i2cglb.PendingDataNum:
-        return []
-    
-    # race condition ?
-    data_rcvd_with_len = list(i2cglb.PendingDataIn)
-    num_msg = int(i2cglb.PendingDataNum)
-    i2cglb.PendingDataNum = 0
-    
-    data_rcvd = []
-    for i in range(num_msg):
-        bts = data_rcvd_with_len[i]
-        data_rcvd.append(bts[1:bts[0]+1])
-    return data_rcvd 
-
+    # bytes waiting in the transmit arenas
+    return len(i2cglb.PendingDataOut) + len(i2cglb.PendingTelemetryOut)
+    
 def process_pending_data():
-    data_rcvd = get_and_flush_pending_in()
-    if not len(data_rcvd):
-        return 0
-
-    # any handler that's involved is found in 
-    # i2c_server_handlers.  Small ones, and the 
-    # experiment runner, are directly here
-    for bts in data_rcvd:
-        typebyte = bts[0]
-        payload = bts[1:]
-        if typebyte == ord('A'):
-            print("Abort")
-            i2cglb.ExpArgs.clear_swap()
-            handlers.abort()
-                
-        elif typebyte == ord('E'):
-            print("Run")
-                
-            if i2cglb.ERes.running:
-                # cancel all args in swap
-                i2cglb.ExpArgs.clear_swap()
-                queue_response(rsp.ResponseError(error_codes.Busy, 
-                                                      i2cglb.ERes.expid.to_bytes(2, 'little')))
-                return 
-            
-            exp_argument_bytes = None
-            if len(payload):
-                exp_id = int.from_bytes(payload[:2], 'little')
-                if len(payload) > 2:
-                    exp_argument_bytes = payload[2:]
-                    i2cglb.ExpArgs.argument_swap += exp_argument_bytes
-            else:
-                exp_id = 0
-            
-            runner = getExperiment(exp_id)
-            if runner is None:
-                i2cglb.ExpArgs.clear_swap()
-                queue_response(rsp.ResponseError(error_codes.UnknownExperiment, bytearray([exp_id])))
-                return 
-            arglen = len(i2cglb.ExpArgs.argument_swap)
-            if  arglen < 14:
-                i2cglb.ExpArgs.argument_swap += bytearray(14 - arglen)
-                
-            
-            i2cglb.ERes.expid = exp_id
-            i2cglb.ERes.start()
-            i2cglb.ExpArgs.start(i2cglb.ExpArgs.argument_swap)
-            
-            # print(f"exp args for run {i2cglb.ExpArgs.argument_bytes}")
-            
-            # clear swap
-            i2cglb.ExpArgs.clear_swap()
-            i2cglb.ExperimentRun = True
-            
-            respmsg = b'EXP'
-            respmsg += exp_id.to_bytes(2, 'little')
-            
-            # ok response
-            responseObj = rsp.ResponseOKMessage(respmsg)
-            
-            # always ensure we start fresh in ASIC_RP_CONTROL mode,
-            # just in case an experiment messed with it.
-            DemoBoard.get().mode = RPMode.ASIC_RP_CONTROL
-            try:
-                _thread.start_new_thread(runner, (i2cglb.ExpArgs, i2cglb.ERes,))
-            except:
-                # the only reason this might throw, afaik, is 
-                # if something is already running on core1...
-                # either way: not working out, return error instead
-                responseObj = rsp.ResponseError(error_codes.UnterminatedCore1Experiment, b'CORBZY')
-                
-            queue_response(responseObj)
-        elif typebyte == ord('E') + ord('A'):
-            # experiment args
-            print("ExpArg")
-            if not len(i2cglb.ExpArgs.argument_swap):
-                i2cglb.ExpArgs.argument_swap = payload 
-            else:
-                i2cglb.ExpArgs.argument_swap += payload 
-                
-            # print(f"Parms now {i2cglb.ExpArgs.argument_swap}")
-            
-        elif typebyte == ord('E') + ord('Q'):
-            # experiment queue
-            if len(payload):
-                exp_id = int.from_bytes(payload[:2], 'little')
-                if len(payload) > 2:
-                    exp_argument_bytes = payload[2:]
-                    i2cglb.ExpArgs.argument_swap += exp_argument_bytes
-            else:
-                exp_id = 0
-                
-            runner = getExperiment(exp_id)
-            if runner is None:
-                i2cglb.ExpArgs.clear_swap()
-                queue_response(rsp.ResponseError(error_codes.UnknownExperiment, bytearray([exp_id])))
-                return 
-            
-            i2cglb.ExperimentQueue.append((exp_id, i2cglb.ExpArgs.argument_swap,))
-            i2cglb.ExpArgs.clear_swap()
-            queue_response(rsp.ResponseOKMessage(bytearray([ord('E'), ord('Q'), exp_id % 256])))
-            
-                
-        elif typebyte == ord('E') + ord('I'):
-            # experiment immediate result
-            print("ExpImm")
-            res = i2cglb.ERes
-            if not res.expid:
-                queue_response(rsp.ResponseError(error_codes.UnknownExperiment, b'NOXP'))
-                return 
-            
-            queue_response(rsp.ResponseExperiment(res.expid, res.completed, 
-                                                  res.exception_type_id, 
-                                                  res.result))
-            
-        elif typebyte == ord('F'):
-            # b'FS' VARID -- read size
-            # b'FZ' VARID -- read checksum
-            # b'FO' VARID 'R'|'W' -- open for read or write
-            # b'FD' VARID -- make a directory (including parents)
-            # b'FU' VARID -- unlink/delete a file
-            # b'FM' SRCVARID DESTVARID -- move SRC to DEST
-            return handlers.fs_action_on_vid(payload)
+    # frames are handled in place, straight out of the 
+    # ring, and only released once their handler is done 
+    ring = i2cglb.PendingDataIn
+    num_processed = 0
+    bts = ring.peek()
+    while bts is not None:
+        try:
+            # O(1) lookup on the type byte, see spasic.cnc.dispatch. 
+            # A handler returning early (e.g. after queueing an 
+            # error) doesn't affect the frames that follow
+            dispatch(bts)
+        finally:
+            ring.pop()
+        num_processed += 1
+        bts = ring.peek()
         
-        elif typebyte == ord('F') + ord('C'):
-            print("file close")
-            handlers.fs_file_close()
-                
-        elif typebyte == ord('F') + ord('R'):
-            handlers.fs_file_read(payload)
-            
-        elif typebyte == ord('F') + ord('W'):
-            handlers.fs_file_write(payload)
-        elif typebyte == ord('I'):
-            handlers.info()
-        elif typebyte == ord('P'):
-            print("Ping")
-            queue_response(rsp.ResponseOKMessage(payload))
-        elif typebyte == ord('R'):
-            print("Reboot")
-            spasic.util.watchdog.force_reboot()
-            queue_response(rsp.ResponseOK())
+    return num_processed
+    
+# Commands handled directly here: the experiment runner and 
+# small ones.  Everything else is registered, with the 
+# same @command decorator, in i2c_server_handlers.
+# NOTE: payloads are views into the incoming ring, copy 
+# anything that needs to outlive the call
 
-        elif typebyte == ord('S'):
-            print("Status")
-            res = i2cglb.ERes
-            queue_response(rsp.ResponseStatus(res.running, res.expid, res.exception_type_id,
-                                              res.run_duration, res.result))
-            
-        elif typebyte == ord('T'):
-            print("Clock")
-            handlers.time_sync(payload)
-        elif typebyte == ord('V'):
-            print("Var get")
-            handlers.variable_get(payload)
+@command('A')
+def cmd_abort(_payload:memoryview):
+    i2cglb.ExpArgs.clear_swap()
+    handlers.abort()
+
+@command('E')
+def cmd_experiment_run(payload:memoryview):
+    if i2cglb.ERes.running:
+        # cancel all args in swap
+        i2cglb.ExpArgs.clear_swap()
+        queue_response(wr.error(error_codes.Busy, 
+                                              i2cglb.ERes.expid.to_bytes(2, 'little')))
+        return 
+    
+    exp_argument_bytes = None
+    if len(payload):
+        exp_id = int.from_bytes(payload[:2], 'little')
+        if len(payload) > 2:
+            exp_argument_bytes = payload[2:]
+            i2cglb.ExpArgs.argument_swap += exp_argument_bytes
+    else:
+        exp_id = 0
+    
+    runner = getExperiment(exp_id)
+    if runner is None:
+        i2cglb.ExpArgs.clear_swap()
+        queue_response(wr.error(error_codes.UnknownExperiment, bytearray([exp_id % 256])))
+        return 
+    arglen = len(i2cglb.ExpArgs.argument_swap)
+    if  arglen < 14:
+        i2cglb.ExpArgs.argument_swap += bytearray(14 - arglen)
         
-        elif typebyte == ord('V') + ord('S'):
-            print("Var set")
-            handlers.variable_set(payload)
-            
-        elif typebyte == ord('V') + ord('A'):
-            print("Var app")
-            handlers.variable_append(payload)
+    
+    i2cglb.ERes.expid = exp_id
+    i2cglb.ERes.start()
+    i2cglb.ExpArgs.start(i2cglb.ExpArgs.argument_swap)
+    
+    # print(f"exp args for run {i2cglb.ExpArgs.argument_bytes}")
+    
+    # clear swap
+    i2cglb.ExpArgs.clear_swap()
+    i2cglb.ExperimentRun = True
+    
+    respmsg = b'EXP'
+    respmsg += exp_id.to_bytes(2, 'little')
+    
+    # ok response
+    responseObj = wr.ok_message(respmsg)
+    
+    # always ensure we start fresh in ASIC_RP_CONTROL mode,
+    # just in case an experiment messed with it.
+    DemoBoard.get().mode = RPMode.ASIC_RP_CONTROL
+    try:
+        _thread.start_new_thread(runner, (i2cglb.ExpArgs, i2cglb.ERes,))
+    except:
+        # the only reason this might throw, afaik, is 
+        # if something is already running on core1...
+        # either way: not working out, return error instead
+        responseObj = wr.error(error_codes.UnterminatedCore1Experiment, b'CORBZY')
+        
+    queue_response(responseObj)
+    
+@command('EA')
+def cmd_experiment_args(payload:memoryview):
+    if not len(i2cglb.ExpArgs.argument_swap):
+        i2cglb.ExpArgs.argument_swap = bytearray(payload)
+    else:
+        i2cglb.ExpArgs.argument_swap += payload 
+        
+    # print(f"Parms now {i2cglb.ExpArgs.argument_swap}")
+    
+@command('EQ')
+def cmd_experiment_queue(payload:memoryview):
+    if len(payload):
+        exp_id = int.from_bytes(payload[:2], 'little')
+        if len(payload) > 2:
+            exp_argument_bytes = payload[2:]
+            i2cglb.ExpArgs.argument_swap += exp_argument_bytes
+    else:
+        exp_id = 0
+        
+    runner = getExperiment(exp_id)
+    if runner is None:
+        i2cglb.ExpArgs.clear_swap()
+        queue_response(wr.error(error_codes.UnknownExperiment, bytearray([exp_id % 256])))
+        return 
+    
+    i2cglb.ExperimentQueue.append((exp_id, i2cglb.ExpArgs.argument_swap,))
+    i2cglb.ExpArgs.clear_swap()
+    queue_response(wr.ok_message(bytearray([ord('E'), ord('Q'), exp_id % 256])))
+    
+@command('EI')
+def cmd_experiment_immediate(_payload:memoryview):
+    res = i2cglb.ERes
+    if not res.expid:
+        queue_response(wr.error(error_codes.UnknownExperiment, b'NOXP'))
+        return 
+    
+    queue_response(wr.experiment(res.expid, res.completed, 
+                                          res.exception_type_id, 
+                                          res.result))
+
+@command('EF')
+def cmd_experiment_fragment(payload:memoryview):
+    # 'EF' OFFSET(2) [SIZE] -- piece of the whole current result,
+    # for those longer than what fits in an experiment response
+    # (see spasic.cnc.response.fragments)
+    res = i2cglb.ERes
+    if not res.expid:
+        queue_response(wr.error(error_codes.UnknownExperiment, b'NOXP'))
+        return
+
+    offset = 0
+    size = sts.ExperimentFragmentSize
+    if len(payload) >= 2:
+        offset = payload[0] | (payload[1] << 8)
+    if len(payload) > 2 and payload[2]:
+        size = payload[2]
+    if offset > len(res.result):
+        queue_response(wr.error(error_codes.EndOfFile, b'EF'))
+        return
+
+    queue_response(wr.experiment_fragment(res.expid, res.result, offset, size))
+
+@command('P')
+def cmd_ping(payload:memoryview):
+    queue_response(wr.ok_message(payload))
+    
+@command('R')
+def cmd_reboot(_payload:memoryview):
+    print("Reboot")
+    spasic.util.watchdog.force_reboot()
+    queue_response(wr.ok())
+
+@command('S')
+def cmd_status(_payload:memoryview):
+    res = i2cglb.ERes
+    queue_response(wr.status(res.running, res.expid, res.exception_type_id,
+                                      res.run_duration, res.result))
 
 _I2CDevSingleton = None
 def get_i2c_device():
@@ -247,7 +241,9 @@ def get_i2c_device():
     if _I2CDevSingleton is None:
         # create our slave device
         _I2CDevSingleton = I2CDevice(address=sts.DeviceAddress, scl=sts.I2CSCL, sda=sts.I2CSDA,
-                        baudrate=sts.I2CBaudRate)
+                        baudrate=sts.I2CBaudRate, txqueue=i2cglb.PendingDataOut,
+                        txqueue_low=i2cglb.PendingTelemetryOut)
+        i2cglb.I2CDev = _I2CDevSingleton
     
     return _I2CDevSingleton
 
@@ -270,7 +266,7 @@ def POST(numiterations:int=2):
             print(f"Had {num_fails} failures on first test, skipping second.")
             ret_bytes = bytearray(5)
             ret_bytes[0:4] = num_fails.to_bytes(4, 'little')
-            queue_response(rsp.ResponseError(error_codes.POSTTestFail, ret_bytes))
+            queue_response(wr.error(error_codes.POSTTestFail, ret_bytes))
             return
         
         print("Done!  Launching bidirs")
@@ -286,9 +282,9 @@ def POST(numiterations:int=2):
             ret_bytes = bytearray(5)
             ret_bytes[4] = 1
             ret_bytes[0:4] = num_fails.to_bytes(4, 'little')
-            queue_response(rsp.ResponseError(error_codes.POSTTestFail, ret_bytes))
+            queue_response(wr.error(error_codes.POSTTestFail, ret_bytes))
         else:
-            queue_response(rsp.ResponseOKMessage(b'POST'))
+            queue_response(wr.ok_message(b'POST'))
             
         if num_fails:
             print(f"\nPOST FAILURES: {num_fails}\n")
@@ -372,16 +368,22 @@ def process_experiment_queue():
 def main_loop(runtimes:int=0):
     global ReservedMemoryBlock
     i2c_dev = get_i2c_device()
+    sched = i2cglb.LoopSched
     loop_count = 0
     auto_resp_count = 0
-    while True and (runtimes == 0 or loop_count < runtimes):
+    i2cglb.MainLoopStopRequested = False
+    while not i2cglb.MainLoopStopRequested and (runtimes == 0 or loop_count < runtimes):
         loop_count += 1
+        sched.pass_start()
+        metrics.note_pass()
         try:
             # check if low-level i2c has 
             # flagged pending data and, if so, 
             # trigger the fetch/user-callback mech 
             # to move this data into our globals here
-            i2c_dev.poll_pending_data()
+            num_fetched = i2c_dev.poll_pending_data()
+            if num_fetched:
+                sched.note_rx()
             
             # if an experiment run is ongoing
             # but it's no longer stating itself 
@@ -397,7 +399,7 @@ def main_loop(runtimes:int=0):
                     gc.collect()
                     # micropython.mem_info()
                     auto_resp_count = 0
-                    queue_response(rsp.ResponseExperiment(expresult.expid, expresult.completed, 
+                    queue_response(wr.experiment(expresult.expid, expresult.completed, 
                                                           expresult.exception_type_id, 
                                                           expresult.result))
                     
@@ -414,67 +416,81 @@ def main_loop(runtimes:int=0):
             num_incoming = process_pending_data()
             if num_incoming:
                 print(f"{num_incoming} msgs")
+            
+            # a file download ('FT') in progress keeps going, as 
+            # far as the reply arena has room, a file checksum 
+            # ('FZ', 'FK') gets a few more blocks done, as does a patch 
+            # ('FP'), and an upload that's gone quiet gets its buffered 
+            # bytes written out
+            num_background = handlers.fs_stream_pump()
+            num_background += handlers.fs_checksum_pump()
+            num_background += handlers.fs_patch_pump()
+            num_background += i2cglb.FileSystem.service()
                 
             # since we're polling, and these writes a just 8-bytes (pretty quick
             # and we're pretty slow), poll again before dealing with out bytes
-            i2c_dev.poll_pending_data()
+            num_fetched_late = i2c_dev.poll_pending_data()
                 
-            # pending output data may be split into
-            # little chunks of less that 16 bytes, which is
-            # how much gets read out at a time.  We smoosh 
-            # all this into one contiguous bytearray
-            out_data = bytearray()
-            for outbytes in i2cglb.PendingDataOut:
-                out_data += outbytes
-            
-            # reset the global out data list
-            i2cglb.PendingDataOut = []
+            # responses are encoded straight into the transmit 
+            # arenas (i2cglb.PendingDataOut for replies, PendingTelemetryOut
+            # for auto-reports), which are also the device's outgoing 
+            # lanes: nothing to gather up here.
             
-            # if we have some out data, shoot that 
-            # off to the device so it can feed it 
-            # out to master as it requests it
+            # if the slave buffer has been drained, feed it
+            # whatever is next in line
             i2c_dev.push_outgoing_data()
             
             time_now = time.time()
-            if len(out_data):
-                print(f"data out: {out_data}")
-                i2c_dev.queue_outdata(out_data)
+            sent = False
+            if i2cglb.PendingDataOut.new_data or i2cglb.PendingTelemetryOut.new_data:
+                i2cglb.PendingDataOut.new_data = False
+                i2cglb.PendingTelemetryOut.new_data = False
+                i2c_dev.queue_outdata()
                 i2cglb.LastAutoMessageTime = time_now 
+                sent = True
             else:
                 # nothing queued for output
                 if i2cglb.ExperimentRun: 
                     # currently running an experiment
+                    # auto-reports go in the background lane, keyed: if the 
+                    # master isn't reading, each kind just replaces its 
+                    # predecessor, so there's no backlog to worry about
                     if (time_now - i2cglb.LastAutoMessageTime) >= sts.MinDelayForAutoReportSecs:
                         auto_resp_count += 1
                         i2cglb.LastAutoMessageTime = time_now 
-                        if auto_resp_count >= 30:
-                            # we skip one to ensure we never end up out of clock sync and grow giant buffer
-                            # don't send, and reset count
-                            auto_resp_count = 0
-                        elif auto_resp_count % sts.AutoReportPeriodInfo == 0:
-                            handlers.info()
+                        if auto_resp_count % sts.AutoReportPeriodInfo == 0:
+                            queue_telemetry(handlers.info_response(), txa.ReportInfo)
                         elif auto_resp_count % sts.AutoReportPeriodStatus == 0:
-                            queue_response(rsp.ResponseStatus(expresult.running, expresult.expid, expresult.exception_type_id,
-                                              expresult.run_duration, expresult.result))
+                            queue_telemetry(wr.status(expresult.running, expresult.expid, expresult.exception_type_id,
+                                              expresult.run_duration, expresult.result), txa.ReportStatus)
                         else:
-                            queue_response(rsp.ResponseExperiment(expresult.expid, expresult.completed, 
+                            queue_telemetry(wr.experiment(expresult.expid, expresult.completed, 
                                                           expresult.exception_type_id, 
-                                                          expresult.result))
+                                                          expresult.result), txa.ReportExperiment)
                 else:
                     if (time_now - i2cglb.LastAutoMessageTime) >= (sts.AutoReportIdleMultiplier*sts.MinDelayForAutoReportSecs):
                         auto_resp_count += 1
                         i2cglb.LastAutoMessageTime = time_now 
                         
                         if auto_resp_count % 2 == 0:
-                            handlers.info()
+                            queue_telemetry(handlers.info_response(), txa.ReportInfo)
                         else:
-                            queue_response(rsp.ResponseStatus(expresult.running, expresult.expid, expresult.exception_type_id,
-                                              expresult.run_duration, expresult.result))
+                            queue_telemetry(wr.status(expresult.running, expresult.expid, expresult.exception_type_id,
+                                              expresult.run_duration, expresult.result), txa.ReportStatus)
             
             
+            if num_incoming:
+                sched.note_response(sent)
+            if num_fetched_late:
+                # these get processed next time around
+                sched.note_rx()
+            
             # sleep a bit to yield so under the hood
-            # magiks can happen if required
-            time.sleep_ms(1)
+            # magiks can happen if required.  How long depends 
+            # on how busy we've been, but anything happening on 
+            # the bus in the meantime wakes us right up
+            sched.pass_end(num_fetched or num_fetched_late or num_incoming or num_background or sent)
+            sched.wait(i2c_dev.needs_service)
             if ReservedMemoryBlock is not None:
                 ReservedMemoryBlock = None # free her up  
                 print()
@@ -485,21 +501,22 @@ def main_loop(runtimes:int=0):
             # report this unexpected error
             # but don't send a storm of them, if something 
             # goes terribly wrong
-            if (out_queue_length() < 6 and i2c_dev.outdata_queue_size < (16*5)):
+            if out_queue_length() < (16*5):
                 except_id = i2cglb.ExpResult.exception_to_id(e)
                 
                 ex_type_bts = bytearray([except_id])
                 
-                if e.value is not None:
+                e_value = getattr(e, 'value', None)
+                if e_value is not None:
                     try:
-                        if len(e.value):
-                            ex_type_bts += bytearray(e.value, 'ascii')
+                        if len(e_value):
+                            ex_type_bts += bytearray(e_value, 'ascii')
                         if len(ex_type_bts) > 12:
                             ex_type_bts = ex_type_bts[:12]
                     except:
                         pass
                 
                 print(f"EX {except_id}: {ex_type_bts}")
-                queue_response(rsp.ResponseError(error_codes.RuntimeExceptionCaught, ex_type_bts))
+                queue_response(wr.error(error_codes.RuntimeExceptionCaught, ex_type_bts))
                 if sts.DebugUseSimulatedI2CDevice or sts.RaiseAndBreakMainOnException:
                     raise e
@@ -3,20 +3,35 @@ from spasic.fs.filesystem import FSAccess
 from spasic.variables.variables import Variables
 from spasic.experiment.experiment_result import ExpResult
 from spasic.experiment.experiment_parameters import ExperimentParameters
+from spasic.i2c.frame_ring import FrameRing
+from spasic.i2c.tx_arena import TxArena, DropOldest, DropNewest
+from spasic.cnc.response.framing import LaneTelemetry
+from spasic.cnc.scheduler import LoopScheduler
 from ttboard.demoboard import DemoBoard
+try:
+    import spasic.settings as sts
+except:
+    import spasic.settings_safe as sts
 
-FileSystem = FSAccess()
+FileSystem = FSAccess(sts.ChecksumIndexPath, sts.FileWriteBufferSize, sts.FileWriteIdleMs)
 ERes = ExpResult()
 ExpArgs = ExperimentParameters(DemoBoard.get())
 ClientVariables = Variables()
-PendingDataIn = [bytearray(9), bytearray(9), bytearray(9), bytearray(9), bytearray(9), bytearray(9)]
-PendingDataNum = 0
-PendingDataOut = []
+PendingDataIn = FrameRing(sts.I2CInFrameRingDepth)
+PendingDataOut = TxArena(sts.I2CTxArenaSize, high_water=sts.I2CTxHighWater)
+PendingTelemetryOut = TxArena(sts.I2CTxTelemetryArenaSize, max_frames=sts.I2CTxTelemetryMaxFrames,
+                              high_water=sts.I2CTxTelemetryHighWater, 
+                              drop_policy=DropOldest if sts.I2CTxTelemetryDropOldest else DropNewest,
+                              frame_lane=LaneTelemetry)
+LoopSched = LoopScheduler(sts.MainLoopSleepMinMs, sts.MainLoopSleepMaxMs, 
+                          sts.MainLoopIdleBackoffMs, sts.MainLoopWakeCheckMs)
 ExperimentQueue = []
 ExperimentRun = False
 LastTimeSyncMessageTime = -1
 LastTimeSyncValue = 0
 LastAutoMessageTime = 0
+MainLoopStopRequested = False # set to have main_loop return
+I2CDev = None # the I2CDevice, once i2c_server has created it
 
 def sync_time_now(t_now:int=None):
     if t_now is None:
@@ -3,13 +3,102 @@
 @copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
 '''
 import time
+import gc
 import i2c_server_globals as i2cglb
 import spasic.ver as ver
 import spasic.cnc.response.response as rsp
+import spasic.cnc.response.writers as wr
+import spasic.cnc.response.framing as framing
+import spasic.cnc.response.delta as delta
+from spasic.fs.stream import FileStreamer
+import spasic.i2c.tx_arena as txa
 import spasic.error_codes as error_codes
+import spasic.cnc.dispatch as dispatch
+import spasic.cnc.metrics as metrics
+from spasic.cnc.dispatch import command
+try:
+    import spasic.settings as sts
+except:
+    import spasic.settings_safe as sts
+
+# while a batch ('B') is being handled, replies to its sub-commands 
+# get gathered here and go out together, as a single ResponseBatch
+BatchItems = bytearray(rsp.ResponseBatch.MaxItemsSize)
+BatchItemsView = memoryview(BatchItems)
+BatchItemsLen = 0
+BatchItemsCount = 0
+BatchItemsLimit = len(BatchItems)
+Batching = False
+
+# response framing, set with 'PV': in protocol v2 everything 
+# queued goes out wrapped in a frame (see spasic.cnc.response.framing)
+Protocol = framing.ProtocolV1
+FrameOut = framing.FrameWriter(False) # numbered by the arenas
+Framer = None # FrameOut, while framing
+MaxFramedRead = framing.MaxFrameBody - 2 # 'D' LEN DATA
+
+def set_protocol(version:int):
+    global Protocol, Framer, BatchItemsLimit
+    Protocol = version
+    if version == framing.ProtocolV2:
+        Framer = FrameOut
+        # 'B' COUNT LEN ITEMS has to fit in a frame
+        BatchItemsLimit = framing.MaxFrameBody - 3
+    else:
+        Framer = None
+        BatchItemsLimit = len(BatchItems)
+
+set_protocol(sts.ResponseProtocolDefault)
+
+def framed(response):
+    if Framer is None:
+        return response
+    return Framer.wrap(response)
 
 def queue_response(response:rsp.Response):
-    i2cglb.PendingDataOut.append(response.bytes)
+    if Batching:
+        return batch_add(response)
+    # encoded straight into the transmit arena the I2C device reads from
+    return i2cglb.PendingDataOut.put(framed(response))
+
+def batch_add(response:rsp.Response):
+    global BatchItemsLen, BatchItemsCount
+    size = len(response)
+    if BatchItemsLen + 1 + size > BatchItemsLimit:
+        # no more room, send what we have so far
+        batch_flush()
+        if 1 + size > BatchItemsLimit:
+            return i2cglb.PendingDataOut.put(framed(response))
+    
+    BatchItems[BatchItemsLen] = size
+    response.encode_into(BatchItems, BatchItemsLen + 1)
+    BatchItemsLen += 1 + size
+    BatchItemsCount += 1
+    return True
+
+def batch_flush():
+    global BatchItemsLen, BatchItemsCount
+    if BatchItemsCount == 1:
+        # lone reply, no need for the wrapper
+        if Framer is None:
+            i2cglb.PendingDataOut.write(BatchItemsView[1:BatchItemsLen], BatchItemsLen - 1)
+        else:
+            i2cglb.PendingDataOut.put(Framer.wrap(BatchItemsView[1:BatchItemsLen]))
+    elif BatchItemsCount:
+        i2cglb.PendingDataOut.put(framed(rsp.ResponseBatch(BatchItemsCount, BatchItemsView[:BatchItemsLen])))
+    BatchItemsLen = 0
+    BatchItemsCount = 0
+
+# auto-reports as deltas on the last full one of their kind, set with 'PD'
+Deltas = delta.DeltaReports(txa.NumReportKeys, sts.AutoReportDeltaKeyframes)
+
+def queue_telemetry(response:rsp.Response, report_key:int=-1):
+    # background lane: only goes out when no replies are waiting.
+    # Auto-reports pass a report_key (spasic.i2c.tx_arena.Report*), so 
+    # only the latest of each kind is kept while the master isn't reading
+    if report_key >= 0 and Deltas.keyframe_every:
+        response = Deltas.report(report_key, response, i2cglb.PendingTelemetryOut)
+    return i2cglb.PendingTelemetryOut.put(framed(response), report_key)
     
 
 def abort():
@@ -17,80 +106,234 @@ def abort():
     if i2cglb.ERes.running:
         respmsg = b'TRM'
         respmsg += i2cglb.ERes.expid.to_bytes(2, 'little')
-        queue_response(rsp.ResponseOKMessage(respmsg))
+        queue_response(wr.ok_message(respmsg))
     else:
-        queue_response(rsp.ResponseOK())
-def fs_file_close():
+        queue_response(wr.ok())
+@command('FC')
+def fs_file_close(_payload:bytearray=None):
+    FileStream.stop()
     if i2cglb.FileSystem.close():
-        queue_response(rsp.ResponseOKMessage(b'CLS'))
+        queue_response(wr.ok_message(b'CLS'))
     else:
-        queue_response(rsp.ResponseError(error_codes.InvalidRequest, b'NOFL?'))
+        queue_response(wr.error(error_codes.InvalidRequest, b'NOFL?'))
         
+@command('FR')
 def fs_file_read(payload:bytearray):
     # TODO:FIXME how much data should we queue per request?
     read_size = 16*4 - 2
     if len(payload) > 0:
         if payload[0]:
             read_size = payload[0]
+    if Framer is not None and read_size > MaxFramedRead:
+        read_size = MaxFramedRead
     
     # print(f"fread {read_size}")
     dat = i2cglb.FileSystem.read_bytes(read_size)
     if not len(dat):
-        return queue_response(rsp.ResponseError(error_codes.EndOfFile))
+        return queue_response(wr.error(error_codes.EndOfFile))
     
     queue_response(rsp.ResponseDataBytes(dat))
     
+# windowed downloads, see spasic.fs.stream: chunks go out from 
+# the main loop (fs_stream_pump()), as the reply arena has room
+FileStream = FileStreamer(i2cglb.FileSystem, sts.FileStreamChunkSize)
+FileDataOverhead = 6 # 0x0B OFFSET(4) LEN
+
+@command('FT')
+def fs_file_stream(payload:bytearray):
+    # b'FT' OFFSET(4) WINDOW(2) [CHUNK] -- stream WINDOW bytes of the 
+    # file open for reading, from OFFSET, CHUNK bytes per response
+    if len(payload) < 6:
+        return queue_response(wr.error(error_codes.InvalidRequest, b'FT'))
+    offset = int.from_bytes(payload[0:4], 'little')
+    window = payload[4] | (payload[5] << 8)
+    chunk = payload[6] if len(payload) > 6 else 0
+    if Framer is not None and chunk > framing.MaxFrameBody - FileDataOverhead:
+        chunk = framing.MaxFrameBody - FileDataOverhead
+    if not FileStream.start(offset, window, chunk):
+        FileStream.stop()
+        queue_response(wr.error(error_codes.InvalidRequest, b'NOFL?'))
+
+def fs_stream_pump():
+    '''
+        Queues chunks of the download in progress, if any, while 
+        they fit.  Returns the number queued.
+    '''
+    st = FileStream
+    out = i2cglb.PendingDataOut
+    overhead = FileDataOverhead + (framing.FrameOverhead if Framer is not None else 0) + sts.FileStreamHeadroom
+    num = 0
+    while st.active and out.free >= overhead + st.next_size():
+        offset = st.offset
+        n = st.read_chunk()
+        if not n:
+            queue_response(wr.error(error_codes.EndOfFile, offset.to_bytes(4, 'little')))
+            break
+        queue_response(wr.file_data(offset, st.buffer, n))
+        num += 1
+    return num
+
+# 'FZ' checksums, worked out a few blocks per main loop pass 
+# (fs_checksum_pump()) unless already known, see spasic.fs.checksum
+FileChecksum = i2cglb.FileSystem.checksum_job()
+
+def fs_checksum_reply(crc:int):
+    queue_response(rsp.ResponseFile(b'CS', crc.to_bytes(4, 'little')))
+
+def fs_checksum_start(filepath:str):
+    fs = i2cglb.FileSystem
+    cs = fs.cached_checksum(filepath)
+    if cs is not None:
+        return fs_checksum_reply(cs)
+    if FileChecksum.active:
+        if FileChecksum.path != filepath:
+            queue_response(wr.error(error_codes.Busy, b'FZ'))
+        # else: the answer is coming
+        return
+    if not FileChecksum.start(filepath, fs.file_size(filepath)):
+        fs_checksum_reply(0xffffff)
+
+# 'FK' block checksums, for resumable uploads: worked 
+# out the same way, next to any 'FZ' in progress
+BlockChecks = i2cglb.FileSystem.block_checksum_job()
+BlockChecksShift = 0
+
+@command('FK')
+def fs_block_checksums(payload:bytearray):
+    # b'FK' VARID OFFSET(4) SHIFT COUNT -- CRC-32s of COUNT blocks 
+    # of 1 << SHIFT bytes, from OFFSET.  Replaces any still going
+    global BlockChecksShift
+    R = rsp.ResponseBlockChecksums
+    if len(payload) < 7:
+        return queue_response(wr.error(error_codes.InvalidRequest, b'FK'))
+    vid = payload[0]
+    shift = payload[5]
+    count = payload[6]
+    if shift < R.MinShift or shift > R.MaxShift or not count or count > R.MaxBlocks:
+        return queue_response(wr.error(error_codes.InvalidRequest, b'FK'))
+    if not i2cglb.ClientVariables.has(vid):
+        return queue_response(wr.error(error_codes.UnknownVariable))
+    # what's been uploaded so far has to be in the file, for the job to see
+    i2cglb.FileSystem.flush_writes(True)
+    offset = int.from_bytes(payload[1:5], 'little')
+    if not BlockChecks.start(i2cglb.ClientVariables.get_string(vid), offset, 1 << shift, count):
+        return queue_response(wr.error(error_codes.CantOpenFile, b'FK'))
+    BlockChecksShift = shift
+
+def fs_checksum_pump():
+    '''
+        Carries on with the checksums in progress, if any, 
+        and replies once they're done.  Returns how many 
+        it did anything for.
+    '''
+    num = 0
+    if FileChecksum.active:
+        num += 1
+        if FileChecksum.step(sts.ChecksumBlocksPerPass):
+            fs_checksum_reply(FileChecksum.crc)
+    if BlockChecks.active:
+        num += 1
+        if BlockChecks.step(sts.ChecksumBlocksPerPass):
+            queue_response(wr.block_checksums(BlockChecks.offset, BlockChecksShift, 
+                                              BlockChecks.crcs, BlockChecks.count))
+    return num
+
+# 'FP' patches, applied a few buffers at a time 
+# (fs_patch_pump()), see spasic.fs.patch
+FilePatch = i2cglb.FileSystem.patch_job(sts.PatchBufferSize)
+
+def fs_patch_start(oldpath:str, patchpath:str, newpath:str):
+    if FilePatch.active:
+        return queue_response(wr.error(error_codes.Busy, b'FP'))
+    # the patch may have only just been written
+    i2cglb.FileSystem.flush_writes(True)
+    if not FilePatch.start(oldpath, patchpath, newpath):
+        queue_response(wr.error(error_codes.PatchFailure, FilePatch.error))
+
+def fs_patch_pump():
+    '''
+        Carries on with the patch being applied, if any, 
+        and replies once it's done.  Returns 1 if it did anything.
+    '''
+    if not FilePatch.active:
+        return 0
+    if FilePatch.step(sts.PatchBuffersPerPass):
+        if FilePatch.error is None:
+            queue_response(wr.ok_message(b'PATCH'))
+        else:
+            queue_response(wr.error(error_codes.PatchFailure, FilePatch.error))
+    return 1
+
+@command('FA')
+def fs_file_write_at(payload:bytearray):
+    # b'FA' OFFSET(4) [LEN(2)] -- the 'FW's that follow get written 
+    # to the file open for writing from OFFSET, LEN bytes of them at most
+    if len(payload) < 4:
+        return queue_response(wr.error(error_codes.InvalidRequest, b'FA'))
+    offset = int.from_bytes(payload[0:4], 'little')
+    limit = (payload[4] | (payload[5] << 8)) if len(payload) > 5 else -1
+    if not i2cglb.FileSystem.write_at(offset, limit):
+        queue_response(wr.error(error_codes.WriteFailure, b'FA'))
+
+@command('FW')
 def fs_file_write(payload:bytearray):
     # TODO:FIXME how much data should we queue per request?
-    print(f"fwr {payload}")
+    if sts.DebugFileCommands:
+        print(f"fwr {bytes(payload)}")
     if len(payload) < 1:
         print("payload empty -- ignore!")
         return 
-        # return queue_response(invalidReq)
+        # return queue_response(wr.error(error_codes.InvalidRequest))
     
     if not i2cglb.FileSystem.write_bytes(payload):
         print("WRITE FAILURE")
         # probably don't want to queue errors, 
         # we might end up with a storm
-        # queue_response(rsp.ResponseError(error_codes.WriteFailure))
+        # queue_response(wr.error(error_codes.WriteFailure))
     
+@command('F')
 def fs_action_on_vid(payload:bytearray):
     # b'FS' VARID -- read size
     # b'FZ' VARID -- read checksum
-    # b'FO' VARID 'R'|'W' -- open for read or write
+    # b'FO' VARID 'R'|'W'|'U' -- open for read, write or update (no truncating)
     # b'FD' VARID -- make a directory (including parents)
     # b'FU' VARID -- unlink/delete a file
     # b'FM' SRCVARID DESTVARID -- move SRC to DEST
+    # b'FP' OLDVARID PATCHVARID NEWVARID -- apply PATCH to OLD, as NEW
     # b'FL' VARID -- ls
-    invalidReq = rsp.ResponseError(error_codes.InvalidRequest)
     if len(payload) < 2:
-        return queue_response(invalidReq)
+        return queue_response(wr.error(error_codes.InvalidRequest))
     
     action = payload[0]
     vid = payload[1]
     if not i2cglb.ClientVariables.has(vid):
-        return queue_response(rsp.ResponseError(error_codes.UnknownVariable))
+        return queue_response(wr.error(error_codes.UnknownVariable))
     
     filepath = i2cglb.ClientVariables.get_string(vid)
-    print(f"file action {action} on {filepath}")
+    if sts.DebugFileCommands:
+        print(f"file action {action} on {filepath}")
+    if action == ord('S') or action == ord('Z'):
+        # size and checksum are of what's actually been written
+        i2cglb.FileSystem.flush_writes(True)
     if action == ord('S'):
         sz = i2cglb.FileSystem.file_size(filepath)
         queue_response(rsp.ResponseFile(b'SZ', sz.to_bytes(4, 'little')))
     elif action == ord('Z'):
-        cs = i2cglb.FileSystem.simple_checksum(filepath)
-        queue_response(rsp.ResponseFile(b'CS', cs.to_bytes(4, 'little')))
+        fs_checksum_start(filepath)
         
     elif action == ord('D'):
-        print("mkdir")
+        if sts.DebugFileCommands:
+            print("mkdir")
         if i2cglb.FileSystem.mkdir(filepath):
-            queue_response(rsp.ResponseOKMessage(b'MKDIR'))
+            queue_response(wr.ok_message(b'MKDIR'))
         else:
-            queue_response(rsp.ResponseError(error_codes.MakeDirFailure, bytearray([vid])))
+            queue_response(wr.error(error_codes.MakeDirFailure, bytearray([vid])))
     elif action == ord('L'):
-        print("LS")
+        if sts.DebugFileCommands:
+            print("LS")
         dirs = i2cglb.FileSystem.lsdir(filepath)
         if not len(dirs):
-            queue_response(rsp.ResponseError(error_codes.CantOpenFile, b'BDDIR'))
+            queue_response(wr.error(error_codes.CantOpenFile, b'BDDIR'))
             return 
         for chunk in [dirs[i:i + 14] for i in range(0, len(dirs), 14)]:
             try:
@@ -98,85 +341,203 @@ def fs_action_on_vid(payload:bytearray):
             except:
                 pass
     elif action == ord('U'):
-        print("DEL!")
+        if sts.DebugFileCommands:
+            print("DEL!")
         if i2cglb.FileSystem.delete(filepath):
-            queue_response(rsp.ResponseOKMessage(b'RM'))
+            queue_response(wr.ok_message(b'RM'))
         else:
-            queue_response(rsp.ResponseError(error_codes.DeleteFileFailure, bytearray([vid])))
+            queue_response(wr.error(error_codes.DeleteFileFailure, bytearray([vid])))
     elif action == ord('M'):
         
         if len(payload) < 3:
-            return queue_response(invalidReq)
+            return queue_response(wr.error(error_codes.InvalidRequest))
         
         destvid = payload[2]
         if not i2cglb.ClientVariables.has(destvid):
-            return queue_response(rsp.ResponseError(error_codes.UnknownVariable))
+            return queue_response(wr.error(error_codes.UnknownVariable))
         
         destpath = i2cglb.ClientVariables.get_string(destvid)
-        print(f"mv {filepath} {destpath}")
+        if sts.DebugFileCommands:
+            print(f"mv {filepath} {destpath}")
         if i2cglb.FileSystem.move(filepath, destpath):
-            queue_response(rsp.ResponseOKMessage(b'MV'))
+            queue_response(wr.ok_message(b'MV'))
         else:
-            queue_response(rsp.ResponseError(error_codes.RenameFileFailure))
+            queue_response(wr.error(error_codes.RenameFileFailure))
+    elif action == ord('P'):
+        if len(payload) < 4:
+            return queue_response(wr.error(error_codes.InvalidRequest))
+        
+        for pvid in payload[2:4]:
+            if not i2cglb.ClientVariables.has(pvid):
+                return queue_response(wr.error(error_codes.UnknownVariable))
+        fs_patch_start(filepath, i2cglb.ClientVariables.get_string(payload[2]), 
+                       i2cglb.ClientVariables.get_string(payload[3]))
     elif action == ord('O'):
         if len(payload) < 3:
-            return queue_response(invalidReq)
+            return queue_response(wr.error(error_codes.InvalidRequest))
+        FileStream.stop()
         rw = payload[2]
         if rw == ord('R'):
-            print("oread")
+            if sts.DebugFileCommands:
+                print("oread")
             if not i2cglb.FileSystem.open_for_read(filepath):
-                return queue_response(rsp.ResponseError(error_codes.CantOpenFile))
+                return queue_response(wr.error(error_codes.CantOpenFile))
         elif rw == ord('W'):
-            print("owrite")
+            if sts.DebugFileCommands:
+                print("owrite")
             if not i2cglb.FileSystem.open_for_write(filepath):
-                return queue_response(rsp.ResponseError(error_codes.CantOpenFile))
+                return queue_response(wr.error(error_codes.CantOpenFile))
             pass 
+        elif rw == ord('U'):
+            if sts.DebugFileCommands:
+                print("oupdate")
+            if not i2cglb.FileSystem.open_for_update(filepath):
+                return queue_response(wr.error(error_codes.CantOpenFile))
         else:
-            return queue_response(invalidReq)
+            return queue_response(wr.error(error_codes.InvalidRequest))
 
+@command('V')
 def variable_get(payload:bytearray):
     if len(payload) < 1:
-        queue_response(rsp.ResponseError(error_codes.InvalidRequest))
+        queue_response(wr.error(error_codes.InvalidRequest))
         return
     vid = payload[0]
     if not i2cglb.ClientVariables.has(vid):
-        queue_response(rsp.ResponseError(error_codes.UnknownVariable, bytearray([vid])))
+        queue_response(wr.error(error_codes.UnknownVariable, bytearray([vid])))
         return
     queue_response(rsp.ResponseVariableValue(vid, i2cglb.ClientVariables.get_bytearray(vid)))
 
+@command('VS')
 def variable_set(payload:bytearray):
     if len(payload) < 1:
-        queue_response(rsp.ResponseError(error_codes.InvalidRequest))
+        queue_response(wr.error(error_codes.InvalidRequest))
         return
     vid = payload[0]
     if len(payload) < 2:
-        print("Setting to empty")
+        if sts.DebugFileCommands:
+            print("Setting to empty")
         i2cglb.ClientVariables.set(vid, bytearray())
     else:
-        print(f"Setting to {payload[1:]}")
-        i2cglb.ClientVariables.set(vid, payload[1:])
+        if sts.DebugFileCommands:
+            print(f"Setting to {bytes(payload[1:])}")
+        # payload is only borrowed from the incoming ring, keep a copy
+        i2cglb.ClientVariables.set(vid, bytearray(payload[1:]))
         
-    queue_response(rsp.ResponseOK())
+    queue_response(wr.ok())
     
+@command('VA')
 def variable_append(payload:bytearray):
     if len(payload) < 2:
-        queue_response(rsp.ResponseError(error_codes.InvalidRequest))
+        queue_response(wr.error(error_codes.InvalidRequest))
         return
     vid = payload[0]
     if not i2cglb.ClientVariables.has(vid):
-        queue_response(rsp.ResponseError(error_codes.UnknownVariable, bytearray([vid])))
+        queue_response(wr.error(error_codes.UnknownVariable, bytearray([vid])))
         return
         
     i2cglb.ClientVariables.append(vid, payload[1:])
     
+@command('B')
+def batch(payload:bytearray):
+    # b'B' [LEN CMD[LEN]]... several short commands in one frame,
+    # run in order.  A zero LEN (i.e. padding) ends the list
+    global Batching
+    if Batching:
+        # no nesting
+        return queue_response(wr.error(error_codes.InvalidRequest, b'BNEST'))
+    
+    Batching = True
+    try:
+        idx = 0
+        while idx < len(payload):
+            sublen = payload[idx]
+            if not sublen or idx + 1 + sublen > len(payload):
+                break
+            dispatch.dispatch(payload[(idx + 1):(idx + 1 + sublen)])
+            idx += 1 + sublen
+    finally:
+        Batching = False
+        batch_flush()
+    
+@command('T')
 def time_sync(payload:bytearray):
     i2cglb.LastTimeSyncMessageTime = time.time()
     if len(payload) >= 4:
         i2cglb.LastTimeSyncValue = int.from_bytes(payload, 'little')
         print(f"time {i2cglb.LastTimeSyncValue}")
         
-def info():
+# version doesn't change, only the times need filling in.
+# The comment is tagged with the highest protocol supported
+InfoReport = wr.InfoWriter(ver.major, ver.minor, ver.patch, 
+                           f'P{framing.ProtocolMax}{ver.comment}')
+
+def info_response():
     t_now = int(time.time())
     t_sync = i2cglb.sync_time_now(t_now)
-    queue_response(rsp.ResponseInfo(ver.major, ver.minor, ver.patch, ver.comment, t_now, t_sync))
-    
\ No newline at end of file
+    return InfoReport.set(t_now, t_sync)
+
+@command('I')
+def info(_payload:bytearray=None):
+    queue_response(info_response())
+    
+@command('PD')
+def report_deltas(payload:bytearray):
+    # b'PD' KEYFRAMES -- auto-reports go out in full one time in 
+    # KEYFRAMES, per kind, as deltas otherwise (0: always in full)
+    keyframes = payload[0] if len(payload) else 0
+    Deltas.set_keyframe_every(keyframes)
+    queue_response(wr.ok_message(bytearray([ord('P'), ord('D'), keyframes])))
+    
+@command('PV')
+def protocol_version(payload:bytearray):
+    # b'PV' [VERSION] -- switch response framing, or with no 
+    # (or a 0) VERSION, just get the current one.  The reply goes 
+    # out as the protocol stood when the command came in
+    version = payload[0] if len(payload) else 0
+    if version > framing.ProtocolMax:
+        return queue_response(wr.error(error_codes.InvalidRequest, b'PV'))
+    
+    queue_response(wr.ok_message(bytearray([ord('P'), ord('V'), version if version else Protocol])))
+    if version:
+        set_protocol(version)
+    
+def metrics_response(page:int):
+    M = rsp.ResponseMetrics
+    if page == M.PageLoop:
+        sched = i2cglb.LoopSched
+        values = [metrics.Counters[metrics.LoopRate], sched.worst_pass_us, 
+                  sched.idle_share(), sched.awake_share(), sched.latency()[2]]
+    elif page == M.PageI2C:
+        ring = i2cglb.PendingDataIn
+        values = [ring.received, ring.dropped, ring.high_water, 
+                  dispatch.UnknownCount, i2cglb.PendingTelemetryOut.reports_superseded]
+    elif page == M.PageTx:
+        values = [0, 0, 0, 0, 0]
+        for arena in [i2cglb.PendingDataOut, i2cglb.PendingTelemetryOut]:
+            values[0] += arena.bytes_queued
+            values[1] += arena.bytes_sent
+            values[2] += arena.bytes_discarded
+        if i2cglb.I2CDev is not None:
+            values[3] = i2cglb.I2CDev.tx_underruns
+            values[4] = i2cglb.I2CDev.tx_swaps
+    elif page == M.PageMemory:
+        values = [gc.mem_free(), metrics.largest_free_block(), 
+                  metrics.Counters[metrics.GCCount], 
+                  i2cglb.ERes.run_duration if i2cglb.ERes.start_time else 0]
+    elif page == M.PageFiles:
+        fs = i2cglb.FileSystem
+        values = [fs.bytes_buffered, fs.flushes, fs.bytes_written, 
+                  fs.idle_flushes, fs.checksums.hits]
+    else:
+        return None
+    
+    return M(page, values)
+
+@command('M')
+def metrics_report(payload:bytearray):
+    page = payload[0] if len(payload) else 0
+    response = metrics_response(page)
+    if response is None:
+        queue_response(wr.error(error_codes.InvalidRequest, b'MPG'))
+        return 
+    queue_response(response)
@@ -16,9 +16,10 @@ report_interpreter.py file, located in this module.
 
 
 import csv
-from i2c_client_test import packetdump 
 import argparse
 from spasic.cnc.response.response import *
+from spasic.cnc.response.decoder import ResponseDecoder
+from spasic.cnc.response.fragments import ResultAssembler
 from received_telemetry.report_interpreter import StatusResultParserMap, ResultParserMap
 from spasic.experiment.experiment_list import ExperimentsConfig
 from spasic.experiment.experiment_result import exception_id_to_type
@@ -49,7 +50,19 @@ class ReportInterpreter:
 
 class ResponseOutput:
     def __init__(self):
-        pass 
+        # experiment results that come down in fragments
+        self.assembler = ResultAssembler()
+    
+    def assemble(self, resp:ResponseExperimentFragment):
+        '''
+            Adds the fragment to the results being put back 
+            together, returns the whole result if that completed it
+        '''
+        self.assembler.add(resp)
+        done = self.assembler.pop_completed()
+        if len(done):
+            return done[-1]
+        return None
     
     
     def exception_type_string(self, exception_id:int):
@@ -73,6 +86,10 @@ class ResponseOutput:
 
         getattr(self, fname)(resp, timestamp)
         
+    def handle_ResponseBatch(self, resp:ResponseBatch, timestamp:str=None):
+        for r in resp.responses:
+            self.handle(r, timestamp)
+        
     
 class ResponsePrinter(ResponseOutput):
     
@@ -115,6 +132,14 @@ class ResponsePrinter(ResponseOutput):
         else:
             self.output(f'EXPERIMENT {self.experiment_string(resp.exp_id)} completed:{resp.completed} result:{result}', timestamp)
             
+    def handle_ResponseExperimentFragment(self, resp:ResponseExperimentFragment, timestamp:str=None):
+        end = resp.offset + len(resp.data)
+        self.output(f'EXPERIMENT {self.experiment_string(resp.exp_id)} fragment {resp.offset}-{end}/{resp.total}', timestamp)
+        whole = self.assemble(resp)
+        if whole is not None:
+            result = ReportInterpreter.parseResult(whole.exp_id, whole.data)
+            self.output(f'EXPERIMENT {self.experiment_string(whole.exp_id)} full result:{result} ({whole.total} bytes)', timestamp)
+            
             
 
     def handle_ResponseStatus(self, resp:ResponseStatus, timestamp:str=None):
@@ -129,6 +154,18 @@ class ResponsePrinter(ResponseOutput):
         t = time.gmtime(resp.synctime)
         synctime = f"{t[0]}-{t[1]:02d}-{t[2]:02d} {t[3]:02d}:{t[4]:02d}:{t[5]:02d}"
         self.output(f'INFO v{resp.v_maj}.{resp.v_min}.{resp.v_patch} synctime {synctime}', timestamp)
+        
+    def handle_ResponseMetrics(self, resp:ResponseMetrics, timestamp:str=None):
+        self.output(f'METRICS page {resp.page} {resp.values_string()}', timestamp)
+        
+    def handle_ResponseFile(self, resp:ResponseFile, timestamp:str=None):
+        self.output(str(resp)[1:-1], timestamp)
+        
+    def handle_ResponseFileData(self, resp:ResponseFileData, timestamp:str=None):
+        self.output(f'FILE DATA {resp.offset}-{resp.offset + len(resp.data)} 0x{resp.data.hex()}', timestamp)
+        
+    def handle_ResponseBlockChecksums(self, resp:ResponseBlockChecksums, timestamp:str=None):
+        self.output(str(resp)[1:-1], timestamp)
     
     
 class CSVRow:
@@ -185,6 +222,7 @@ class CSVRow:
 class ResponseCVSOutput(ResponseOutput):
     
     def __init__(self, csv_out_path:str=None):
+        super().__init__()
         self.csv_out = None 
         self.out_count = 0
         self.csv_writer = None 
@@ -246,6 +284,22 @@ class ResponseCVSOutput(ResponseOutput):
                 exception=exception, comment=result_parsed)
         self.output(r)
             
+    def handle_ResponseExperimentFragment(self, resp:ResponseExperimentFragment, timestamp:str=None):
+        end = resp.offset + len(resp.data)
+        self.output(CSVRow(resp.bytes, timestamp=timestamp,
+                   experiment_id=resp.exp_id,
+                   experiment_name=self.experiment_string(resp.exp_id),
+                   response=resp, result=resp.data,
+                   comment=f'fragment {resp.offset}-{end}/{resp.total}'))
+        whole = self.assemble(resp)
+        if whole is not None:
+            # reassembled: one more row, with the whole result
+            self.output(CSVRow(resp.bytes, timestamp=timestamp,
+                       experiment_id=whole.exp_id,
+                       experiment_name=self.experiment_string(whole.exp_id),
+                       response=resp, result=whole.data,
+                       comment=str(ReportInterpreter.parseResult(whole.exp_id, whole.data))))
+            
 
     def handle_ResponseStatus(self, resp:ResponseStatus, timestamp:str=None):
         result_parsed = ReportInterpreter.parseStatus(resp.exp_id, resp.result)
@@ -268,12 +322,35 @@ class ResponseCVSOutput(ResponseOutput):
         comment = f'v{resp.v_maj}.{resp.v_min}.{resp.v_patch} synctime {synctime}'
         self.output(CSVRow(resp.bytes, timestamp=timestamp, response=resp, comment=comment))
         
+    def handle_ResponseMetrics(self, resp:ResponseMetrics, timestamp:str=None):
+        comment = f'page {resp.page} {resp.values_string()}'
+        self.output(CSVRow(resp.bytes, timestamp=timestamp, response=resp, comment=comment))
+        
+    def handle_ResponseFile(self, resp:ResponseFile, timestamp:str=None):
+        self.output(CSVRow(resp.bytes, timestamp=timestamp, response=resp, comment=str(resp)[1:-1]))
+        
+    def handle_ResponseFileData(self, resp:ResponseFileData, timestamp:str=None):
+        comment = f'file data {resp.offset}-{resp.offset + len(resp.data)}'
+        self.output(CSVRow(resp.bytes, timestamp=timestamp, response=resp, result=resp.data, comment=comment))
+        
+    def handle_ResponseBlockChecksums(self, resp:ResponseBlockChecksums, timestamp:str=None):
+        self.output(CSVRow(resp.bytes, timestamp=timestamp, response=resp, comment=str(resp)[1:-1]))
+        
     
 class TelemetryParser:
     
     def __init__(self, csv_out_file:str=None):
         self.csv_out_file = csv_out_file
         
+    def handle_all(self, responseParser:ResponseOutput, decoder:ResponseDecoder, timestamp:str):
+        count = 0
+        for resp in decoder.responses():
+            responseParser.handle(resp, timestamp)
+            count += 1
+            if self.csv_out_file:
+                print('.', end='')
+        return count
+        
     def dump(self, input_csv_file:str):
         
         if self.csv_out_file is not None:
@@ -282,6 +359,10 @@ class TelemetryParser:
             responseParser = ResponsePrinter()
             
         responses_parsed = 0
+        # packets are decoded as a stream: a response that 
+        # straddles two of them gets put back together
+        decoder = ResponseDecoder()
+        timestamp = None
         with open(input_csv_file) as f:
             reader = csv.DictReader(f, delimiter=',', quotechar='"')
             expname_colname = None
@@ -329,24 +410,15 @@ class TelemetryParser:
                     continue
                 
                 # AllRecievedBytes.append(bts)
-                packetdump.set_simulated_pending([bts])
-                while True:
-                    parsedvals = packetdump.fetch_pending()
-                    if parsedvals is None:
-                        break 
-                    if not isinstance(parsedvals, list):
-                        parsedvals = [parsedvals]
-                    
-                    if not len(parsedvals):
-                        break 
-    
-                    for resp in parsedvals:
-                        if isinstance(resp, Response):
-                            responseParser.handle(resp, row[timestamp_colname])
-                            responses_parsed += 1
-                            if self.csv_out_file:
-                                print('.', end='')
-                    
+                timestamp = row[timestamp_colname]
+                decoder.feed(bts)
+                # each packet is one 16 byte read: a status' 
+                # result (no length byte) ends with it
+                decoder.end_transfer()
+                responses_parsed += self.handle_all(responseParser, decoder, timestamp)
+        
+        decoder.flush()
+        responses_parsed += self.handle_all(responseParser, decoder, timestamp)
         
         if self.csv_out_file:
             print()
@@ -0,0 +1,128 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Command dispatch table.
+
+Every command starts with a type byte (e.g. 'S', or 'E'+'Q' == 0x96),
+which indexes straight into a 256 entry table of handlers.  Handlers
+are called with the payload (everything after the type byte) which is
+a memoryview into the incoming frame ring: copy what you need to keep.
+
+Registering is done with register() or the @command decorator, e.g.
+
+    from spasic.cnc.dispatch import command
+
+    @command('EQ')
+    def experiment_queue(payload:memoryview):
+        ...
+
+Each opcode also keeps a call count and min/total/max handling time,
+in microseconds, in preallocated arrays so they can stay on in flight.
+'''
+import time
+from array import array
+
+NumOpcodes = 256
+
+# keep totals inside small int territory, so reading
+# them back out never needs to allocate
+CounterCeiling = 0x20000000
+
+Handlers = [None] * NumOpcodes
+CallCount = array('L', [0] * NumOpcodes)
+TotalUs = array('L', [0] * NumOpcodes)
+MinUs = array('L', [0] * NumOpcodes)
+MaxUs = array('L', [0] * NumOpcodes)
+UnknownCount = 0
+
+def opcode(cmd) -> int:
+    '''
+        Type byte for a command, given as an int or
+        as the string of chars that get summed, e.g. 'FW'
+    '''
+    if isinstance(cmd, int):
+        return cmd % NumOpcodes
+
+    op = 0
+    for c in cmd:
+        op += ord(c)
+
+    if op >= NumOpcodes:
+        raise ValueError(f'Command {cmd} does not fit in a byte')
+    return op
+
+def register(cmd, handler, replace:bool=False) -> int:
+    op = opcode(cmd)
+    if Handlers[op] is not None and not replace:
+        raise ValueError(f'Command {cmd} ({hex(op)}) already registered')
+
+    Handlers[op] = handler
+    return op
+
+def unregister(cmd):
+    Handlers[opcode(cmd)] = None
+
+def command(cmd):
+    '''
+        decorator version of register()
+    '''
+    def decorator(func):
+        register(cmd, func)
+        return func
+    return decorator
+
+def has(cmd) -> bool:
+    return Handlers[opcode(cmd)] is not None
+
+def dispatch(bts:memoryview) -> bool:
+    '''
+        Handle a single command frame.  Returns False if
+        nothing is registered for its type byte.
+    '''
+    global UnknownCount
+    op = bts[0]
+    handler = Handlers[op]
+    if handler is None:
+        UnknownCount += 1
+        return False
+
+    t_start = time.ticks_us()
+    try:
+        handler(bts[1:])
+    finally:
+        elapsed = time.ticks_diff(time.ticks_us(), t_start)
+        count = CallCount[op]
+        total = TotalUs[op] + elapsed
+        if total >= CounterCeiling:
+            # age the history rather than overflowing
+            count >>= 1
+            total >>= 1
+
+        if not count or elapsed < MinUs[op]:
+            MinUs[op] = elapsed
+        if elapsed > MaxUs[op]:
+            MaxUs[op] = elapsed
+        CallCount[op] = count + 1
+        TotalUs[op] = total
+
+    return True
+
+def stats(cmd):
+    '''
+        (count, min us, avg us, max us) for a command
+    '''
+    op = opcode(cmd)
+    count = CallCount[op]
+    if not count:
+        return (0, 0, 0, 0)
+    return (count, MinUs[op], TotalUs[op] // count, MaxUs[op])
+
+def reset_stats():
+    global UnknownCount
+    UnknownCount = 0
+    for i in range(NumOpcodes):
+        CallCount[i] = 0
+        TotalUs[i] = 0
+        MinUs[i] = 0
+        MaxUs[i] = 0
@@ -0,0 +1,67 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Runtime health counters.
+
+Most of what gets reported by the metrics ('M') command is already 
+counted where it happens (frame ring, transmit arenas, dispatch, loop 
+scheduler).  This holds the few that aren't, in a preallocated array, 
+and is updated once per main loop pass by note_pass(): a couple of 
+integer ops and no allocation, so it stays on in flight builds.
+'''
+import gc
+import time
+from array import array
+
+# indices into Counters
+LoopPasses = 0      # passes in the current rate window
+LoopRate = 1        # passes/second, over the last window
+GCCount = 2         # collections seen (heap usage going down)
+HeapAlloc = 3       # gc.mem_alloc() on the last pass
+NumCounters = 4
+
+RateWindowMs = 2000
+
+# stay in small int territory
+CounterCeiling = 0x20000000
+
+Counters = array('L', [0] * NumCounters)
+_window_start = time.ticks_ms()
+_mem_alloc = getattr(gc, 'mem_alloc', None)
+
+def note_pass():
+    global _window_start
+    Counters[LoopPasses] += 1
+    elapsed = time.ticks_diff(time.ticks_ms(), _window_start)
+    if elapsed >= RateWindowMs:
+        Counters[LoopRate] = (Counters[LoopPasses] * 1000) // elapsed
+        Counters[LoopPasses] = 0
+        _window_start = time.ticks_add(_window_start, elapsed)
+    
+    if _mem_alloc is not None:
+        allocated = _mem_alloc()
+        if allocated < Counters[HeapAlloc]:
+            # something got freed: only a collection does that
+            count = Counters[GCCount] + 1
+            Counters[GCCount] = count if count < CounterCeiling else 0
+        Counters[HeapAlloc] = allocated
+
+def largest_free_block(granularity:int=256):
+    '''
+        Biggest single allocation that currently succeeds.
+        There's no API for this, so it's probed by bisecting 
+        with actual allocations: only call on request, not 
+        from the loop.
+    '''
+    low = 0
+    high = gc.mem_free()
+    while high - low > granularity:
+        mid = (low + high) // 2
+        try:
+            probe = bytearray(mid)
+            del probe
+            low = mid
+        except MemoryError:
+            high = mid
+    return low
@@ -0,0 +1,323 @@
+'''
+Incremental response decoder, for the master side.
+
+Bytes go in with feed(), split up however they came off the bus, and
+responses come out of next()/responses() as soon as they're complete.
+A response that straddles reads is kept where it was: once its header
+is known, the decoder only looks at it again when enough has come in
+to (maybe) finish it, and never goes back over what's been decoded.
+
+A status' result has no length byte, it runs to the end of the 
+transfer, up to 8 bytes.  So a status (or an info report, that may 
+be tagged) without all of those in yet is kept, like any other partial
+response, until they are, or until the caller says the transfer is 
+over with end_transfer() (e.g. the master's read came up empty): it 
+then ends with what's there.  feed() takes reads one block at a time.
+
+Zeros between responses are padding (empty reads, short reads) and
+are skipped.  Anything that isn't a known header is skipped a byte
+at a time, so after garbage it's back in sync by the next header, and
+no response is waited on for more than ResponseFactory.MaxFrameSize.
+
+Protocol v2 frames (see framing) are recognized wherever they turn up,
+and come out as the response they hold.  One that fails its CRC is
+dropped whole.  With framed_only, once the master has switched the
+board over, anything outside a good frame is garbage: the decoder
+goes straight to the next frame marker, rather than trying to make
+responses out of it.
+
+Delta auto-reports (see delta) come out as the whole report they
+stand for, rebuilt on the last few full reports of that type.  Those
+that don't match any are dropped, and counted.
+
+  decoder = ResponseDecoder()
+  decoder.feed(blk)
+  for r in decoder.responses():
+      print(r)
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from spasic.cnc.response.response import ResponseFactory, ResponseReportDelta
+import spasic.cnc.response.framing as framing
+
+class _Frame:
+    # stands in for the response class, while a frame is coming in
+    Header = bytes([framing.FrameMarker])
+
+class ResponseDecoder:
+    # decoded bytes are only dropped from the buffer past this
+    CompactThreshold = 512
+    # full reports kept, per type, for deltas to be relative to
+    DeltaBasesKept = 4
+    # types of auto-reports that may come in as deltas: status, experiment, info
+    DeltaReportTypes = (0x07, 0x09, ord('I'))
+
+    def __init__(self, framed_only:bool=False):
+        self.framed_only = framed_only
+        self.reset()
+
+    def reset(self):
+        self._buf = bytearray()
+        self._start = 0
+        self._rclass = None # class of the response being put together
+        self._need = 0 # bytes it needs, at least, before trying again
+        self._ready = []
+        self.bytes_fed = 0
+        self.bytes_skipped = 0 # garbage dropped to resync
+        self.decoded = 0
+        self.frames = 0 # good v2 frames
+        self.frames_bad = 0 # failed their CRC
+        self.frames_lost = 0 # going by gaps in the sequence
+        self.frames_unparsed = 0 # good CRC, unknown contents
+        self._last_seq = [-1, -1] # per lane, see framing
+        self.deltas = 0 # rebuilt from a delta
+        self.deltas_unmatched = 0 # base never came in
+        self._delta_bases = dict()
+
+    @property
+    def partial(self):
+        '''
+            In the middle of a response, waiting for the rest of it
+        '''
+        return self._rclass is not None
+
+    def __len__(self):
+        # bytes fed but not decoded yet
+        return len(self._buf) - self._start
+
+    def pending_bytes(self):
+        return self._buf[self._start:]
+
+    def feed(self, bts):
+        '''
+            Add received bytes, returns the number of
+            responses ready to be picked up.
+        '''
+        self._buf += bts
+        self.bytes_fed += len(bts)
+        self._decode(False)
+        return len(self._ready)
+
+    def end_transfer(self):
+        '''
+            Whatever comes next isn't part of this transfer: 
+            responses that were only waiting to see if there's more
+            of them (a status' result) end with what's there.
+            Returns the number of responses ready.
+        '''
+        self._decode(False, True)
+        return len(self._ready)
+
+    def flush(self):
+        '''
+            Nothing more is coming: decode what can be with
+            what's there, and drop the rest.
+        '''
+        self._decode(True)
+        self.bytes_skipped += len(self)
+        self._buf = bytearray()
+        self._start = 0
+        self._rclass = None
+        return len(self._ready)
+
+    def next(self):
+        if not len(self._ready):
+            return None
+        return self._ready.pop(0)
+
+    def responses(self):
+        ready = self._ready
+        self._ready = []
+        return ready
+
+    def _skip(self, num_bytes:int):
+        self._start += num_bytes
+        self.bytes_skipped += num_bytes
+        self._rclass = None
+
+    def _skip_to_frame(self):
+        # in one go, to the next frame marker (or the end)
+        buf = self._buf
+        start = self._start + 1
+        try:
+            idx = buf.find(_Frame.Header, start)
+        except AttributeError:
+            idx = -1
+            for i in range(start, len(buf)):
+                if buf[i] == framing.FrameMarker:
+                    idx = i
+                    break
+        if idx < 0:
+            idx = len(buf)
+        self._skip(idx - self._start)
+
+    def _garbage(self):
+        if self.framed_only:
+            self._skip_to_frame()
+        else:
+            self._skip(1)
+
+    def _framed_type(self, start:int):
+        # frame has a body, that starts off like a response
+        buf = self._buf
+        if not buf[start + 1]:
+            return False
+        first = buf[start + framing.FrameHeaderSize]
+        return first == ResponseFactory.SystemMessage or first in ResponseFactory.ByFirstByte
+
+    def _unframe(self, flen:int):
+        buf = self._buf
+        start = self._start
+        if not framing.frame_valid(buf, start, flen):
+            self.frames_bad += 1
+            self._garbage()
+            return
+        
+        self.frames += 1
+        seq = buf[start + 2]
+        lane = seq >> framing.SeqLaneShift
+        last = self._last_seq[lane]
+        if last >= 0:
+            gap = (seq - last - 1) & framing.SeqCountMask
+            if gap < 0x40:
+                # (much) further back is out of order, rather than lost
+                self.frames_lost += gap
+        self._last_seq[lane] = seq
+        
+        body = buf[(start + framing.FrameHeaderSize):(start + flen - 1)]
+        try:
+            rt = ResponseFactory.parseItem(body)
+        except ValueError:
+            rt = None
+        self._start += flen
+        self._rclass = None
+        if rt is None:
+            self.frames_unparsed += 1
+            self.bytes_skipped += flen
+            return
+        self._emit(rt)
+        
+    def _emit(self, rt):
+        if isinstance(rt, ResponseReportDelta):
+            rt = self._undelta(rt)
+            if rt is None:
+                return
+        elif rt.Header[0] in self.DeltaReportTypes:
+            bases = self._delta_bases.get(rt.Header[0])
+            if bases is None:
+                bases = []
+                self._delta_bases[rt.Header[0]] = bases
+            bases.insert(0, rt.bytes)
+            if len(bases) > self.DeltaBasesKept:
+                bases.pop()
+        self._ready.append(rt)
+        self.decoded += 1
+        
+    def _undelta(self, delta):
+        for base in self._delta_bases.get(delta.report_type, []):
+            if delta.applies_to(base):
+                self.deltas += 1
+                return ResponseFactory.parseItem(delta.apply(base))
+        self.deltas_unmatched += 1
+        return None
+
+    def _decode(self, final:bool, transfer_over:bool=False):
+        buf = self._buf
+        while True:
+            avail = len(buf) - self._start
+            if self._rclass is None:
+                # hunting for a header, past any padding
+                while avail and buf[self._start] == 0:
+                    self._start += 1
+                    avail -= 1
+                if not avail:
+                    break
+                first = buf[self._start]
+                if first == framing.FrameMarker:
+                    if avail < framing.FrameOverhead and not final:
+                        break
+                    if avail < framing.FrameOverhead or not self._framed_type(self._start):
+                        # not what a frame starts with, don't wait on it
+                        self._garbage()
+                        continue
+                    self._rclass = _Frame
+                    self._need = framing.frame_length(buf, self._start)
+                    continue
+                if self.framed_only:
+                    self._garbage()
+                    continue
+                if first == ResponseFactory.SystemMessage:
+                    if avail < 2:
+                        break
+                    rclass = ResponseFactory.BySystemByte.get(buf[self._start + 1])
+                else:
+                    rclass = ResponseFactory.ByFirstByte.get(first)
+                if rclass is None:
+                    self._skip(1)
+                    continue
+                self._rclass = rclass
+                self._need = len(rclass.Header)
+
+            if avail < self._need and not final and \
+               not (transfer_over and self._rclass is not _Frame):
+                break
+
+            rclass = self._rclass
+            if rclass is _Frame:
+                if avail < self._need:
+                    # final, and it never all came in
+                    self.frames_bad += 1
+                    self._garbage()
+                else:
+                    self._unframe(self._need)
+                continue
+            
+            hlen = len(rclass.Header)
+            if avail < hlen:
+                # final, and not even the header is all there
+                break
+            if buf[self._start:(self._start + hlen)] != rclass.Header:
+                self._skip(1)
+                continue
+
+            # bounded copy: a response never needs more than this
+            end = self._start + hlen + ResponseFactory.MaxFrameSize
+            post = buf[(self._start + hlen):end]
+            rt = rclass.blank()
+            try:
+                need = hlen + rt.minPayloadSize(post)
+            except ValueError:
+                # not one of those after all: treat as garbage
+                self._skip(1)
+                continue
+
+            if avail < need:
+                if final:
+                    self._skip(1)
+                    continue
+                self._need = need
+                break
+            if not (final or transfer_over) and not rt.payloadDecided(post):
+                # e.g. an info report, that may yet turn out to be 
+                # tagged, or a status whose result may go on
+                self._need = avail + 1
+                break
+
+            rt.extractPayload(post)
+            self._start += len(rt)
+            self._rclass = None
+            self._emit(rt)
+
+        self._compact()
+
+    def _compact(self):
+        if self._start == len(self._buf):
+            self._buf = bytearray()
+            self._start = 0
+        elif self._start > self.CompactThreshold:
+            try:
+                del self._buf[:self._start]
+            except TypeError:
+                self._buf = self._buf[self._start:]
+            self._start = 0
@@ -0,0 +1,136 @@
+'''
+Delta-encoded auto-reports.
+
+From one auto-report to the next, status, experiment and info reports
+mostly stay the same: a byte or two of runtime, or of uptime.  With
+deltas on ('PD'), each kind of report goes out in full now and then
+(a keyframe) and in between only as the bytes that changed since
+
+  'd' TYPE BASECRC LEN MASK(2) VALUES
+
+TYPE being the report's first byte, BASECRC the CRC-8 (as in framing)
+of the keyframe it's relative to, LEN the length of the report, and
+bit i of MASK set when byte i is in VALUES.  Deltas only ever refer to
+a keyframe, never to each other, so losing one costs just that one.
+
+The ground keeps the last few full reports of each type and picks
+the base by its CRC (see ResponseDecoder), which also means command
+replies, e.g. to 'S', don't get in the way.
+
+A report is sent in full when it's the first of its kind, every
+keyframe_every, when the delta wouldn't be smaller, or when the last
+keyframe is still waiting in its arena slot (the delta would replace
+it, and the ground would never get the base).
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from array import array
+from spasic.cnc.response.framing import crc8
+
+DeltaHeader = ord('d')
+DeltaOverhead = 6
+MaxReportSize = 16 # bytes covered by the change mask
+
+class DeltaWriter:
+    # 'd' TYPE BASECRC LEN MASK(2) VALUES
+    __slots__ = ('report', 'report_len', 'base_crc', 'mask', 'num_changed')
+    def __init__(self):
+        self.set(None, 0, 0, 0, 0)
+
+    def set(self, report:bytearray, report_len:int, base_crc:int, mask:int, num_changed:int):
+        self.report = report
+        self.report_len = report_len
+        self.base_crc = base_crc
+        self.mask = mask
+        self.num_changed = num_changed
+        return self
+
+    def __len__(self):
+        return DeltaOverhead + self.num_changed
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        report = self.report
+        buf[offset] = DeltaHeader
+        buf[offset + 1] = report[0]
+        buf[offset + 2] = self.base_crc
+        buf[offset + 3] = self.report_len
+        buf[offset + 4] = self.mask & 0xff
+        buf[offset + 5] = (self.mask >> 8) & 0xff
+        idx = offset + DeltaOverhead
+        mask = self.mask
+        pos = 0
+        while mask:
+            if mask & 1:
+                buf[idx] = report[pos]
+                idx += 1
+            mask >>= 1
+            pos += 1
+        return idx - offset
+
+class DeltaReports:
+    '''
+        Keyframe per report key, and how many deltas since.
+        report() returns what to actually queue: the report
+        itself, or the (reused) delta writer.
+    '''
+    def __init__(self, num_keys:int, keyframe_every:int=0):
+        self._scratch = bytearray(MaxReportSize)
+        self._bases = [bytearray(MaxReportSize) for _i in range(num_keys)]
+        self._base_len = array('B', [0] * num_keys)
+        self._base_crc = array('B', [0] * num_keys)
+        self._since = array('H', [0] * num_keys)
+        self._keyframe_last = array('B', [0] * num_keys)
+        self._delta = DeltaWriter()
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_saved = 0
+        self.set_keyframe_every(keyframe_every)
+
+    def set_keyframe_every(self, keyframe_every:int):
+        '''
+            0 turns deltas off.  Either way, every
+            kind starts over with a keyframe.
+        '''
+        self.keyframe_every = keyframe_every
+        for i in range(len(self._base_len)):
+            self._base_len[i] = 0
+
+    def report(self, key:int, response, arena=None):
+        size = len(response)
+        if not self.keyframe_every or size > MaxReportSize:
+            return response
+
+        scratch = self._scratch
+        response.encode_into(scratch, 0)
+        base = self._bases[key]
+        base_len = self._base_len[key]
+        if not base_len or self._since[key] + 1 >= self.keyframe_every or scratch[0] != base[0] or \
+           (self._keyframe_last[key] and arena is not None and arena.report_waiting(key)):
+            return self._keyframe(key, response, size)
+
+        mask = 0
+        num_changed = 0
+        for i in range(size):
+            if i >= base_len or scratch[i] != base[i]:
+                mask |= 1 << i
+                num_changed += 1
+        if DeltaOverhead + num_changed >= size:
+            return self._keyframe(key, response, size)
+
+        self._since[key] += 1
+        self._keyframe_last[key] = 0
+        self.deltas += 1
+        self.bytes_saved += size - DeltaOverhead - num_changed
+        return self._delta.set(scratch, size, self._base_crc[key], mask, num_changed)
+
+    def _keyframe(self, key:int, response, size:int):
+        base = self._bases[key]
+        for i in range(size):
+            base[i] = self._scratch[i]
+        self._base_len[key] = size
+        self._base_crc[key] = crc8(base, 0, size)
+        self._since[key] = 0
+        self._keyframe_last[key] = 1
+        self.keyframes += 1
+        return response
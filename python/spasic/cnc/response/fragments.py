@@ -0,0 +1,126 @@
+'''
+Experiment results in fragments.
+
+Experiment and status responses only carry the first 11 (8) bytes of
+an experiment's result, though the result itself can be longer:
+some experiments keep a 32 byte buffer, and summaries of 64 to 256
+bytes are in reach.  The whole of it is pulled with 'EF'
+
+  'EF' OFFSET(2) [SIZE]
+
+one piece at a time, each coming back as
+
+  0x0A EXPID TOTALLEN(2) OFFSET(2) RESULTCRC LEN DATA
+
+TOTALLEN and RESULTCRC (CRC-8, as in framing) being those of the whole
+result when that piece was read.  A running experiment may update its
+result between two pieces: pieces only go together when they agree
+on all of EXPID, TOTALLEN and RESULTCRC, and the assembled result has
+to check out against RESULTCRC.
+
+On the ground, a ResultAssembler takes the fragments as they come in
+(in any order, repeats are fine) and says what's still missing.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from spasic.cnc.response.framing import crc8
+
+DefaultFragmentSize = 48
+
+class PartialResult:
+    '''
+        One version of a result, as its pieces come in
+    '''
+    def __init__(self, exp_id:int, total:int, result_crc:int):
+        self.exp_id = exp_id
+        self.total = total
+        self.result_crc = result_crc
+        self.data = bytearray(total)
+        self.have = bytearray(total) # 1 for each byte that came in
+        self.received = 0
+
+    @property
+    def key(self):
+        return (self.exp_id, self.total, self.result_crc)
+
+    def add(self, offset:int, data:bytearray):
+        end = offset + len(data)
+        if end > self.total:
+            end = self.total
+        for i in range(offset, end):
+            if not self.have[i]:
+                self.have[i] = 1
+                self.received += 1
+            self.data[i] = data[i - offset]
+
+    def next_missing(self):
+        '''
+            Offset of the first byte not in yet, -1 if it's all there
+        '''
+        if self.received >= self.total:
+            return -1
+        for i in range(self.total):
+            if not self.have[i]:
+                return i
+        return -1
+
+    @property
+    def complete(self):
+        return self.received >= self.total
+
+    @property
+    def valid(self):
+        return self.complete and crc8(self.data) == self.result_crc
+
+    def __str__(self):
+        return f'<RESULT {self.exp_id} {self.received}/{self.total}>'
+
+class ResultAssembler:
+    '''
+        Puts fragments (ResponseExperimentFragment) back together.
+        add() returns the PartialResult the fragment went to.
+        Once a result is valid, it's in completed (newest last)
+        and latest, and its partials are dropped.
+    '''
+    # versions of results, being put together, kept at most
+    MaxPartials = 4
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.partials = []
+        self.completed = []
+        self.latest = None
+        self.fragments = 0
+        self.corrupt = 0 # all in, but didn't match its crc
+
+    def add(self, fragment):
+        self.fragments += 1
+        key = (fragment.exp_id, fragment.total, fragment.result_crc)
+        partial = None
+        for p in self.partials:
+            if p.key == key:
+                partial = p
+                break
+        if partial is None:
+            partial = PartialResult(fragment.exp_id, fragment.total, fragment.result_crc)
+            self.partials.append(partial)
+            if len(self.partials) > self.MaxPartials:
+                self.partials.pop(0)
+
+        partial.add(fragment.offset, fragment.data)
+        if partial.complete:
+            self.partials.remove(partial)
+            if partial.valid:
+                self.completed.append(partial)
+                self.latest = partial
+            else:
+                self.corrupt += 1
+        return partial
+
+    def pop_completed(self):
+        done = self.completed
+        self.completed = []
+        return done
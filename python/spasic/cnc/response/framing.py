@@ -0,0 +1,144 @@
+'''
+Protocol v2 response framing.
+
+In v1, responses go out back to back as is, and how long each one is
+has to be worked out from its contents (and, for a status, can't be).
+In v2, negotiated with the 'PV' command, each is wrapped in a frame
+
+  0x02 LEN SEQ BODY[LEN] CRC
+
+BODY being the v1 response, type byte first.  SEQ counts frames, so
+the ground can tell some went missing: its top bit says which lane the
+frame went out on (0: replies, 1: telemetry), the low 7 bits count that
+lane's frames.  Lanes are interleaved on the way out, so each has its
+own count, and a frame is only numbered once it's in its lane's ring
+(see TxArena): an auto-report superseded in its slot never uses one up.
+CRC is a CRC-8 (poly 0x07, as in SMBus PEC) over LEN, SEQ and BODY.
+0x02 is never the first byte of a v1 response so both can be told
+apart in the same stream, e.g. around the switch.
+
+A response that doesn't fit in a frame (over MaxFrameBody) is dropped,
+and counted: the handlers that could build those cap their sizes while
+framing is on.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+
+ProtocolV1 = 1
+ProtocolV2 = 2
+ProtocolMax = ProtocolV2
+
+FrameMarker = 0x02
+FrameHeaderSize = 3 # marker, length, sequence
+FrameOverhead = FrameHeaderSize + 1 # and the crc
+MaxFrameBody = 255
+
+# SEQ: lane << SeqLaneShift | count
+LaneReplies = 0
+LaneTelemetry = 1
+SeqLaneShift = 7
+SeqCountMask = 0x7f
+
+def _crc8_table(poly:int):
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _b in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ poly) & 0xff
+            else:
+                crc = (crc << 1) & 0xff
+        table[i] = crc
+    return bytes(table)
+
+CRC8Table = _crc8_table(0x07)
+
+def crc8(bts, start:int=0, end:int=-1, crc:int=0):
+    '''
+        CRC-8 of bts[start:end] (to the end, by default)
+    '''
+    if end < 0:
+        end = len(bts)
+    table = CRC8Table
+    for i in range(start, end):
+        crc = table[crc ^ bts[i]]
+    return crc
+
+def frame_seq(lane:int, count:int):
+    return (lane << SeqLaneShift) | (count & SeqCountMask)
+
+def stamp(buf, offset:int, flen:int, seq:int):
+    '''
+        Sets the sequence number of the frame at offset, 
+        and its CRC to match
+    '''
+    end = offset + flen - 1
+    buf[offset + 2] = seq
+    buf[end] = crc8(buf, offset + 1, end)
+
+def is_frame(buf, offset:int, size:int):
+    # size bytes at offset are a whole frame (v1 responses never start with the marker)
+    return size >= FrameOverhead and buf[offset] == FrameMarker and \
+           buf[offset + 1] + FrameOverhead == size
+
+class FrameWriter:
+    '''
+        Wraps a response (anything with __len__ and encode_into(),
+        or plain bytes) in a frame, for TxArena.put().  One gets
+        reused: wrap() and put() it right away.
+        
+        Unless sequenced, SEQ and CRC are left for the arena
+        to fill in (stamp()), when the frame enters its ring.
+    '''
+    __slots__ = ('body', 'body_len', 'seq', 'sequenced', 'frames', 'oversize')
+    def __init__(self, sequenced:bool=True):
+        self.body = None
+        self.body_len = 0
+        self.seq = 0
+        self.sequenced = sequenced
+        self.frames = 0
+        self.oversize = 0
+
+    def wrap(self, body):
+        self.body = body
+        self.body_len = len(body)
+        if self.body_len > MaxFrameBody:
+            self.oversize += 1
+            self.body_len = -FrameOverhead
+        return self
+
+    def __len__(self):
+        return FrameOverhead + self.body_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        blen = self.body_len
+        if blen < 0:
+            return 0
+        body_start = offset + FrameHeaderSize
+        if hasattr(self.body, 'encode_into'):
+            self.body.encode_into(buf, body_start)
+        else:
+            for i in range(blen):
+                buf[body_start + i] = self.body[i]
+
+        buf[offset] = FrameMarker
+        buf[offset + 1] = blen
+        self.frames += 1
+        if self.sequenced:
+            stamp(buf, offset, FrameOverhead + blen, self.seq)
+            self.seq = (self.seq + 1) & SeqCountMask
+        return FrameOverhead + blen
+
+def frame_length(buf, offset:int=0):
+    '''
+        Whole length of the frame starting at offset,
+        given its length byte is there, -1 otherwise.
+    '''
+    if len(buf) < offset + 2:
+        return -1
+    return FrameOverhead + buf[offset + 1]
+
+def frame_valid(buf, offset:int, flen:int):
+    end = offset + flen - 1
+    return buf[offset] == FrameMarker and buf[end] == crc8(buf, offset + 1, end)
@@ -3,6 +3,8 @@
 @copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
 '''
 import time
+from spasic.cnc.response.framing import crc8
+
 class Response:
     def __init__(self):
         self.payload = bytearray()
@@ -13,11 +15,44 @@ class Response:
             return self.Header + self.payload 
         return self.Header 
     
+    def encode_into(self, buf:bytearray, offset:int=0):
+        '''
+            Write Header and payload into buf at offset, without
+            building the intermediate bytes.  Returns number of bytes written.
+        '''
+        hlen = len(self.Header)
+        buf[offset:offset + hlen] = self.Header
+        plen = len(self.payload)
+        if plen:
+            offset += hlen
+            buf[offset:offset + plen] = self.payload
+        return hlen + plen
+
     def reset(self):
         self.payload = bytearray()
+        
+    @classmethod 
+    def blank(cls):
+        '''
+            Empty instance, to parse into, without going 
+            through the (encoding) constructor.
+        '''
+        r = cls.__new__(cls)
+        Response.__init__(r)
+        return r
+    
     def minPayloadSize(self, blk:bytearray):
         return 0 
     
+    def payloadDecided(self, blk:bytearray):
+        '''
+            Whether blk holds enough to tell how long the payload 
+            is, when more may still be on its way (a decoder fed as 
+            bytes come in holds on to it until then).  Only false
+            for the few with optional trailing fields.
+        '''
+        return True
+    
     def parseFrom(self, blk:bytearray):
         num_bytes_in_header = len(self.Header)
         if len(blk) < num_bytes_in_header:
@@ -93,6 +128,8 @@ class ResponseOKMessage(Response):
             
     
     def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 1:
+            return 1
         return blk[0] + 1
     
     def extractPayload(self, blk:bytearray):
@@ -125,6 +162,8 @@ class ResponseError(Response):
             self.message = b''
             
     def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 2:
+            return 2
         return blk[1] + 2
     
     def extractPayload(self, blk:bytearray):
@@ -186,20 +225,93 @@ class ResponseExperiment(Response):
         if self.exception_id:
             return f'<EXPERIMENT {self.exp_id} completed:{self.completed} EXCEPTION:{self.exception_id} {self.result}>'
         return f'<EXPERIMENT {self.exp_id} completed:{self.completed} result:{self.result}>'
+
+class ResponseExperimentFragment(Response):
+    # '''
+    #     Piece of an experiment's whole result, for those over 11 bytes
+    #     0x0A EXPERIMENTID TOTALLEN(2) OFFSET(2) RESULTCRC LEN DATA (see fragments)
+    # '''
+    Header = b'\x0a'
+    def __init__(self, exp_id:int, result:bytearray, offset:int, size:int):
+        super().__init__()
+        total = len(result)
+        if offset > total:
+            offset = total
+        if size > total - offset:
+            size = total - offset
+        self.exp_id = exp_id
+        self.total = total
+        self.offset = offset
+        self.result_crc = crc8(result, 0, total)
+        self.data = result[offset:(offset + size)]
+        self.append(exp_id)
+        self.append(total.to_bytes(2, 'little'))
+        self.append(offset.to_bytes(2, 'little'))
+        self.append(self.result_crc)
+        self.append(size)
+        self.append(self.data)
+
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 7:
+            return 7
+        if not blk[0] or (blk[3] | (blk[4] << 8)) + blk[6] > (blk[1] | (blk[2] << 8)):
+            # no experiment, or a piece past the end: not a fragment
+            raise ValueError('bad fragment')
+        return blk[6] + 7
+
+    def extractPayload(self, blk:bytearray):
+        self.exp_id = blk[0]
+        self.total = blk[1] | (blk[2] << 8)
+        self.offset = blk[3] | (blk[4] << 8)
+        self.result_crc = blk[5]
+        dlen = blk[6]
+        self.data = blk[7:(7+dlen)]
+        self.payload = blk[:(7+dlen)]
+        return blk[(7+dlen):]
+
+    def __str__(self):
+        return f'<EXPERIMENT {self.exp_id} FRAGMENT {self.offset}-{self.offset + len(self.data)}/{self.total} {self.data}>'
+
 class ResponseFile(Response):
+    # '''
+    #     File info
+    #     'F' b'SZ' SIZE(4), 'F' b'CS' CRC32(4), or 'F' b'D' LSCHUNK 
+    #     (no length to it: can't be parsed)
+    # '''
     Header = b'F'
+    # fixed size replies, by type
+    ValueTypes = (b'SZ', b'CS')
     def __init__(self, rtype:bytes, value:bytearray=None):
         super().__init__()
+        self.rtype = rtype
+        self.value = value
+        if value is not None and rtype in self.ValueTypes:
+            self.value = int.from_bytes(value, 'little')
         self.append(rtype)
         if value is not None:
             self.append(value)
             
     
     def minPayloadSize(self, blk:bytearray):
-        raise RuntimeError('TODO')
+        if len(blk) < 2:
+            return 2
+        if bytes(blk[0:2]) not in self.ValueTypes:
+            # e.g. directory listing chunks: nothing says where they end
+            raise ValueError(f'F{bytes(blk[0:2])} has no length')
+        return 6
     
     def extractPayload(self, blk:bytearray):
-        raise RuntimeError('TODO')
+        self.rtype = bytes(blk[0:2])
+        self.value = int.from_bytes(blk[2:6], 'little')
+        self.payload = blk[:6]
+        return blk[6:]
+    
+    def __str__(self):
+        if self.rtype == b'CS':
+            return f'<FILE checksum {hex(self.value)}>'
+        if self.rtype == b'SZ':
+            return f'<FILE size {self.value}>'
+        return f'<FILE {self.rtype} {self.value}>'
             
             
 class ResponseStatus(Response):
@@ -235,6 +347,10 @@ class ResponseStatus(Response):
     def minPayloadSize(self, blk:bytearray):
         return 7
     
+    def payloadDecided(self, blk:bytearray):
+        # the result runs to the end of the transfer, up to 8 bytes
+        return len(blk) >= 15
+    
     def extractPayload(self, blk:bytearray):
         self.running = True if blk[0] else False
         self.exp_id = blk[1]
@@ -301,9 +417,91 @@ class ResponseDataBytes(Response):
         self.payload = blk[:(1+dlen)]
         return blk[(1+dlen):]
         
+class ResponseFileData(Response):
+    # '''
+    #     Chunk of a file being streamed down ('FT'), and where it's from
+    #     0x0B OFFSET(4) LEN DATA
+    # '''
+    Header = b'\x0b'
+    def __init__(self, offset:int, data:bytearray):
+        super().__init__()
+        self.offset = offset
+        self.data = data
+        self.append(offset.to_bytes(4, 'little'))
+        self.append(len(data))
+        self.append(data)
+        
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 5:
+            return 5
+        return blk[4] + 5
+    
+    def extractPayload(self, blk:bytearray):
+        self.offset = int.from_bytes(blk[0:4], 'little')
+        dlen = blk[4]
+        self.data = blk[5:(5+dlen)]
+        self.payload = blk[:(5+dlen)]
+        return blk[(5+dlen):]
+    
+    def __str__(self):
+        return f'<FILE DATA {self.offset}-{self.offset + len(self.data)} {self.data}>'
+        
+        
+class ResponseBlockChecksums(Response):
+    # '''
+    #     CRC-32s of consecutive blocks of a file ('FK'), from OFFSET
+    #     0x0C OFFSET(4) SHIFT COUNT CRC(4)*COUNT
+    #     blocks being 1 << SHIFT bytes
+    # '''
+    Header = b'\x0c'
+    MinShift = 6
+    MaxShift = 15
+    MaxBlocks = 16
+    def __init__(self, offset:int, shift:int, crcs:list):
+        super().__init__()
+        self.offset = offset
+        self.shift = shift
+        self.crcs = crcs
+        self.append(offset.to_bytes(4, 'little'))
+        self.append(shift)
+        self.append(len(crcs))
+        for crc in crcs:
+            self.append(crc.to_bytes(4, 'little'))
+    
+    @property 
+    def block_size(self):
+        return 1 << self.shift
+        
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 6:
+            return 6
+        (shift, count) = (blk[4], blk[5])
+        if shift < self.MinShift or shift > self.MaxShift or not count or count > self.MaxBlocks:
+            # not one of these, whatever it is
+            raise ValueError('implausible block checksums')
+        return 6 + 4*count
+    
+    def extractPayload(self, blk:bytearray):
+        self.offset = int.from_bytes(blk[0:4], 'little')
+        self.shift = blk[4]
+        count = blk[5]
+        self.crcs = [int.from_bytes(blk[(6 + 4*i):(10 + 4*i)], 'little') for i in range(count)]
+        self.payload = blk[:(6 + 4*count)]
+        return blk[(6 + 4*count):]
+    
+    def __str__(self):
+        crcs = ' '.join([f'{crc:08x}' for crc in self.crcs])
+        return f'<BLOCK CRCS {self.offset} x{len(self.crcs)} of {self.block_size}: {crcs}>'
         
+
 class ResponseInfo(Response):
+    # '''
+    #     'I' PATCH MINOR MAJOR UPTIME(4) SYNCTIME(4) ['P' PROTOCOL] COMMENT
+    #     the comment starts with a protocol tag, e.g. 'P2', when the 
+    #     board supports response framing (see framing)
+    # '''
     Header = b'I'
+    ProtocolTag = ord('P')
     def __init__(self, v_maj:int, v_min:int, v_patch:int, v_comment:str, uptime:int, sync_time:int):
         super().__init__()
         bts = bytearray(11)
@@ -319,22 +517,36 @@ class ResponseInfo(Response):
         self.v_maj = v_maj
         self.uptime = uptime
         self.synctime = sync_time
+        self.protocol = self.tagged_protocol(bts)
         self.append(bts)
         
-
+    @classmethod
+    def tagged_protocol(cls, blk:bytearray):
+        # highest protocol supported, 1 when untagged
+        if len(blk) >= 13 and blk[11] == cls.ProtocolTag and 0x31 <= blk[12] <= 0x39:
+            return blk[12] - 0x30
+        return 1
         
     def minPayloadSize(self, blk:bytearray):
+        if len(blk) > 11 and blk[11] == self.ProtocolTag:
+            return 13
         return 11
     
+    def payloadDecided(self, blk:bytearray):
+        # tagged or not depends on the byte after the fixed part
+        return len(blk) > 11
+    
     def extractPayload(self, blk:bytearray):
         self.v_patch = blk[0]
         self.v_min = blk[1]
         self.v_maj = blk[2]
         self.uptime = int.from_bytes(blk[3:(3+4)], 'little')
         self.synctime = int.from_bytes(blk[7:(7+4)], 'little')
+        self.protocol = self.tagged_protocol(blk)
         
-        self.payload = blk[:11]
-        return blk[11:]
+        plen = 13 if self.protocol > 1 else 11
+        self.payload = blk[:plen]
+        return blk[plen:]
 
     def __str__(self):
         #t = time.gmtime(self.uptime)
@@ -342,12 +554,258 @@ class ResponseInfo(Response):
         
         t = time.gmtime(self.synctime)
         synctime = f"{t[0]}-{t[1]:02d}-{t[2]:02d} {t[3]:02d}:{t[4]:02d}:{t[5]:02d}"
+        if self.protocol > 1:
+            return f'<INFO v{self.v_maj}.{self.v_min}.{self.v_patch} p{self.protocol} synctime {synctime}>'
         return f'<INFO v{self.v_maj}.{self.v_min}.{self.v_patch} synctime {synctime}>'
     
+class ResponseMetrics(Response):
+    # '''
+    #     Runtime metrics, one page at a time
+    #     'M' PAGE LEN VALUES (little endian, widths per page below)
+    # '''
+    Header = b'M'
+    
+    PageLoop = 0
+    PageI2C = 1
+    PageTx = 2
+    PageMemory = 3
+    PageFiles = 4
+    
+    # (name, width in bytes) for the values on each page
+    PageLayouts = [
+        [('loops/s', 2), ('worst loop us', 4), ('idle %', 1), ('awake %', 1), ('cmd latency us', 4)],
+        [('frames rx', 4), ('frames dropped', 2), ('ring high water', 1), ('unknown cmds', 2), ('reports superseded', 2)],
+        [('bytes queued', 4), ('bytes sent', 4), ('bytes discarded', 4), ('tx underruns', 2), ('tx swaps', 4)],
+        [('mem free', 4), ('largest free block', 4), ('gc count', 2), ('core1 runtime s', 4)],
+        [('write buffered', 2), ('file writes', 4), ('bytes written', 4), ('idle flushes', 2), ('checksum hits', 2)],
+    ]
+    
+    def __init__(self, page:int, values:list=None):
+        super().__init__()
+        self.page = page
+        self.values = values if values is not None else []
+        self.append(page)
+        if page >= len(self.PageLayouts):
+            self.append(0)
+            return 
+        
+        layout = self.PageLayouts[page]
+        self.append(sum([w for (_n, w) in layout]))
+        for i in range(len(layout)):
+            width = layout[i][1]
+            v = self.values[i] if i < len(self.values) else 0
+            vmax = (1 << (8*width)) - 1
+            if v > vmax:
+                v = vmax 
+            elif v < 0:
+                v = 0
+            self.append(v.to_bytes(width, 'little'))
+    
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 2:
+            return 2
+        page = blk[0]
+        if page >= len(self.PageLayouts):
+            raise ValueError(f'no metrics page {page}')
+        if blk[1] != sum([w for (_n, w) in self.PageLayouts[page]]):
+            raise ValueError(f'metrics page {page} is not {blk[1]} bytes')
+        return blk[1] + 2
+    
+    def extractPayload(self, blk:bytearray):
+        self.page = blk[0]
+        plen = blk[1]
+        data = blk[2:(2+plen)]
+        self.values = []
+        if self.page < len(self.PageLayouts):
+            idx = 0
+            for (_n, width) in self.PageLayouts[self.page]:
+                self.values.append(int.from_bytes(data[idx:(idx+width)], 'little'))
+                idx += width
+        
+        self.payload = blk[:(2+plen)]
+        return blk[(2+plen):]
+    
+    def fields(self):
+        if self.page >= len(self.PageLayouts):
+            return []
+        names = [n for (n, _w) in self.PageLayouts[self.page]]
+        return list(zip(names, self.values))
+    
+    def values_string(self):
+        return ' '.join([f'{n}:{v}' for (n, v) in self.fields()])
+    
+    def __str__(self):
+        return f'<METRICS p{self.page} {self.values_string()}>'
+    
+class ResponseBatch(Response):
+    # '''
+    #     Replies to the sub-commands of a batch ('B'), in order
+    #     'B' COUNT LEN [SUBLEN SUBRESPONSE[SUBLEN]]... 
+    #     LEN covering all the (SUBLEN SUBRESPONSE) items
+    # '''
+    Header = b'B'
+    MaxItemsSize = 255
+    
+    def __init__(self, count:int, items:bytearray=None):
+        super().__init__()
+        self.count = count
+        self.responses = []
+        self.append(count)
+        if items is not None and len(items):
+            self.append(len(items))
+            self.append(items)
+        else:
+            self.append(0)
+    
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 2:
+            return 2
+        return blk[1] + 2
+    
+    def extractPayload(self, blk:bytearray):
+        self.count = blk[0]
+        ilen = blk[1]
+        items = blk[2:(2+ilen)]
+        self.responses = []
+        idx = 0
+        while idx < len(items):
+            sublen = items[idx]
+            sub = ResponseFactory.parseItem(items[(idx+1):(idx+1+sublen)])
+            if sub is not None:
+                self.responses.append(sub)
+            idx += 1 + sublen
+        
+        self.payload = blk[:(2+ilen)]
+        return blk[(2+ilen):]
+    
+    def __str__(self):
+        return f'<BATCH {self.count}: {", ".join([str(r) for r in self.responses])}>'
+    
+class ResponseReportDelta(Response):
+    # '''
+    #     Auto-report, as the bytes that changed since a full one
+    #     'd' TYPE BASECRC LEN MASK(2) VALUES (see delta)
+    # '''
+    Header = b'd'
+    
+    @classmethod 
+    def num_changed(cls, mask:int):
+        count = 0
+        while mask:
+            count += mask & 1
+            mask >>= 1
+        return count
+    
+    def minPayloadSize(self, blk:bytearray):
+        if len(blk) < 5:
+            return 5
+        return 5 + self.num_changed(blk[3] | (blk[4] << 8))
+    
+    def extractPayload(self, blk:bytearray):
+        self.report_type = blk[0]
+        self.base_crc = blk[1]
+        self.report_len = blk[2]
+        self.mask = blk[3] | (blk[4] << 8)
+        vlen = self.num_changed(self.mask)
+        self.values = blk[5:(5+vlen)]
+        self.payload = blk[:(5+vlen)]
+        return blk[(5+vlen):]
+    
+    def applies_to(self, base:bytearray):
+        return len(base) and base[0] == self.report_type and crc8(base) == self.base_crc
+    
+    def apply(self, base:bytearray):
+        '''
+            The whole report, given the one it's relative to
+        '''
+        report = bytearray(self.report_len)
+        blen = len(base) if len(base) < self.report_len else self.report_len
+        report[0:blen] = base[0:blen]
+        mask = self.mask
+        pos = 0
+        idx = 0
+        while mask and pos < self.report_len:
+            if mask & 1:
+                report[pos] = self.values[idx]
+                idx += 1
+            mask >>= 1
+            pos += 1
+        return report
+    
+    def __str__(self):
+        return f'<DELTA {hex(self.report_type)} on {hex(self.base_crc)}: {self.report_len} bytes, {hex(self.mask)} {self.values}>'
+    
 class ResponseFactory:
+    '''
+        Goes straight to the right Response class, by header: 
+        the first byte, or the second for system messages (0x01),
+        then checks there's enough there to parse.
+    '''
+    SystemMessage = 0x01
+    # header, length byte and up to 255 bytes: never need more than this to parse
+    MaxFrameSize = 4 + 1 + 255
+    
+    ByFirstByte = dict()
+    BySystemByte = dict()
+    
     def __init__(self):
         pass 
     
+    @classmethod 
+    def register(cls, rclass):
+        hdr = rclass.Header
+        if hdr[0] == cls.SystemMessage:
+            cls.BySystemByte[hdr[1]] = rclass
+        else:
+            cls.ByFirstByte[hdr[0]] = rclass
+            
+    @classmethod 
+    def lookup(cls, blk):
+        '''
+            Response class for the header at the start of blk, or None
+        '''
+        first = blk[0]
+        if first != cls.SystemMessage:
+            return cls.ByFirstByte.get(first)
+        if len(blk) < 2:
+            return None
+        return cls.BySystemByte.get(blk[1])
+    
+    @classmethod 
+    def decode(cls, rclass, blk):
+        '''
+            rclass instance parsed from the start of blk, 
+            None if that's not all there (yet), or isn't one
+        '''
+        hdr = rclass.Header
+        hlen = len(hdr)
+        if len(blk) < hlen or blk[:hlen] != hdr:
+            return None
+        post = blk[hlen:(hlen + cls.MaxFrameSize)]
+        rt = rclass.blank()
+        try:
+            need = rt.minPayloadSize(post)
+        except ValueError:
+            # can't be parsed as that
+            return None
+        if need > len(post):
+            return None
+        rt.extractPayload(post)
+        return rt
+    
+    @classmethod
+    def parseItem(cls, bts:bytearray):
+        '''
+            Response from bytes holding exactly one 
+            encoded response (e.g. an item in a batch), or None
+        '''
+        if not len(bts):
+            return None
+        rclass = cls.lookup(bts)
+        if rclass is None:
+            return None
+        return cls.decode(rclass, bts)
+    
     @classmethod
     def constructFrom(cls, blk):
         if not len(blk):
@@ -360,27 +818,12 @@ class ResponseFactory:
         if not len(blk):
             return None
         
-        rPoss = [
-                ResponseOK(),
-                ResponseOKMessage(b''),
-                ResponseDataBytes(b''),
-                ResponseError(0, b''),
-                ResponseExperiment(0, False, 0, b''),
-                ResponseFile(b''),
-                ResponseInfo(0,0,0,'', 0, 0),
-                ResponseStatus(False, 0, 0, 0),
-                ResponseVariableValue(0, b'')
-            ]
-        
-        for rt in rPoss:
-            try:
-                rt.parseFrom(blk)
+        rclass = cls.lookup(blk)
+        if rclass is not None:
+            rt = cls.decode(rclass, blk)
+            if rt is not None:
                 blk.consume(len(rt))
-                # print(f"Parsed a {rt} from block, {len(blk)} leftover")
                 return rt
-            except ValueError:
-                # print(f"Parsing {blk} didn't work out")
-                pass
         
         #print(f'Could not get a match for {blk}')
         if len(blk) > 16:
@@ -390,4 +833,7 @@ class ResponseFactory:
             
         return None
 
-        
\ No newline at end of file
+for _rclass in [ResponseOK, ResponseOKMessage, ResponseError, ResponseBatch, 
+                ResponseDataBytes, ResponseExperiment, ResponseExperimentFragment, ResponseFile, ResponseFileData, ResponseBlockChecksums, ResponseInfo,
+                ResponseMetrics, ResponseStatus, ResponseVariableValue, ResponseReportDelta]:
+    ResponseFactory.register(_rclass)
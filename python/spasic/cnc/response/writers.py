@@ -0,0 +1,297 @@
+'''
+Fixed-layout response writers, for the server side.
+
+Same bytes on the wire as the corresponding Response classes (which
+stay, for parsing on the ground) but nothing gets built: the fields
+are held as-is and only written out, at precomputed offsets, when
+the frame is encoded into the transmit arena.  Anything with a
+__len__ and encode_into() can be put() in a TxArena or batched.
+
+Frames are encoded the moment they're queued, so one writer of each
+kind gets reused: status(), experiment() etc. set it up and return it
+
+  queue_telemetry(writers.status(res.running, ...), txa.ReportStatus)
+
+and queuing an auto-report no longer allocates anything.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from spasic.cnc.response.framing import crc8
+
+def _put_u32(buf:bytearray, offset:int, v:int):
+    buf[offset] = v & 0xff
+    buf[offset + 1] = (v >> 8) & 0xff
+    buf[offset + 2] = (v >> 16) & 0xff
+    buf[offset + 3] = (v >> 24) & 0xff
+
+def _put_bytes(buf:bytearray, offset:int, bts, num_bytes:int):
+    for i in range(num_bytes):
+        buf[offset + i] = bts[i]
+
+def _len_of(bts, max_len:int):
+    if bts is None:
+        return 0
+    blen = len(bts)
+    return blen if blen < max_len else max_len
+
+class OKWriter:
+    # 0x01 0x01 b'OK'
+    __slots__ = ()
+    Header = b'\x01\x01OK'
+    def __len__(self):
+        return 4
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        _put_bytes(buf, offset, self.Header, 4)
+        return 4
+
+class OKMessageWriter:
+    # 0x01 0x02 b'OK' LEN MSGBYTES
+    __slots__ = ('message', 'message_len')
+    Header = b'\x01\x02OK'
+    MaxMessage = 255
+    def __init__(self):
+        self.set(None)
+
+    def set(self, msg):
+        self.message = msg
+        self.message_len = _len_of(msg, self.MaxMessage)
+        return self
+
+    def __len__(self):
+        return 5 + self.message_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        _put_bytes(buf, offset, self.Header, 4)
+        buf[offset + 4] = self.message_len
+        _put_bytes(buf, offset + 5, self.message, self.message_len)
+        return 5 + self.message_len
+
+class ErrorWriter:
+    # 0x01 0x00 ERRORCODE ERRLEN BYTES[0:ERRLEN]
+    __slots__ = ('code', 'message', 'message_len')
+    MaxMessage = 255
+    def __init__(self):
+        self.set(0)
+
+    def set(self, err_code:int, err_bts=None):
+        self.code = err_code
+        self.message = err_bts
+        self.message_len = _len_of(err_bts, self.MaxMessage)
+        return self
+
+    def __len__(self):
+        return 4 + self.message_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x01
+        buf[offset + 1] = 0x00
+        buf[offset + 2] = self.code & 0xff
+        buf[offset + 3] = self.message_len
+        _put_bytes(buf, offset + 4, self.message, self.message_len)
+        return 4 + self.message_len
+
+class ExperimentWriter:
+    # 0x09 EXPERIMENTID COMPLETED EXCEPTID LEN RESULTBYTES
+    __slots__ = ('exp_id', 'completed', 'exception_id', 'result', 'result_len')
+    MaxResult = 11
+    def __init__(self):
+        self.set(0, False, 0, None)
+
+    def set(self, exp_id:int, completed:bool, exception_id:int, result):
+        self.exp_id = exp_id
+        self.completed = completed
+        self.exception_id = exception_id
+        self.result = result
+        self.result_len = _len_of(result, self.MaxResult)
+        return self
+
+    def __len__(self):
+        return 5 + self.result_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x09
+        buf[offset + 1] = self.exp_id & 0xff
+        buf[offset + 2] = 1 if self.completed else 0
+        buf[offset + 3] = self.exception_id & 0xff
+        buf[offset + 4] = self.result_len
+        _put_bytes(buf, offset + 5, self.result, self.result_len)
+        return 5 + self.result_len
+
+class ExperimentFragmentWriter:
+    # 0x0A EXPERIMENTID TOTALLEN(2) OFFSET(2) RESULTCRC LEN DATA
+    # the crc is over the whole result, as it stands when set()
+    __slots__ = ('exp_id', 'result', 'total', 'offset', 'size', 'result_crc')
+    MaxFragment = 255 - 8 # has to fit in a frame body
+    def __init__(self):
+        self.set(0, None, 0, 0)
+
+    def set(self, exp_id:int, result, offset:int, size:int):
+        total = _len_of(result, 0xffff)
+        if offset > total:
+            offset = total
+        if size > self.MaxFragment:
+            size = self.MaxFragment
+        if size > total - offset:
+            size = total - offset
+        self.exp_id = exp_id
+        self.result = result
+        self.total = total
+        self.offset = offset
+        self.size = size
+        self.result_crc = crc8(result, 0, total) if total else 0
+        return self
+
+    def __len__(self):
+        return 8 + self.size
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x0A
+        buf[offset + 1] = self.exp_id & 0xff
+        buf[offset + 2] = self.total & 0xff
+        buf[offset + 3] = (self.total >> 8) & 0xff
+        buf[offset + 4] = self.offset & 0xff
+        buf[offset + 5] = (self.offset >> 8) & 0xff
+        buf[offset + 6] = self.result_crc
+        buf[offset + 7] = self.size
+        result = self.result
+        start = self.offset
+        for i in range(self.size):
+            buf[offset + 8 + i] = result[start + i]
+        return 8 + self.size
+
+class StatusWriter:
+    # 0x07 [RUNNING] [EXPID] [EXCEPTID] [RUNTIME 4bytes] [RESULT up to 8 bytes]
+    __slots__ = ('running', 'exp_id', 'exception_id', 'run_time', 'result', 'result_len')
+    MaxResult = 8
+    def __init__(self):
+        self.set(False)
+
+    def set(self, exp_running:bool, exp_id:int=0, exception_id:int=0, run_time_s:int=0, result=None):
+        self.running = exp_running
+        self.exp_id = exp_id
+        self.exception_id = exception_id
+        self.run_time = run_time_s
+        self.result = result
+        self.result_len = _len_of(result, self.MaxResult)
+        return self
+
+    def __len__(self):
+        return 8 + self.result_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x07
+        buf[offset + 1] = 1 if self.running else 0
+        buf[offset + 2] = self.exp_id & 0xff
+        buf[offset + 3] = self.exception_id & 0xff
+        _put_u32(buf, offset + 4, self.run_time)
+        _put_bytes(buf, offset + 8, self.result, self.result_len)
+        return 8 + self.result_len
+
+class FileDataWriter:
+    # 0x0B OFFSET(4) LEN DATA
+    __slots__ = ('offset', 'data', 'data_len')
+    def __init__(self):
+        self.set(0, None, 0)
+
+    def set(self, offset:int, data, data_len:int):
+        self.offset = offset
+        self.data = data
+        self.data_len = data_len
+        return self
+
+    def __len__(self):
+        return 6 + self.data_len
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x0B
+        _put_u32(buf, offset + 1, self.offset)
+        buf[offset + 5] = self.data_len
+        _put_bytes(buf, offset + 6, self.data, self.data_len)
+        return 6 + self.data_len
+
+class BlockChecksumsWriter:
+    # 0x0C OFFSET(4) SHIFT COUNT CRC(4)*COUNT, blocks of 1 << SHIFT bytes
+    __slots__ = ('offset', 'shift', 'crcs', 'count')
+    def __init__(self):
+        self.set(0, 0, None, 0)
+
+    def set(self, offset:int, shift:int, crcs, count:int):
+        self.offset = offset
+        self.shift = shift
+        self.crcs = crcs
+        self.count = count
+        return self
+
+    def __len__(self):
+        return 7 + 4*self.count
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        buf[offset] = 0x0C
+        _put_u32(buf, offset + 1, self.offset)
+        buf[offset + 5] = self.shift
+        buf[offset + 6] = self.count
+        for i in range(self.count):
+            _put_u32(buf, offset + 7 + 4*i, self.crcs[i])
+        return 7 + 4*self.count
+
+class InfoWriter:
+    # 'I' PATCH MINOR MAJOR UPTIME(4) SYNCTIME(4) COMMENT
+    # version and comment don't change: encoded once, up front
+    __slots__ = ('prefix', 'uptime', 'sync_time')
+    def __init__(self, v_maj:int, v_min:int, v_patch:int, v_comment:str):
+        comment = bytearray(v_comment, 'ascii') if v_comment else bytearray()
+        self.prefix = bytearray(12 + len(comment))
+        self.prefix[0:4] = bytearray([ord('I'), v_patch, v_min, v_maj])
+        self.prefix[12:] = comment
+        self.set(0, 0)
+
+    def set(self, uptime:int, sync_time:int):
+        self.uptime = uptime
+        self.sync_time = sync_time
+        return self
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def encode_into(self, buf:bytearray, offset:int=0):
+        plen = len(self.prefix)
+        _put_bytes(buf, offset, self.prefix, plen)
+        _put_u32(buf, offset + 4, self.uptime)
+        _put_u32(buf, offset + 8, self.sync_time)
+        return plen
+
+
+_ok = OKWriter()
+_ok_message = OKMessageWriter()
+_error = ErrorWriter()
+_experiment = ExperimentWriter()
+_experiment_fragment = ExperimentFragmentWriter()
+_status = StatusWriter()
+_file_data = FileDataWriter()
+_block_checksums = BlockChecksumsWriter()
+
+def ok():
+    return _ok
+
+def ok_message(msg):
+    return _ok_message.set(msg)
+
+def error(err_code:int, err_bts=None):
+    return _error.set(err_code, err_bts)
+
+def experiment(exp_id:int, completed:bool, exception_id:int, result):
+    return _experiment.set(exp_id, completed, exception_id, result)
+
+def experiment_fragment(exp_id:int, result, offset:int, size:int):
+    return _experiment_fragment.set(exp_id, result, offset, size)
+
+def status(exp_running:bool, exp_id:int=0, exception_id:int=0, run_time_s:int=0, result=None):
+    return _status.set(exp_running, exp_id, exception_id, run_time_s, result)
+
+def file_data(offset:int, data, data_len:int):
+    return _file_data.set(offset, data, data_len)
+
+def block_checksums(offset:int, shift:int, crcs, count:int):
+    return _block_checksums.set(offset, shift, crcs, count)
@@ -0,0 +1,176 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Adaptive idle for the main loop.
+
+While there's traffic, the loop runs every min_sleep_ms.  Once nothing 
+has happened for backoff_after_ms, the sleep between passes doubles 
+each pass, up to max_sleep_ms.  During those longer sleeps, wait() can 
+still peek at the bus every wake_check_ms through a cheap check 
+function, so an incoming frame gets us back to full speed right away 
+rather than at the end of the nap.
+
+Also keeps track of
+  * command to response latency: from the pass that fetched a command 
+    frame to the one where the resulting response went to the slave;
+  * where the time goes: passes that did something, passes that 
+    didn't (idle) and sleeping;
+  * the longest pass.
+'''
+import time
+
+# same trick as the dispatch counters: stay in small int territory
+CounterCeiling = 0x20000000
+
+class LoopScheduler:
+    def __init__(self, min_sleep_ms:int=1, max_sleep_ms:int=20, 
+                 backoff_after_ms:int=500, wake_check_ms:int=1):
+        if min_sleep_ms < 1:
+            min_sleep_ms = 1
+        if max_sleep_ms < min_sleep_ms:
+            max_sleep_ms = min_sleep_ms
+        self.min_sleep_ms = min_sleep_ms
+        self.max_sleep_ms = max_sleep_ms
+        self.backoff_after_ms = backoff_after_ms
+        self.wake_check_ms = wake_check_ms
+        
+        self.sleep_ms = min_sleep_ms
+        self._last_activity = time.ticks_ms()
+        self._pass_start = time.ticks_us()
+        self._rx_pending = False
+        self._rx_start = 0
+        
+        self.reset_stats()
+        
+    def reset_stats(self):
+        self.busy_us = 0
+        self.idle_us = 0
+        self.sleep_us = 0
+        self.early_wakes = 0
+        self.worst_pass_us = 0
+        self.latency_count = 0
+        self.latency_total_us = 0
+        self.latency_min_us = 0
+        self.latency_max_us = 0
+        
+    def pass_start(self):
+        self._pass_start = time.ticks_us()
+        
+    def note_rx(self):
+        '''
+            Command frame(s) fetched this pass.
+        '''
+        self.wake()
+        if not self._rx_pending:
+            self._rx_pending = True 
+            self._rx_start = self._pass_start
+    
+    def note_response(self, sent:bool):
+        '''
+            Call once the commands fetched have been processed: 
+            sent is whether that produced something for the master.
+        '''
+        if not self._rx_pending:
+            return 
+        self._rx_pending = False
+        if not sent:
+            return 
+        
+        latency = time.ticks_diff(time.ticks_us(), self._rx_start)
+        count = self.latency_count
+        total = self.latency_total_us + latency
+        if total >= CounterCeiling:
+            count >>= 1
+            total >>= 1
+        if not count or latency < self.latency_min_us:
+            self.latency_min_us = latency
+        if latency > self.latency_max_us:
+            self.latency_max_us = latency
+        self.latency_count = count + 1
+        self.latency_total_us = total
+        
+    def wake(self):
+        '''
+            Something happened: back to full speed.
+        '''
+        self.sleep_ms = self.min_sleep_ms
+        self._last_activity = time.ticks_ms()
+        
+    def pass_end(self, busy:bool):
+        '''
+            Account for the pass and adjust the sleep period.
+        '''
+        elapsed = time.ticks_diff(time.ticks_us(), self._pass_start)
+        if elapsed > self.worst_pass_us:
+            self.worst_pass_us = elapsed
+        if busy:
+            self.busy_us += elapsed
+            self.wake()
+        else:
+            self.idle_us += elapsed
+            if self.sleep_ms < self.max_sleep_ms and \
+               time.ticks_diff(time.ticks_ms(), self._last_activity) >= self.backoff_after_ms:
+                self.sleep_ms *= 2
+                if self.sleep_ms > self.max_sleep_ms:
+                    self.sleep_ms = self.max_sleep_ms
+        
+        if self.busy_us + self.idle_us + self.sleep_us >= CounterCeiling:
+            self.busy_us >>= 1
+            self.idle_us >>= 1
+            self.sleep_us >>= 1
+                
+    def wait(self, wake_check=None):
+        '''
+            Sleep for the current period.  If wake_check is 
+            given, it's called every wake_check_ms and we 
+            return early (and wake()) as soon as it's True.
+        '''
+        t_start = time.ticks_us()
+        period = self.sleep_ms
+        step = self.wake_check_ms
+        if wake_check is None or step < 1 or step >= period:
+            time.sleep_ms(period)
+        else:
+            slept = 0
+            while slept < period:
+                time.sleep_ms(step)
+                slept += step
+                if wake_check():
+                    self.early_wakes += 1
+                    self.wake()
+                    break
+                
+        self.sleep_us += time.ticks_diff(time.ticks_us(), t_start)
+        
+    def latency(self):
+        '''
+            (count, min us, avg us, max us) command to response
+        '''
+        count = self.latency_count
+        if not count:
+            return (0, 0, 0, 0)
+        return (count, self.latency_min_us, self.latency_total_us // count, self.latency_max_us)
+    
+    def idle_share(self):
+        '''
+            Percent of the time spent running passes 
+            that found nothing to do
+        '''
+        total = self.busy_us + self.idle_us + self.sleep_us
+        if not total:
+            return 0
+        return (self.idle_us * 100) // total
+    
+    def awake_share(self):
+        '''
+            Percent of the time spent not sleeping
+        '''
+        total = self.busy_us + self.idle_us + self.sleep_us
+        if not total:
+            return 0
+        return ((self.busy_us + self.idle_us) * 100) // total
+        
+    def __repr__(self):
+        (count, lmin, lavg, lmax) = self.latency()
+        return f'<LoopScheduler sleep:{self.sleep_ms}ms idle:{self.idle_share()}% awake:{self.awake_share()}% lat:{count} {lmin}/{lavg}/{lmax}us>'
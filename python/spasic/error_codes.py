@@ -16,4 +16,5 @@ WriteFailure = 0x0A
 MakeDirFailure = 0x0B
 DeleteFileFailure = 0x0C
 RenameFileFailure = 0x0D
-POSTTestFail = 0x0E
\ No newline at end of file
+POSTTestFail = 0x0E
+PatchFailure = 0x0F
\ No newline at end of file
@@ -0,0 +1,282 @@
+'''
+File checksums: CRC-32, worked out a block at a time, and remembered.
+
+'FZ' used to XOR the file's 4 byte words together, reading them one
+read(4) at a time, all in one go: a new bytes object per word, a main
+loop stalled for as long as the file took, and a checksum blind to
+words that trade places.  Now it's a CRC-32 (as in zlib/binascii, so
+the ground can use its own), over a 512 byte buffer filled with
+readinto(), a few blocks per main loop pass (see ChecksumJob).
+
+Results go in a ChecksumIndex, keyed by (path, size, write generation),
+the generation being bumped by FSAccess every time it opens the path
+for writing, writes to it, deletes it or moves something to or from it.  So asking
+again for a file that hasn't changed is answered right away.  The
+index is kept in a small text file, one
+
+  CRC SIZE GENERATION PATH
+
+per line, and reloaded at boot.  Files changed behind FSAccess' back
+(same size, same generation) aren't caught.
+
+BlockChecksumJob does the same for a run of fixed size blocks of a
+file, one CRC-32 each, for resumable uploads ('FK').  Those aren't
+indexed: they're asked for while the file is still being written.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+BlockSize = 512
+
+if crc32 is None:
+    def _crc32_table():
+        table = []
+        for i in range(256):
+            crc = i
+            for _b in range(8):
+                if crc & 1:
+                    crc = (crc >> 1) ^ 0xEDB88320
+                else:
+                    crc >>= 1
+            table.append(crc)
+        return table
+
+    _CRC32Table = _crc32_table()
+
+    def crc32(bts, crc:int=0):
+        table = _CRC32Table
+        crc ^= 0xffffffff
+        for b in bts:
+            crc = table[(crc ^ b) & 0xff] ^ (crc >> 8)
+        return crc ^ 0xffffffff
+
+def file_crc32(filepath:str, bufsize:int=BlockSize):
+    '''
+        CRC-32 of a whole file, in one go (e.g. on the ground)
+    '''
+    buf = bytearray(bufsize)
+    view = memoryview(buf)
+    crc = 0
+    with open(filepath, 'rb') as f:
+        n = f.readinto(buf)
+        while n:
+            crc = crc32(view[:n], crc)
+            n = f.readinto(buf)
+    return crc
+
+class ChecksumIndex:
+    '''
+        (path, size, generation) -> crc, persisted to index_path
+        (None to only keep them in RAM)
+    '''
+    def __init__(self, index_path:str=None, max_entries:int=32):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.entries = [] # [path, size, generation, crc], newest last
+        self.generations = dict()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def generation(self, path:str):
+        return self.generations.get(path, 0)
+
+    def bump(self, path:str):
+        '''
+            path was (or is about to be) changed
+        '''
+        self.generations[path] = self.generation(path) + 1
+        if self._find(path) is not None:
+            self._drop(path)
+            self.save()
+
+    def lookup(self, path:str, size:int):
+        entry = self._find(path)
+        if entry is None or entry[1] != size or entry[2] != self.generation(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[3]
+
+    def store(self, path:str, size:int, generation:int, crc:int):
+        if generation != self.generation(path):
+            # changed while it was being worked out
+            return False
+        self._drop(path)
+        self.entries.append([path, size, generation, crc])
+        if len(self.entries) > self.max_entries:
+            self.entries.pop(0)
+        self.save()
+        return True
+
+    def _find(self, path:str):
+        for entry in self.entries:
+            if entry[0] == path:
+                return entry
+        return None
+
+    def _drop(self, path:str):
+        self.entries = [e for e in self.entries if e[0] != path]
+
+    def load(self):
+        self.entries = []
+        if self.index_path is None:
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split(' ', 3)
+                    if len(fields) != 4:
+                        continue
+                    (crc, size, gen, path) = (int(fields[0], 16), int(fields[1]), int(fields[2]), fields[3])
+                    self.entries.append([path, size, gen, crc])
+                    self.generations[path] = gen
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        if self.index_path is None:
+            return
+        try:
+            with open(self.index_path, 'w') as f:
+                for (path, size, gen, crc) in self.entries:
+                    f.write(f'{crc:08x} {size} {gen} {path}\n')
+        except OSError:
+            pass
+
+class ChecksumJob:
+    '''
+        CRC-32 of one file, a few blocks per step(), on
+        its own file handle.  One buffer, reused.
+    '''
+    def __init__(self, index:ChecksumIndex, block_size:int=BlockSize):
+        self.index = index
+        self.buffer = bytearray(block_size)
+        self.view = memoryview(self.buffer)
+        self.path = None
+        self._fh = None
+        self.size = 0
+        self.generation = 0
+        self.crc = 0
+        self.done = 0 # bytes through so far
+
+    @property
+    def active(self):
+        return self._fh is not None
+
+    def start(self, path:str, size:int):
+        self.abort()
+        try:
+            self._fh = open(path, 'rb')
+        except:
+            return False
+        self.path = path
+        self.size = size
+        self.generation = self.index.generation(path)
+        self.crc = 0
+        self.done = 0
+        return True
+
+    def abort(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def step(self, num_blocks:int=1):
+        '''
+            Goes through up to num_blocks more, returns True once
+            the whole file has been (crc is final, and indexed).
+        '''
+        if self._fh is None:
+            return True
+        for _i in range(num_blocks):
+            n = self._fh.readinto(self.buffer)
+            if not n:
+                self.abort()
+                self.index.store(self.path, self.size, self.generation, self.crc)
+                return True
+            self.crc = crc32(self.view[:n], self.crc)
+            self.done += n
+        return False
+
+class BlockChecksumJob:
+    '''
+        CRC-32s of count consecutive block_size blocks of a 
+        file, from offset, a read or so per step(): of what's 
+        actually there, so a block past the end of the file 
+        comes out as 0 and a partial one as the CRC of its part.
+        For the ground to compare against its own copy, block 
+        by block, during a resumable upload ('FK').
+    '''
+    MaxBlocks = 16
+    
+    def __init__(self, read_size:int=BlockSize):
+        self.buffer = bytearray(read_size)
+        self.view = memoryview(self.buffer)
+        self.crcs = [0] * self.MaxBlocks
+        self._fh = None
+        self.offset = 0
+        self.block_size = 0
+        self.count = 0
+        self.current = 0 # block being worked on
+        self.done = 0 # bytes of it, so far
+        
+    @property
+    def active(self):
+        return self._fh is not None
+    
+    def start(self, path:str, offset:int, block_size:int, count:int):
+        self.abort()
+        if count > self.MaxBlocks:
+            count = self.MaxBlocks
+        try:
+            self._fh = open(path, 'rb')
+            self._fh.seek(offset)
+        except:
+            self.abort()
+            return False
+        self.offset = offset
+        self.block_size = block_size
+        self.count = count
+        self.current = 0
+        self.done = 0
+        for i in range(count):
+            self.crcs[i] = 0
+        return True
+    
+    def abort(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+    
+    def step(self, num_reads:int=1):
+        '''
+            Up to num_reads more reads, returns True once 
+            all the blocks are done (crcs[:count] are final).
+        '''
+        if self._fh is None:
+            return True
+        bufsize = len(self.buffer)
+        for _i in range(num_reads):
+            want = self.block_size - self.done
+            if want > bufsize:
+                want = bufsize
+            n = self._fh.readinto(self.view[:want])
+            if not n:
+                # end of the file: whatever's left stays as is
+                self.abort()
+                return True
+            self.crcs[self.current] = crc32(self.view[:n], self.crcs[self.current])
+            self.done += n
+            if self.done >= self.block_size:
+                self.current += 1
+                self.done = 0
+                if self.current >= self.count:
+                    self.abort()
+                    return True
+        return False
@@ -1,13 +1,55 @@
 '''
 @author: Pat Deegan
 @copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Writes to a file open for writing are gathered in a buffer the size
+of a filesystem block and only go to the file a whole block at a time,
+on close(), on flush_writes(), or from service() once nothing has
+been written for a while: uploads come in 7 bytes at a time, and as 
+many tiny writes they're slow, hold up the main loop and wear flash.
+
+A file can also be opened for update (open_for_update(), no truncating)
+and written at any offset (write_at()), up to a limit, which is what
+lets an upload be resumed and patched up block by block.
 '''
 import os
+import time
+from spasic.fs.checksum import ChecksumIndex, ChecksumJob, BlockChecksumJob
+from spasic.fs.patch import PatchJob
+
+def fs_block_size(path:str='/', default:int=4096):
+    try:
+        return os.statvfs(path)[0]
+    except:
+        return default
 
 class FSAccess:
     
-    def __init__(self):
+    def __init__(self, checksum_index:str=None, write_buffer_size:int=-1, write_idle_ms:int=2000):
+        '''
+            write_buffer_size -1 to match the filesystem's
+            blocks, 0 to write straight through.
+        '''
         self._fh = None 
+        self._write_path = None # of _fh, when open for writing
+        self._write_limit = -1 # bytes write_bytes() still takes, after a write_at()
+        # CRC-32s worked out so far, see spasic.fs.checksum
+        self.checksums = ChecksumIndex(checksum_index)
+        
+        if write_buffer_size < 0:
+            write_buffer_size = fs_block_size()
+        self._wbuf = bytearray(write_buffer_size) if write_buffer_size else None
+        self._wbuf_view = memoryview(self._wbuf) if write_buffer_size else None
+        self._wbuf_len = 0
+        self._last_write = 0
+        self.write_idle_ms = write_idle_ms
+        self.bytes_written = 0
+        self.flushes = 0 # writes to the file proper
+        self.idle_flushes = 0
+        
+    @property 
+    def bytes_buffered(self):
+        return self._wbuf_len
     
     def file_size(self, filename):
         try:
@@ -25,6 +67,7 @@ class FSAccess:
         return True
     
     def delete(self, filepath):
+        self.checksums.bump(filepath)
         try:
             os.remove(filepath)
         except:
@@ -32,6 +75,8 @@ class FSAccess:
         
         return True
     def move(self, oldpath, newpath):
+        self.checksums.bump(oldpath)
+        self.checksums.bump(newpath)
         try:
             os.rename(oldpath, newpath)
         except:
@@ -73,25 +118,46 @@ class FSAccess:
         if self._fh is None:
             return False 
         
+        self.flush_writes()
         self._fh.close()
         self._fh = None 
+        if self._write_path is not None:
+            # anything checksummed while it was being written is stale
+            self.checksums.bump(self._write_path)
+            self._write_path = None
         return True
-    def simple_checksum(self, filepath):
-        if not self.open_for_read(filepath):
+    def cached_checksum(self, filepath):
+        '''
+            CRC-32 of the file, if it's known and it hasn't 
+            changed since, None otherwise
+        '''
+        return self.checksums.lookup(filepath, self.file_size(filepath))
+    
+    def checksum_job(self):
+        return ChecksumJob(self.checksums)
+    
+    def block_checksum_job(self):
+        return BlockChecksumJob()
+    
+    def patch_job(self, buffer_size:int=256):
+        return PatchJob(self.checksums, buffer_size)
+    
+    def checksum(self, filepath):
+        '''
+            CRC-32 of the whole file, all in one go
+        '''
+        cs = self.cached_checksum(filepath)
+        if cs is not None:
+            return cs
+        job = self.checksum_job()
+        if not job.start(filepath, self.file_size(filepath)):
             return 0xffffff
-        
-        csum = 0
-        v = self.read_bytes(4)
-        while len(v):
-            nval = int.from_bytes(v, 'little')
-            csum = csum ^ nval
-            v = self.read_bytes(4)
-            
-        return csum
+        while not job.step(8):
+            pass
+        return job.crc
         
     def open_for_read(self, filepath:str):
-        if self._fh is not None:
-            self._fh.close()
+        self.close()
         try:
             self._fh = open(filepath, 'rb')
         except:
@@ -109,18 +175,152 @@ class FSAccess:
         
         return bts
     
+    def seek(self, offset:int):
+        if self._fh is None:
+            return False
+        try:
+            self._fh.seek(offset)
+        except:
+            return False
+        return True
+    
+    def read_into(self, buf):
+        '''
+            Fills buf (e.g. a memoryview slice of a reused buffer) 
+            from the open file, returns the number of bytes read.
+            Unlike read_bytes(), the file stays open at EOF.
+        '''
+        if self._fh is None:
+            return 0
+        n = self._fh.readinto(buf)
+        return n if n else 0
+    
     def open_for_write(self, filepath:str):
-        if self._fh is not None:
-            self._fh.close()
+        self.close()
+        self.checksums.bump(filepath)
         try:
             self._fh = open(filepath, 'wb')
         except:
             return False
+        self._write_path = filepath
+        self._write_limit = -1
         
         return True
+    
+    def open_for_update(self, filepath:str):
+        '''
+            Open for writing, keeping what's there 
+            (creating the file if need be)
+        '''
+        self.close()
+        self.checksums.bump(filepath)
+        try:
+            self._fh = open(filepath, 'r+b')
+        except:
+            try:
+                self._fh = open(filepath, 'wb')
+            except:
+                return False
+        self._write_path = filepath
+        self._write_limit = -1
+        return True
+    
+    def write_at(self, offset:int, limit:int=-1):
+        '''
+            Following writes go in from offset, and only the 
+            first limit bytes of them are kept (-1: all)
+        '''
+        if self._write_path is None:
+            return False
+        self.flush_writes()
+        # what's there is about to change, size or not
+        self.checksums.bump(self._write_path)
+        try:
+            self._fh.seek(offset)
+        except:
+            return False
+        self._write_limit = limit
+        return True
+
     def write_bytes(self, bts:bytearray):
         if self._fh is None:
             return False 
         
-        return self._fh.write(bts)
+        if self._write_limit >= 0:
+            if len(bts) > self._write_limit:
+                bts = bts[:self._write_limit]
+            self._write_limit -= len(bts)
+            if not len(bts):
+                return 0
+        
+        if self._wbuf is None:
+            self.flushes += 1
+            self.bytes_written += len(bts)
+            self._written()
+            return self._fh.write(bts)
+        
+        # into the buffer, a block going out whenever it fills up
+        wbuf = self._wbuf
+        size = len(wbuf)
+        num = len(bts)
+        if self._wbuf_len + num < size:
+            # the usual: fits, with room to spare
+            wbuf[self._wbuf_len:(self._wbuf_len + num)] = bts
+            self._wbuf_len += num
+            self._last_write = time.ticks_ms()
+            return num
+        idx = 0
+        while idx < num:
+            room = size - self._wbuf_len
+            n = num - idx if num - idx < room else room
+            wbuf[self._wbuf_len:(self._wbuf_len + n)] = bts[idx:(idx + n)]
+            self._wbuf_len += n
+            idx += n
+            if self._wbuf_len == size and not self.flush_writes():
+                return False
+        self._last_write = time.ticks_ms()
+        return num
+    
+    def flush_writes(self, sync:bool=False):
+        '''
+            Writes out whatever is buffered and, with sync, has 
+            the file flushed too, for anything else reading it
+        '''
+        ok = True
+        if self._wbuf_len:
+            n = self._wbuf_len
+            self._wbuf_len = 0
+            self.flushes += 1
+            self.bytes_written += n
+            self._written()
+            try:
+                ok = self._fh.write(self._wbuf_view[:n]) == n
+            except:
+                ok = False
+        if sync and self._write_path is not None:
+            try:
+                self._fh.flush()
+            except:
+                pass
+        return ok
+    
+    def _written(self):
+        # a file open for update can be rewritten without changing 
+        # size: any checksum of it worked out (or started) before this 
+        # write is stale
+        if self._write_path is not None:
+            self.checksums.bump(self._write_path)
+    
+    def service(self):
+        '''
+            From the main loop: writes out what's buffered once 
+            nothing more has come in for write_idle_ms.  Returns
+            1 if it did.
+        '''
+        if not self._wbuf_len or \
+           time.ticks_diff(time.ticks_ms(), self._last_write) < self.write_idle_ms:
+            return 0
+        self.idle_flushes += 1
+        self.flush_writes()
+        return 1
     
\ No newline at end of file
@@ -0,0 +1,206 @@
+'''
+Binary patches: a new version of a file, built on the module from
+the old one plus a (small) delta, rather than uploaded whole.
+
+The delta is
+
+  'SPD1' OLDCRC(4) NEWSIZE(4) NEWCRC(4) OP... END
+
+all little endian, with ops
+
+  0x01 OFFSET LEN   copy LEN bytes of the old file, from OFFSET
+  0x02 LEN DATA     insert the LEN bytes that follow
+  0x00              end
+
+OFFSET and LEN being varints (7 bits a byte, low first, high bit
+set on all but the last).  The old file's CRC-32 has to match OLDCRC
+before anything gets done, and the new one's NEWSIZE and NEWCRC at
+the end, so a patch can't be applied to the wrong file or come out
+half done without it being noticed.  Deltas get made on the ground,
+see i2c_client_patch.
+
+A PatchJob streams it all through one buffer, a few buffers' worth
+per step(), so RAM used doesn't depend on the size of the files.
+The new file has to be a different one from the old (it gets moved
+in place afterwards).
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import os
+from spasic.fs.checksum import crc32
+
+Magic = b'SPD1'
+HeaderSize = 16
+OpEnd = 0x00
+OpCopy = 0x01
+OpInsert = 0x02
+
+# states of a PatchJob
+StateIdle = 0
+StateBase = 1 # checking the old file
+StateOps = 2
+
+class PatchJob:
+    def __init__(self, index=None, buffer_size:int=256):
+        self.index = index # a ChecksumIndex, whose entries for new_path go stale
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self._old = None
+        self._delta = None
+        self._new = None
+        self.new_path = None
+        self.state = StateIdle
+        self.error = None # why it failed, if it did
+        self.old_crc = 0
+        self.new_size = 0
+        self.new_crc = 0
+        self.op = OpEnd
+        self.remaining = 0 # of the current op
+        self.crc = 0 # of what's been read (old) or written (new) so far
+        self.written = 0
+
+    @property
+    def active(self):
+        return self.state != StateIdle
+
+    def start(self, old_path:str, delta_path:str, new_path:str):
+        self.abort()
+        self.error = None
+        if old_path == new_path:
+            return self._fail(b'SAME')
+        try:
+            self._old = open(old_path, 'rb')
+            self._delta = open(delta_path, 'rb')
+        except:
+            return self._fail(b'OPEN')
+
+        n = self._delta.readinto(self.view[:HeaderSize])
+        if n != HeaderSize or self.buffer[0:4] != Magic:
+            return self._fail(b'FMT')
+        self.old_crc = int.from_bytes(self.buffer[4:8], 'little')
+        self.new_size = int.from_bytes(self.buffer[8:12], 'little')
+        self.new_crc = int.from_bytes(self.buffer[12:16], 'little')
+
+        if self.index is not None:
+            self.index.bump(new_path)
+        try:
+            self._new = open(new_path, 'wb')
+        except:
+            return self._fail(b'OPEN')
+        self.new_path = new_path
+        self.state = StateBase
+        self.crc = 0
+        self.written = 0
+        self.remaining = 0
+        return True
+
+    def abort(self):
+        for fh in [self._old, self._delta, self._new]:
+            if fh is not None:
+                try:
+                    fh.close()
+                except:
+                    pass
+        self._old = None
+        self._delta = None
+        self._new = None
+        if self.index is not None and self.new_path is not None:
+            self.index.bump(self.new_path)
+        self.new_path = None
+        self.state = StateIdle
+
+    def step(self, num_chunks:int=1):
+        '''
+            Moves up to num_chunks buffers' worth along, returns True
+            once it's over: error is None if the new file is complete.
+        '''
+        if self.state == StateIdle:
+            return True
+        try:
+            for _i in range(num_chunks):
+                if self.state == StateBase:
+                    if not self._check_base():
+                        continue
+                    if self.crc != self.old_crc:
+                        self._fail(b'BASE')
+                        return True
+                    self.state = StateOps
+                    self.crc = 0
+                elif not self._move():
+                    return True
+        except OSError:
+            self._fail(b'IO')
+            return True
+        return self.state == StateIdle
+
+    def _check_base(self):
+        # CRC of the next buffer of the old file, True once all done
+        n = self._old.readinto(self.buffer)
+        if n:
+            self.crc = crc32(self.view[:n], self.crc)
+            return False
+        return True
+
+    def _move(self):
+        # a buffer's worth of the current op, or the next op.
+        # False once there's nothing more to do
+        if not self.remaining:
+            return self._next_op()
+        n = self.remaining if self.remaining < len(self.buffer) else len(self.buffer)
+        src = self._old if self.op == OpCopy else self._delta
+        if src.readinto(self.view[:n]) != n:
+            return self._fail(b'SHORT')
+        self._new.write(self.view[:n])
+        self.crc = crc32(self.view[:n], self.crc)
+        self.written += n
+        self.remaining -= n
+        return True
+
+    def _next_op(self):
+        op = self._read_byte()
+        if op == OpEnd:
+            if self.written != self.new_size or self.crc != self.new_crc:
+                return self._fail(b'CRC')
+            self.abort()
+            return False
+        if op == OpCopy:
+            offset = self._read_varint()
+            self.remaining = self._read_varint()
+            self._old.seek(offset)
+        elif op == OpInsert:
+            self.remaining = self._read_varint()
+        else:
+            return self._fail(b'FMT')
+        self.op = op
+        if self.written + self.remaining > self.new_size:
+            return self._fail(b'FMT')
+        return True
+
+    def _read_byte(self):
+        if self._delta.readinto(self.view[:1]) != 1:
+            return -1
+        return self.buffer[0]
+
+    def _read_varint(self):
+        v = 0
+        shift = 0
+        while True:
+            b = self._read_byte()
+            if b < 0:
+                raise OSError('delta ends')
+            v |= (b & 0x7f) << shift
+            if not (b & 0x80):
+                return v
+            shift += 7
+
+    def _fail(self, reason:bytes):
+        self.error = reason
+        new_path = self.new_path
+        self.abort()
+        if new_path is not None:
+            try:
+                os.remove(new_path)
+            except:
+                pass
+        return False
@@ -0,0 +1,71 @@
+'''
+Windowed file download.
+
+With 'FR', each uplink command brings down one chunk of the open file.
+With 'FT' OFFSET(4) WINDOW(2) [CHUNK], the board seeks to OFFSET and
+keeps queuing chunks, from the main loop, until WINDOW bytes have gone
+out or the file ends, as fast as the master drains them: a chunk is
+only read when its response fits in the reply arena.  Each one says
+where it's from
+
+  0x0B OFFSET(4) LEN DATA
+
+so the ground can tell what went missing and ask for just that range
+with another 'FT'.  The end of the file comes down as an EndOfFile
+error, with the offset it was hit at.  A new 'FT' replaces whatever
+stream was going, and a WINDOW of 0 just stops it.
+
+Chunks are read with readinto(), into the one buffer.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+
+class FileStreamer:
+    def __init__(self, fs, max_chunk:int):
+        self.fs = fs
+        self.max_chunk = max_chunk
+        self.buffer = bytearray(max_chunk)
+        self.view = memoryview(self.buffer)
+        self.offset = 0 # where the next chunk comes from
+        self.remaining = 0 # of the window
+        self.chunk = max_chunk
+        self.chunks_sent = 0
+        self.bytes_sent = 0
+
+    @property
+    def active(self):
+        return self.remaining > 0
+
+    def start(self, offset:int, window:int, chunk:int=0):
+        self.remaining = 0
+        if window and not self.fs.seek(offset):
+            return False
+        self.offset = offset
+        self.remaining = window
+        if not chunk or chunk > self.max_chunk:
+            chunk = self.max_chunk
+        self.chunk = chunk
+        return True
+
+    def stop(self):
+        self.remaining = 0
+
+    def next_size(self):
+        # bytes the next chunk will hold, at most
+        return self.chunk if self.chunk < self.remaining else self.remaining
+
+    def read_chunk(self):
+        '''
+            Reads the next chunk into buffer, returns its length:
+            0 at the end of the file, which ends the stream.
+        '''
+        n = self.fs.read_into(self.view[:self.next_size()])
+        if not n:
+            self.remaining = 0
+            return 0
+        self.offset += n
+        self.remaining -= n
+        self.chunks_sent += 1
+        self.bytes_sent += n
+        return n
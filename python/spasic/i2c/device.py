@@ -14,6 +14,21 @@
 # * get a callback triggered for all incoming, every tx of a blob
 #   and whenever the tx buffer goes empty
 #
+# The actual slave is a backend: by default the i2cslave C module, but 
+# anything with the same interface will do
+#
+#   setup(addr, scl, sda, baud, pullups)
+#   set_datain_callback(cb)     cb(num_bytes)
+#   set_datatxdone_callback(cb) cb(unused)
+#   initialize()
+#   have_pending_data()         -> bool
+#   pending_data_into(buf)      -> num bytes of one master write copied to buf
+#   write_bytes(size, bts)      copy out bytes for the master to read
+#   tx_done()                   -> bool, those have all been read
+#
+# e.g. the in-process spasic.i2c.device_sim.SlaveSim, so simulations
+# and benchmarks run this exact code.
+#
 
 
 try:
@@ -21,12 +36,14 @@ try:
 except:
     import spasic.settings_safe as sts
 
+from spasic.i2c.tx_arena import TxArena
+from spasic.cnc.response.framing import LaneTelemetry
+
 try:
     import i2cslave
 except:
-    print("\n\n\nERROR: NO i2cslave support!\n\n")
-
-HavePendingDataIn = False
+    # not on this build: a backend has to be passed in
+    i2cslave = None
 
 class I2CDevice:
     #
@@ -43,115 +60,300 @@ class I2CDevice:
     #
 
     SlaveBufferSize = 16*7
+    MaxFetchesPerPoll = 8
     
     def __init__(self, address:int=sts.DeviceAddress, 
                  scl:int=sts.I2CSCL, 
                  sda:int=sts.I2CSDA, 
                  baudrate:int=sts.I2CBaudRate,
                  use_pullups:bool=sts.I2CPullups,
-                 use_polling:bool=sts.I2CUsePollingDefault):
+                 use_polling:bool=sts.I2CUsePollingDefault,
+                 txqueue:TxArena=None,
+                 txqueue_low:TxArena=None,
+                 double_buffer:bool=sts.I2CTxDoubleBuffer,
+                 backend=None):
+        self._slave = backend if backend is not None else i2cslave
         self._addr = address 
         self._scl = scl 
         self._sda = sda 
         self._baud = baudrate
         self._i2c_pullups = use_pullups
-        self._dataqueue = bytearray()
+        self._dataqueue = txqueue if txqueue is not None else TxArena(sts.I2CTxArenaSize)
+        # background telemetry, only sent when no replies are waiting
+        self._lowqueue = txqueue_low if txqueue_low is not None else TxArena(sts.I2CTxTelemetryArenaSize, max_frames=sts.I2CTxTelemetryMaxFrames, frame_lane=LaneTelemetry)
+        self._lo_left = 0 # telemetry bytes to send before switching lanes
+        self._txstage = bytearray(self.SlaveBufferSize)
+        self._txstage_view = memoryview(self._txstage)
         self._slavebuf_filled = False
+        # next chunk, gathered while the master drains the slave buffer,
+        # so it can go in the moment that's done
+        self.double_buffer = double_buffer
+        self._txnext = bytearray(self.SlaveBufferSize)
+        self._txnext_view = memoryview(self._txnext)
+        self._txnext_len = 0
+        self._swapped = False
+        self._servicing = False
+        self.tx_swaps = 0 # chunks that went in straight from staging
+        self.tx_underruns = 0 # slave buffer ran dry with data waiting
         self.use_polling = use_polling
         
         self.callback_data_in = None
         self.callback_tx_done = None 
         self.callback_tx_buffer_empty = None 
-        # self._have_pending = False
+        self._have_pending = False
         self._data_xfer_done = False
         self._scratch_buf = bytearray(32)
         self._scratch_size = 0
     
+    @property 
+    def backend(self):
+        return self._slave
+    
     def data_received(self, _sz:int):
-        global HavePendingDataIn
-        HavePendingDataIn = True
+        self._have_pending = True
         
+    def needs_service(self):
+        '''
+            Cheap check for whether there's incoming data or 
+            the slave buffer has been read out, without fetching.
+            Meant for idle waits between main loop passes.
+        '''
+        if self._have_pending or self._data_xfer_done or self._swapped:
+            return True
+        if self.use_polling:
+            if self._slave.have_pending_data():
+                return True
+            if self._slavebuf_filled and self._slave.tx_done():
+                if not self._swap_staged():
+                    self._data_xfer_done = True
+                return True
+        return False
+    
     def poll_pending_data(self):
-        global HavePendingDataIn
-        
         if self.use_polling:
-            if i2cslave.have_pending_data():
-                HavePendingDataIn = True 
+            if self._slave.have_pending_data():
+                self._have_pending = True 
         
-        if not HavePendingDataIn: # self._have_pending:
-            return
+        if not self._have_pending:
+            return 0
+        
+        self._have_pending = False # handled
         
-        HavePendingDataIn = False # handled
+        if self.callback_data_in is None:
+            return 0
         
-        if self.callback_data_in is not None:
-            self._scratch_size = int(i2cslave.pending_data_into(self._scratch_buf))
+        # drain everything the low-level side is holding, 
+        # so bursts don't sit there waiting for another flag
+        num_fetched = 0
+        while num_fetched < self.MaxFetchesPerPoll:
+            self._scratch_size = int(self._slave.pending_data_into(self._scratch_buf))
+            if not self._scratch_size:
+                break
+            num_fetched += 1
             # print(f"GOT {self._scratch_buf[:self._scratch_size]}, doing cb")
-            self.callback_data_in(self._scratch_size, self._scratch_buf[:self._scratch_size])
+            # callback gets the scratch buffer itself, only the 
+            # first _scratch_size bytes are meaningful
+            self.callback_data_in(self._scratch_size, self._scratch_buf)
+            if self.use_polling and not self._slave.have_pending_data():
+                break
+        else:
+            # hit the cap, there may be more: leave it for the next poll
+            self._have_pending = True
+        
+        return num_fetched
             
     @property 
     def outdata_queue_size(self):
-        return len(self._dataqueue)
+        return len(self._dataqueue) + len(self._lowqueue)
     
-    def _write_outbytes(self):
-        if self._slavebuf_filled or not len(self._dataqueue):
+    @property 
+    def txqueue(self):
+        return self._dataqueue
+    
+    @property 
+    def txqueue_low(self):
+        return self._lowqueue
+    
+    def _next_lane(self):
+        # telemetry that's already partly out has to be finished 
+        # first: lanes are only switched on response boundaries
+        if self._lo_left:
+            return self._lowqueue
+        if self._dataqueue.committed:
+            return self._dataqueue
+        if len(self._lowqueue):
+            return self._lowqueue
+        return None
+    
+    def _consume(self, lane:TxArena, num_bytes:int):
+        lane.consume(num_bytes)
+        if lane is self._lowqueue:
+            self._lo_left = lane.until_boundary()
+    
+    def _take(self, sink, staging:bool=False):
+        '''
+            Pull the next slave buffer's worth out of the lanes and 
+            pass it to sink(num_bytes, bts).  Returns num_bytes.
+        '''
+        lane = self._next_lane()
+        if lane is None:
             return 0
-        # 
-        if len(self._dataqueue) > self.SlaveBufferSize:
-            to_send = self._dataqueue[:self.SlaveBufferSize]
-            self._dataqueue = self._dataqueue[self.SlaveBufferSize:]
+        
+        room = self.SlaveBufferSize
+        hi = self._dataqueue
+        if lane is hi:
+            # a staged chunk is spoken for: don't let telemetry 
+            # ride along, in case more replies come in meanwhile
+            other_waiting = 0 if staging else len(self._lowqueue)
         else:
-            to_send = self._dataqueue
-            self._dataqueue = bytearray()
+            other_waiting = hi.committed
+            if other_waiting and self._lo_left:
+                # replies waiting, only finish the telemetry in flight
+                room = self._lo_left
+            elif staging:
+                # likewise, only stage a single report, and all of 
+                # it: the master reads a short chunk padded out
+                room = self._lo_left if self._lo_left else lane.next_frame_len()
+                if room > self.SlaveBufferSize:
+                    room = self.SlaveBufferSize
+                
+        to_send = lane.peek_chunk(room)
+        num_bytes = len(to_send)
+        if num_bytes == self.SlaveBufferSize or lane.until_boundary(num_bytes) or not other_waiting:
+            # all from one lane: hand it straight 
+            # out of the arena, no copies
+            sink(num_bytes, to_send)
+            self._consume(lane, num_bytes)
+            return num_bytes
+        
+        # this lane ends on a response boundary with room to spare: top 
+        # up the slave buffer from the other, gathered in the staging buffer
+        self._txstage[0:num_bytes] = to_send
+        self._consume(lane, num_bytes)
+        total = num_bytes
+        lane = self._next_lane()
+        if lane is not None:
+            to_send = lane.peek_chunk(self.SlaveBufferSize - total)
+            num_bytes = len(to_send)
+            self._txstage[total:total + num_bytes] = to_send
+            self._consume(lane, num_bytes)
+            total += num_bytes
             
-        i2cslave.write_bytes(len(to_send), to_send)
-        self._slavebuf_filled = True
-        return len(to_send)
+        sink(total, self._txstage_view[0:total])
+        return total
+    
+    def _write_outbytes(self):
+        if self._slavebuf_filled:
+            return 0
         
-    def queue_outdata(self, data_out:bytearray):
-        self._dataqueue += data_out
-        if not len(self._dataqueue):
-            return 
+        num_bytes = self._txnext_len
+        if num_bytes:
+            # already gathered, goes ahead of anything else
+            self._slave.write_bytes(num_bytes, self._txnext_view[0:num_bytes])
+            self._txnext_len = 0
+        else:
+            num_bytes = self._take(self._slave.write_bytes)
             
+        if num_bytes:
+            self._slavebuf_filled = True
+        return num_bytes
+    
+    def _stage(self, num_bytes:int, bts):
+        self._txnext[0:num_bytes] = bts
+        # only publish once it's all there
+        self._txnext_len = num_bytes
+        
+    def prestage(self):
+        '''
+            While the master is reading out the slave buffer, 
+            gather the next chunk so it's ready to swap in.
+        '''
+        if not self.double_buffer or not self._slavebuf_filled or \
+           self._data_xfer_done or self._txnext_len:
+            return 0
+        return self._take(self._stage, True)
+    
+    def _swap_staged(self):
+        # slave buffer just ran dry: straight in with the 
+        # staged chunk, if there is one.
+        num_bytes = self._txnext_len
+        if not num_bytes or self._servicing or not self._slavebuf_filled:
+            return False
+        self._slave.write_bytes(num_bytes, self._txnext_view[0:num_bytes])
+        self._txnext_len = 0
+        self._swapped = True
+        self.tx_swaps += 1
+        return True
+        
+    def queue_outdata(self, data_out:bytearray=None):
+        # responses are normally encoded directly into the 
+        # transmit arena, in which case this just makes 
+        # sure the slave buffer gets fed
+        if data_out is not None and len(data_out):
+            self._dataqueue.write(data_out)
         self._write_outbytes()
+        self.prestage()
         
     
     def _data_tx_done_cb(self, _unused=None):
-        self._data_xfer_done = True 
+        # callbacks are scheduled, so they run between main loop 
+        # bytecodes rather than in the middle of a refill
+        if self._slavebuf_filled and not self._swap_staged():
+            self._data_xfer_done = True 
         
     def push_outgoing_data(self):
         
         if self.use_polling:
-            if i2cslave.tx_done():
+            if self._slave.tx_done() and not self._swap_staged():
                 self._data_xfer_done = True
         
+        if self._swapped:
+            # staged chunk already went in on tx done
+            self._swapped = False
+            if self.callback_tx_done is not None:
+                self.callback_tx_done()
+        
         if not self._data_xfer_done:
+            self.prestage()
             return 
         
+        self._servicing = True
         self._data_xfer_done = False
         self._slavebuf_filled = False
         if self.callback_tx_done is not None:
             # print(f"tx done cb: {self.callback_tx_done}")
             self.callback_tx_done()
             
-        if not self._write_outbytes():
+        staged = self._txnext_len
+        num_bytes = self._write_outbytes()
+        self._servicing = False
+        if not num_bytes:
             if self.callback_tx_buffer_empty is not None:
                 # print(f"tx empty cb {self.callback_tx_buffer_empty}")
                 self.callback_tx_buffer_empty()
+        elif not staged:
+            # had to be gathered just now
+            self.tx_underruns += 1
+        
+        self.prestage()
                 
         
         
         
     def begin(self):
+        if self._slave is None:
+            print("\n\n\nERROR: NO i2cslave support!\n\n")
+            return False
         pu_value = 1 if self._i2c_pullups else 0
-        i2cslave.setup(self._addr, self._scl, self._sda, self._baud, pu_value) 
+        self._slave.setup(self._addr, self._scl, self._sda, self._baud, pu_value) 
         if self.use_polling:
             print("Using pure POLLING on I2C")
         else:
             print("Using CALLBACKS on I2C")
-            i2cslave.set_datain_callback(self.data_received)
-            i2cslave.set_datatxdone_callback(self._data_tx_done_cb)
+            self._slave.set_datain_callback(self.data_received)
+            self._slave.set_datatxdone_callback(self._data_tx_done_cb)
         try:
-            i2cslave.initialize()
+            self._slave.initialize()
         except:
             print("i2c slave init failed!")
             return False 
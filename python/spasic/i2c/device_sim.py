@@ -11,10 +11,10 @@
 ###      sim_master_data_request
 ###     methods
 ###
-### The idea is to copy the device.py I2CDevice class
-### AS-IS and add those two methods, all the magic 
-### happens in the SlaveSim instance, which replaces
-### the i2cslave module.
+### I2CDevice is the regular device.I2CDevice, with SlaveSim 
+### as its backend: all the magic happens in the SlaveSim 
+### instance, which stands in for the i2cslave module, so 
+### what's simulated is the code that actually runs.
 ###
 ### Then, launch i2c_server.main_loop in a thread, get_i2c_device and
 ### play with sending data and reading bytes
@@ -26,22 +26,97 @@
 ###
 ### Then do a bunch of d.sim_master_data_request() to see what got queued back
 
+import spasic.i2c.device as device
+from spasic.i2c.tx_arena import TxArena
+
+class BusTiming:
+    '''
+        Wire time for what goes over the simulated bus.  The sim 
+        itself doesn't wait, this just keeps a clock: every master
+        transaction moves it ahead by what it would take on the wire,
+        (START, address, bytes, each with their ack bit, STOP) plus 
+        stretch_us of the slave holding SCL while its ISR gets to 
+        the FIFO.  Time spent between transactions goes in with idle().
+        
+        With a SlaveSim's timing set, utilisation and the clock 
+        are what the transactions so far would have taken for real.
+    '''
+    BitsPerByte = 9 # 8 + ack
+    FramingBits = 2 # START, STOP
+    
+    def __init__(self, baud:int=100000, stretch_us:int=0):
+        self.baud = baud 
+        self.stretch_us = stretch_us
+        self.reset()
+        
+    def reset(self):
+        self.now_us = 0
+        self.busy_us = 0
+        self.stretched_us = 0
+        self.writes = 0
+        self.reads = 0
+        
+    def transaction_us(self, num_bytes:int):
+        # address byte included
+        bits = (1 + num_bytes) * self.BitsPerByte + self.FramingBits
+        return (bits * 1000000) // self.baud + self.stretch_us
+    
+    def write(self, num_bytes:int):
+        self.writes += 1
+        self._busy(self.transaction_us(num_bytes))
+        
+    def read(self, num_bytes:int):
+        self.reads += 1
+        self._busy(self.transaction_us(num_bytes))
+        
+    def _busy(self, us:int):
+        self.busy_us += us 
+        self.stretched_us += self.stretch_us
+        self.now_us += us
+        
+    def idle(self, us:int):
+        self.now_us += us
+    
+    @property 
+    def utilisation(self):
+        if not self.now_us:
+            return 0.0
+        return self.busy_us / self.now_us
+    
+    def max_throughput(self, read_size:int=16, gap_us:int=0):
+        '''
+            Bytes/s the master can pull, doing nothing but 
+            read_size reads gap_us apart.
+        '''
+        return read_size * 1000000 / (self.transaction_us(read_size) + gap_us)
+    
+    def __repr__(self):
+        return f'<BusTiming {self.baud}Hz t:{self.now_us}us busy:{self.busy_us}us w:{self.writes} r:{self.reads}>'
+
 class SlaveSim:
-    def __init__(self):
+    def __init__(self, buffer_size:int=16*7, timing:BusTiming=None):
         self.addr = 0 
         self.scl = 0 
         self.sda = 0 
         self.freq = 0
+        self.pullups = 0
         self._din_cb = None 
         self._txdone_cb = None
-        self._data_in = bytearray()
-        self._data_out = bytearray()
+        self._data_in = [] # pending master writes
+        self._outbuf = bytearray(buffer_size) # slave tx buffer
+        self._outview = memoryview(self._outbuf)
+        self._out_len = 0
+        self._out_idx = 0
+        self.reads = 0
+        self.empty_reads = 0 # reads that got nothing but 0x00 padding
+        self.timing = timing # None for instantaneous transactions
          
-    def setup(self, addr:int, scl:int, sda:int, baud:int=100000):
+    def setup(self, addr:int, scl:int, sda:int, baud:int=100000, pullups:int=0):
         self.addr = addr 
         self.scl = scl 
         self.sda = sda 
         self.freq = baud 
+        self.pullups = pullups
         
         
     def set_datain_callback(self, cb):
@@ -51,192 +126,117 @@ class SlaveSim:
         
     def initialize(self):
         return 
+    def have_pending_data(self):
+        return len(self._data_in) > 0
+    
     def pending_data_into(self, bts:bytearray):
+        # one master write per call, like the real thing
         bsize = len(bts)
         for i in range(bsize):
             bts[i] = 0xff 
         
-        if len(self._data_in) >= bsize:
+        if not len(self._data_in):
+            return 0
+        
+        frame = self._data_in.pop(0)
+        cplen = len(frame)
+        if cplen > bsize:
             cplen = bsize
-        else:
-            cplen = len(self._data_in)
         
         for i in range(cplen):
-            bts[i] = self._data_in[i]
-            
-        if cplen:
-            self._data_in = self._data_in[cplen:]
+            bts[i] = frame[i]
             
         return cplen
     
     def write_bytes(self, sz:int, bts:bytearray):
-        self._data_out = bytearray(bts[:sz]) # local copy
+        # local copy, into our "hardware" buffer.  The master 
+        # may be reading from another thread, so only publish
+        # the new length once the bytes are in
+        if sz > len(self._outbuf):
+            sz = len(self._outbuf)
+        self._out_len = 0
+        self._out_idx = 0
+        self._outbuf[0:sz] = bts[0:sz]
+        self._out_len = sz
+        
+    def tx_done(self):
+        return self._out_idx >= self._out_len
     
     def master_send_data(self, bts:bytearray):
-        self._data_in += bts 
+        self._data_in.append(bytearray(bts))
+        if self.timing is not None:
+            self.timing.write(len(bts))
         cb = self._din_cb
         if cb is not None:
             cb(len(bts))
             
-    def master_request_data(self):
-        ret_data = bytearray([0xff]*16)
-        doutsz = len(self._data_out)
-        if doutsz:
+    def master_request_into(self, ret_data:bytearray):
+        # reading an empty slave gets 0s, which is 
+        # what the master takes to mean "nothing more"
+        for i in range(16):
+            ret_data[i] = 0x00
+        
+        self.reads += 1
+        if self.timing is not None:
+            self.timing.read(16)
+        doutsz = self._out_len - self._out_idx
+        if doutsz <= 0:
+            self.empty_reads += 1
+        else:
             cplen = 16
             if cplen > doutsz:
                 cplen = doutsz 
             
-            for i in range(cplen):
-                ret_data[i] = self._data_out[i]
-            
-            self._data_out = self._data_out[cplen:]
+            idx = self._out_idx
+            ret_data[0:cplen] = self._outview[idx:idx + cplen]
+            self._out_idx += cplen
             
-        if not len(self._data_out):
+        if self._out_idx >= self._out_len:
             cb = self._txdone_cb
             if cb is not None:
                 cb(None)
-                
+        
         return ret_data
+    
+    def master_request_data(self):
+        return self.master_request_into(bytearray(16))
             
 i2cslave = SlaveSim()
 
-
-          
-
 SlaveAddressDefault = 0x51
 DefaultBaudRate = 100000  
 
-HavePendingDataIn = False
-class I2CDevice:
-    #
-    # Construct the device,
-    # Set
-    #     dev.callback_data_in = somefunc taking NUMBYTES, BYTES parms
-    #     dev.callback_tx_done = signal for blob sent
-    #     dev.callback_tx_buffer_empty = signal for nothing at all left in tx queue
-    #
-    # Call begin() and check it returns True
-    #
-    # Do whatever you like in the meantime
-    #
-    #
-
-    SlaveBufferSize = 16*7
-    
+class I2CDevice(device.I2CDevice):
+    '''
+        The regular I2CDevice, on the simulated slave, with a 
+        few helpers to play master from the REPL.  Tx done comes 
+        in as a callback, unless use_polling is set.
+    '''
     def __init__(self, address:int=SlaveAddressDefault, 
                  scl:int=3, 
-                 sda:int=2, baudrate:int=DefaultBaudRate):
-        self._addr = address 
-        self._scl = scl 
-        self._sda = sda 
-        self._baud = baudrate
-        self._dataqueue = bytearray()
-        self._slavebuf_filled = False
-        
-        self.callback_data_in = None
-        self.callback_tx_done = None 
-        self.callback_tx_buffer_empty = None 
-        # self._have_pending = False
-        self._data_xfer_done = False
-        self._scratch_buf = bytearray(32)
-        self._scratch_size = 0
-    
-    
+                 sda:int=2, baudrate:int=DefaultBaudRate,
+                 txqueue:TxArena=None,
+                 txqueue_low:TxArena=None,
+                 double_buffer:bool=True,
+                 use_polling:bool=False,
+                 backend:SlaveSim=None):
+        super().__init__(address=address, scl=scl, sda=sda, baudrate=baudrate, 
+                         use_polling=use_polling, txqueue=txqueue, txqueue_low=txqueue_low,
+                         double_buffer=double_buffer,
+                         backend=backend if backend is not None else i2cslave)
     
     def sim_data_received(self, data:bytearray):
-        i2cslave.master_send_data(data)
+        self.backend.master_send_data(data)
         
     def sim_master_data_request(self):
-        return i2cslave.master_request_data()
+        return self.backend.master_request_data()
         
     def sim_master_data_all(self):
-        empty = bytearray([0xff]*16)
-        v = i2cslave.master_request_data()
+        empty = bytearray(16)
+        v = self.backend.master_request_data()
         retBts = []
         while v != empty:
             retBts.append(v)
-            v = i2cslave.master_request_data()
+            v = self.backend.master_request_data()
         
         return retBts
-            
-            
-    
-    
-    
-    
-    def data_received(self, _sz:int):
-        global HavePendingDataIn
-        HavePendingDataIn = True
-        
-    def poll_pending_data(self):
-        global HavePendingDataIn
-        if not HavePendingDataIn: # self._have_pending:
-            return
-        
-        HavePendingDataIn = False # handled
-        
-        if self.callback_data_in is not None:
-            self._scratch_size = int(i2cslave.pending_data_into(self._scratch_buf))
-            # print(f"GOT {self._scratch_buf[:self._scratch_size]}, doing cb")
-            self.callback_data_in(self._scratch_size, self._scratch_buf[:self._scratch_size])
-            
-    @property 
-    def outdata_queue_size(self):
-        return len(self._dataqueue)
-    
-    def _write_outbytes(self):
-        if self._slavebuf_filled or not len(self._dataqueue):
-            return 0
-        # 
-        if len(self._dataqueue) > self.SlaveBufferSize:
-            to_send = self._dataqueue[:self.SlaveBufferSize]
-            self._dataqueue = self._dataqueue[self.SlaveBufferSize:]
-        else:
-            to_send = self._dataqueue
-            self._dataqueue = bytearray()
-            
-        i2cslave.write_bytes(len(to_send), to_send)
-        self._slavebuf_filled = True
-        return len(to_send)
-        
-    def queue_outdata(self, data_out:bytearray):
-        self._dataqueue += data_out
-        if not len(self._dataqueue):
-            return 
-            
-        self._write_outbytes()
-        
-    
-    def _data_tx_done_cb(self, _unused=None):
-        self._data_xfer_done = True 
-        
-    def push_outgoing_data(self):
-        if not self._data_xfer_done:
-            return 
-        
-        self._data_xfer_done = False
-        self._slavebuf_filled = False
-        if self.callback_tx_done is not None:
-            # print(f"tx done cb: {self.callback_tx_done}")
-            self.callback_tx_done()
-            
-        if not self._write_outbytes():
-            if self.callback_tx_buffer_empty is not None:
-                # print(f"tx empty cb {self.callback_tx_buffer_empty}")
-                self.callback_tx_buffer_empty()
-                
-        
-        
-        
-    def begin(self):
-        i2cslave.setup(self._addr, self._scl, self._sda, self._baud) 
-        i2cslave.set_datain_callback(self.data_received)
-        i2cslave.set_datatxdone_callback(self._data_tx_done_cb)
-        try:
-            i2cslave.initialize()
-        except:
-            print("i2c slave init failed!")
-            return False 
-            
-        return True
-    
@@ -0,0 +1,102 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Fixed-size ring of incoming command frames.
+
+The i2c data-in callback is the only producer (push), the main loop
+the only consumer (peek/pop), so each side only ever moves its own index.
+
+Frames are stored as [LEN] [up to 8 bytes] in a single preallocated
+bytearray, and handed out as memoryviews into that storage, so nothing
+gets copied on the way to the command processor.  The flip side is that
+a frame is only valid until it is pop()ed: handlers that want to hang
+on to the bytes must copy them.
+'''
+
+FrameMaxLength = 8
+FrameSlotSize = FrameMaxLength + 1 # length byte + data
+
+class FrameRing:
+    def __init__(self, depth:int=16):
+        if depth < 1:
+            depth = 1
+        self.depth = depth
+        # indices run over 2*depth, so full and empty are distinguishable
+        # without sacrificing a slot
+        self._wrap = 2 * depth
+        self._storage = bytearray(depth * FrameSlotSize)
+        self._view = memoryview(self._storage)
+        self._head = 0 # next write, only touched by producer
+        self._tail = 0 # next read, only touched by consumer
+
+        self.received = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return (self._head - self._tail) % self._wrap
+
+    @property
+    def full(self):
+        return len(self) >= self.depth
+
+    @property
+    def free_slots(self):
+        return self.depth - len(self)
+
+    def push(self, numbytes:int, bts:bytearray, offset:int=0):
+        '''
+            Copy numbytes (truncated to 8) from bts, starting at offset, 
+            into the next slot.
+            Returns False, and counts the drop, when the ring is full.
+        '''
+        if numbytes > FrameMaxLength:
+            numbytes = FrameMaxLength
+        if numbytes < 1:
+            return False
+
+        count = len(self)
+        if count >= self.depth:
+            self.dropped += 1
+            return False
+
+        storage = self._storage
+        slot = (self._head % self.depth) * FrameSlotSize
+        storage[slot] = numbytes
+        for i in range(numbytes):
+            storage[slot + 1 + i] = bts[offset + i]
+
+        # only publish once the slot is filled in
+        self._head = (self._head + 1) % self._wrap
+        self.received += 1
+        if count >= self.high_water:
+            self.high_water = count + 1
+        return True
+
+    def peek(self):
+        '''
+            memoryview of the oldest frame's bytes, or None if empty.
+        '''
+        if self._head == self._tail:
+            return None
+
+        offset = (self._tail % self.depth) * FrameSlotSize
+        return self._view[offset + 1:offset + 1 + self._storage[offset]]
+
+    def pop(self):
+        if self._head == self._tail:
+            return False
+        self._tail = (self._tail + 1) % self._wrap
+        return True
+
+    def clear(self):
+        self._tail = self._head
+
+    def reset_stats(self):
+        self.received = 0
+        self.dropped = 0
+        self.high_water = len(self)
+
+    def __repr__(self):
+        return f'<FrameRing {len(self)}/{self.depth} rx:{self.received} drop:{self.dropped}>'
@@ -0,0 +1,356 @@
+'''
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+
+Preallocated circular transmit arena.
+
+Responses get encoded straight into this buffer (reserve/commit, or
+put() for Response objects) and the I2C device pulls slave-buffer-sized
+chunks back out as memoryviews, so steady-state traffic doesn't touch
+the heap.
+
+To keep encoders simple, reserve() always hands out a contiguous
+region: the buffer has a bit of slack past its end, and whatever spills
+into it on commit() gets folded back to the start of the ring.
+
+Command replies are strictly FIFO.  Periodic auto-reports, on the other 
+hand, are put() with a report key and land in a per-key slot instead: 
+only the newest of each kind is kept, and slots are only moved into the 
+ring once it has drained.  So if the master stops reading for a while, 
+it comes back to fresh reports rather than minutes of backlog.
+
+With max_frames set, the arena also remembers where each committed 
+response ends, so a reader can tell how far it is to the next response
+boundary (until_boundary()), e.g. to interleave another queue safely.
+
+When full (or past high_water, if set lower than the capacity), new 
+responses are dropped by default.  With DropOldest, which needs 
+max_frames, the oldest whole responses are evicted to make room instead.
+
+Protocol v2 frames get their sequence number (and CRC) as they go into
+the ring, numbered for this arena's frame_lane (see framing), so only 
+frames that actually get queued to go out are counted.
+'''
+from array import array
+import spasic.cnc.response.framing as framing
+
+# largest single response we'll ever encode:
+# 4 byte header, length byte and up to 255 bytes of message
+MaxResponseSize = 4 + 1 + 255
+
+# auto-report keys
+ReportStatus = 0
+ReportExperiment = 1
+ReportInfo = 2
+NumReportKeys = 3
+
+# status, experiment and info reports all fit comfortably
+ReportSlotSize = 32
+
+# what to do when a response doesn't fit
+DropNewest = 0
+DropOldest = 1
+
+class TxArena:
+    def __init__(self, capacity:int=1024, max_response:int=MaxResponseSize,
+                 num_report_keys:int=NumReportKeys, report_slot_size:int=ReportSlotSize,
+                 max_frames:int=0, high_water:int=0, drop_policy:int=DropNewest,
+                 frame_lane:int=framing.LaneReplies):
+        if drop_policy == DropOldest and not max_frames:
+            raise ValueError('DropOldest needs max_frames')
+        self.capacity = capacity
+        # most we'll let queue up
+        self.limit = high_water if 0 < high_water < capacity else capacity
+        self.drop_policy = drop_policy
+        self.max_response = max_response
+        self.buffer = bytearray(capacity + max_response)
+        self._view = memoryview(self.buffer)
+        self._head = 0 # write position
+        self._tail = 0 # read position
+        self._count = 0
+        self._stage = None
+        self._stage_view = None
+        
+        self.report_slot_size = report_slot_size
+        self._reports = bytearray(num_report_keys * report_slot_size)
+        self._reports_view = memoryview(self._reports)
+        self._report_len = array('H', [0] * num_report_keys)
+        self._report_seq = array('L', [0] * num_report_keys)
+        self._report_next_seq = 1
+        self._report_bytes = 0
+        
+        # lengths of the responses in the ring, oldest first
+        self.max_frames = max_frames
+        self._frames = array('H', [0] * max_frames) if max_frames else None
+        self._frame_tail = 0
+        self._frame_count = 0
+        self._frame_sent = 0 # bytes of the oldest already consumed
+
+        self.frame_lane = frame_lane
+        self._frame_seq = 0 # next v2 frame's count
+        
+        # set whenever something is committed,
+        # cleared by whoever is feeding the device
+        self.new_data = False
+
+        self.bytes_queued = 0
+        self.bytes_sent = 0
+        self.bytes_discarded = 0
+        self.reports_superseded = 0
+        self.responses_evicted = 0
+        self.peak = 0 # most bytes in the ring at once
+
+    def __len__(self):
+        # includes auto-reports still waiting in their slots
+        return self._count + self._report_bytes
+
+    @property
+    def committed(self):
+        '''
+            bytes in the ring proper (i.e. not counting reports
+            still in their slots).  When this hits 0, everything 
+            handed out so far ended on a response boundary.
+        '''
+        return self._count
+
+    @property
+    def free(self):
+        return self.limit - self._count
+
+    def clear(self):
+        self.bytes_discarded += self._count + self._report_bytes
+        self._head = 0
+        self._tail = 0
+        self._count = 0
+        self._frame_tail = 0
+        self._frame_count = 0
+        self._frame_sent = 0
+        for i in range(len(self._report_len)):
+            self._report_len[i] = 0
+        self._report_bytes = 0
+
+    def reserve(self, size:int):
+        '''
+            Offset into self.buffer where size contiguous bytes
+            may be written, or -1 if they won't fit (counted as discarded).
+            Must be followed by commit(size) to actually queue them.
+        '''
+        if size > self.max_response or not self._make_room(size, 1):
+            self.bytes_discarded += size
+            return -1
+        return self._head
+    
+    def _make_room(self, size:int, num_frames:int):
+        if size <= self.free and not \
+           (self.max_frames and self._frame_count + num_frames > self.max_frames):
+            return True
+        if self.drop_policy != DropOldest or size > self.limit or num_frames > self.max_frames:
+            return False
+        
+        while size > self.free or self._frame_count + num_frames > self.max_frames:
+            if not self._frame_count or self._frame_sent:
+                # nothing left, or the oldest is already partly out
+                return False
+            flen = self._frames[self._frame_tail]
+            self._tail = (self._tail + flen) % self.capacity
+            self._count -= flen
+            self._frame_tail = (self._frame_tail + 1) % self.max_frames
+            self._frame_count -= 1
+            self.bytes_discarded += flen
+            self.responses_evicted += 1
+        return True
+
+    def commit(self, size:int):
+        if size <= 0:
+            return
+        end = self._head + size
+        if end > self.capacity:
+            # fold the spill back to the start of the ring
+            spill = end - self.capacity
+            self.buffer[0:spill] = self._view[self.capacity:end]
+            end = spill
+        self._head = end if end < self.capacity else 0
+        self._count += size
+        if self._count > self.peak:
+            self.peak = self._count
+        if self.max_frames:
+            self._frames[(self._frame_tail + self._frame_count) % self.max_frames] = size
+            self._frame_count += 1
+        self.bytes_queued += size
+        self.new_data = True
+
+    def put(self, response, report_key:int=-1):
+        '''
+            Encode a Response directly into the arena.
+            With a report_key, it replaces any report of the 
+            same kind that's still waiting to go out.
+        '''
+        size = len(response)
+        if report_key >= 0 and size <= self.report_slot_size:
+            return self._put_report(response, report_key, size)
+        
+        offset = self.reserve(size)
+        if offset < 0:
+            return False
+
+        size = response.encode_into(self.buffer, offset)
+        self._number_frame(self.buffer, offset, size)
+        self.commit(size)
+        return True
+    
+    def _number_frame(self, buf, offset:int, size:int):
+        # a v2 frame about to go in the ring gets its sequence number
+        if not framing.is_frame(buf, offset, size):
+            return
+        framing.stamp(buf, offset, size, framing.frame_seq(self.frame_lane, self._frame_seq))
+        self._frame_seq = (self._frame_seq + 1) & framing.SeqCountMask
+
+    def _put_report(self, response, key:int, size:int):
+        old_len = self._report_len[key]
+        if old_len:
+            self.reports_superseded += 1
+            self.bytes_discarded += old_len
+            self._report_bytes -= old_len
+            
+        self._report_len[key] = response.encode_into(self._reports, key * self.report_slot_size)
+        self._report_bytes += self._report_len[key]
+        self.bytes_queued += self._report_len[key]
+        self._report_seq[key] = self._report_next_seq
+        self._report_next_seq += 1
+        self.new_data = True
+        return True
+    
+    def report_waiting(self, key:int):
+        '''
+            A report of this kind is still in its slot, i.e. the next
+            one put() would supersede it.
+        '''
+        return self._report_len[key] != 0
+    
+    def _promote_reports(self):
+        # move waiting reports into the (empty) ring, oldest first
+        while self._report_bytes:
+            key = -1
+            for i in range(len(self._report_len)):
+                if self._report_len[i] and (key < 0 or self._report_seq[i] < self._report_seq[key]):
+                    key = i
+            size = self._report_len[key]
+            if size > self.free:
+                return
+            offset = key * self.report_slot_size
+            self._report_len[key] = 0
+            self._report_bytes -= size
+            # write() would count these as newly queued, they 
+            # already were when put()
+            self.bytes_queued -= size
+            self._number_frame(self._reports, offset, size)
+            self.write(self._reports_view[offset:offset + size], size)
+        
+        if self._report_next_seq >= 0x20000000:
+            self._report_next_seq = 1
+            for i in range(len(self._report_seq)):
+                self._report_seq[i] = 0
+        
+    def write(self, bts:bytearray, size:int=-1):
+        '''
+            Queue raw bytes, in one go if possible.
+        '''
+        if size < 0:
+            size = len(bts)
+
+        num_frames = (size + self.max_response - 1) // self.max_response
+        if not self._make_room(size, num_frames):
+            self.bytes_discarded += size
+            return False
+
+        src = memoryview(bts)
+        written = 0
+        while written < size:
+            chunk = size - written
+            if chunk > self.max_response:
+                chunk = self.max_response
+            offset = self._head
+            self.buffer[offset:offset + chunk] = src[written:written + chunk]
+            self.commit(chunk)
+            written += chunk
+
+        return True
+
+    def peek_chunk(self, maxlen:int):
+        '''
+            memoryview on up to maxlen of the oldest bytes.
+            When these wrap around the end of the ring, they're
+            gathered into a (preallocated) staging buffer.
+        '''
+        if not self._count and self._report_bytes:
+            self._promote_reports()
+            
+        size = self._count
+        if size > maxlen:
+            size = maxlen
+        if not size:
+            return None
+
+        tail = self._tail
+        if tail + size <= self.capacity:
+            return self._view[tail:tail + size]
+
+        if self._stage is None or len(self._stage) < maxlen:
+            self._stage = bytearray(maxlen)
+            self._stage_view = memoryview(self._stage)
+
+        first = self.capacity - tail
+        self._stage[0:first] = self._view[tail:self.capacity]
+        self._stage[first:size] = self._view[0:size - first]
+        return self._stage_view[0:size]
+
+    def consume(self, size:int):
+        if size > self._count:
+            size = self._count
+        self._tail = (self._tail + size) % self.capacity
+        self._count -= size
+        self.bytes_sent += size
+        if self.max_frames:
+            sent = self._frame_sent + size
+            while self._frame_count and sent >= self._frames[self._frame_tail]:
+                sent -= self._frames[self._frame_tail]
+                self._frame_tail = (self._frame_tail + 1) % self.max_frames
+                self._frame_count -= 1
+            self._frame_sent = sent
+
+    def next_frame_len(self):
+        '''
+            Bytes from the read position to the end of the response
+            there, moving waiting reports into the ring first if 
+            it's empty (0 if there's nothing at all).
+        '''
+        if not self._count and self._report_bytes:
+            self._promote_reports()
+        if not self._count:
+            return 0
+        return self.until_boundary(1) + 1
+
+    def until_boundary(self, offset:int=0):
+        '''
+            Bytes left, after the next offset bytes, before
+            a response ends (0 if that's right on a boundary).  
+            Without max_frames, the only known boundary is the 
+            end of what's in the ring.
+        '''
+        if not self.max_frames:
+            return self._count - offset if offset < self._count else 0
+        
+        pos = offset + self._frame_sent
+        if not pos:
+            return 0
+        idx = self._frame_tail
+        for _i in range(self._frame_count):
+            flen = self._frames[idx]
+            if pos <= flen:
+                return flen - pos
+            pos -= flen
+            idx = (idx + 1) % self.max_frames
+        return 0
+
+    def __repr__(self):
+        return f'<TxArena {self._count}+{self._report_bytes}/{self.capacity} q:{self.bytes_queued} s:{self.bytes_sent} d:{self.bytes_discarded} sup:{self.reports_superseded} ev:{self.responses_evicted}>'
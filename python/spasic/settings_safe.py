@@ -14,6 +14,7 @@ MinDelayForAutoReportSecs = 30
 AutoReportIdleMultiplier = 4
 AutoReportPeriodInfo = 15
 AutoReportPeriodStatus = 10
+AutoReportDeltaKeyframes = 0 # auto-reports in full one time in this many, deltas otherwise (0: always in full)
 
 DeviceAddress = 0x56
 I2CSCL = 3
@@ -21,10 +22,38 @@ I2CSDA = 2
 I2CBaudRate = 100000
 I2CPullups = False
 I2CUsePollingDefault = True
+I2CInFrameRingDepth = 16 # command frames buffered between main loop passes
+I2CTxArenaSize = 1024 # bytes of responses waiting for master to read
+I2CTxTelemetryArenaSize = 256 # bytes of background auto-reports, sent when no replies are waiting
+I2CTxTelemetryMaxFrames = 32 # background reports waiting, at most
+I2CTxHighWater = 0 # queue at most this many bytes of replies (0: whole arena), newest get dropped
+I2CTxTelemetryHighWater = 0 # same, for background reports
+I2CTxTelemetryDropOldest = True # when full, drop the oldest background reports to make room
+I2CTxDoubleBuffer = True # gather the next slave buffer chunk while the master reads the current one
+ResponseProtocolDefault = 1 # 2: responses framed, with a CRC, from boot (the master can switch with 'PV')
+ExperimentFragmentSize = 48 # default result bytes per 'EF' fragment, when the master doesn't say
+FileStreamChunkSize = 96 # file bytes per response, at most, when streaming a download ('FT')
+FileStreamHeadroom = 64 # reply arena bytes a download leaves free, for other replies
+ChecksumIndexPath = '/checksums.idx' # file CRC-32s ('FZ') kept here, across reboots (None: RAM only)
+ChecksumBlocksPerPass = 4 # 512 byte blocks checksummed per main loop pass
+FileWriteBufferSize = -1 # uploads ('FW') buffered and written this many bytes at a time (-1: a filesystem block, 0: unbuffered)
+FileWriteIdleMs = 2000 # buffered upload bytes get written out after this long without more
+PatchBufferSize = 256 # bytes moved at a time when applying a patch ('FP')
+PatchBuffersPerPass = 4 # of those, per main loop pass
+
+# main loop pacing: full speed while busy, backing off to 
+# MainLoopSleepMaxMs after MainLoopIdleBackoffMs of nothing happening.
+# While backed off, bus is still checked every MainLoopWakeCheckMs 
+# (0 to just sleep through, for less power and more latency)
+MainLoopSleepMinMs = 1
+MainLoopSleepMaxMs = 20
+MainLoopIdleBackoffMs = 500
+MainLoopWakeCheckMs = 1
 
 ThreadStackSize = 4096
 
 DebugUseSimulatedI2CDevice = False
+DebugFileCommands = False # print each file/variable command as it's handled
 
 DisableRebootsWithoutWatchdog = True 
 
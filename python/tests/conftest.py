@@ -0,0 +1,12 @@
+'''
+Tests run under CPython, from the spasics/python directory:
+
+  python -m pytest -q tests
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,24 @@
+'''
+Command packets as the ground builds them.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from i2c_client_packets import ClientPacketGenerator
+
+def test_poll_is_a_single_batch_frame_by_default():
+    pg = ClientPacketGenerator()
+    packets = pg.poll_list()
+    assert len(packets) == 1
+    assert len(packets[0]) <= pg.FrameSize
+    assert packets[0] == b'B\x01S\x01I\x01' + bytes([ord('E') + ord('I')])
+
+def test_poll_unbatched_when_turned_off():
+    pg = ClientPacketGenerator(batch_commands=False)
+    assert pg.poll_list() == [pg.status(), pg.info(), pg.experiment_result()]
+
+def test_batch_list_leaves_long_commands_alone():
+    pg = ClientPacketGenerator()
+    longer = pg.file_write_at(0x1234, 16)
+    packets = pg.batch_list([pg.status(), longer, pg.info()])
+    assert packets == [pg.status(), longer, pg.info()]
@@ -0,0 +1,89 @@
+'''
+ResponseDecoder, fed the way reads come off the bus: split anywhere.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from spasic.cnc.response.decoder import ResponseDecoder
+from spasic.cnc.response.response import ResponseInfo, ResponseOKMessage
+import spasic.cnc.response.writers as wr
+
+def encoded(writer):
+    buf = bytearray(len(writer))
+    writer.encode_into(buf, 0)
+    return bytes(buf)
+
+def feed_split(bts:bytes, split:int):
+    decoder = ResponseDecoder()
+    decoder.feed(bts[:split])
+    decoder.feed(bts[split:])
+    return decoder
+
+def test_tagged_info_split_after_its_fixed_part():
+    info = encoded(wr.InfoWriter(1, 2, 3, 'P2').set(100, 200))
+    for split in range(1, len(info)):
+        decoder = feed_split(info, split)
+        rs = decoder.responses()
+        assert len(rs) == 1, split
+        assert isinstance(rs[0], ResponseInfo)
+        assert rs[0].protocol == 2
+        assert (rs[0].v_maj, rs[0].v_min, rs[0].v_patch) == (1, 2, 3)
+        assert decoder.bytes_skipped == 0
+
+def test_untagged_info_held_until_the_next_byte():
+    info = encoded(wr.InfoWriter(1, 2, 3, '').set(100, 200))
+    decoder = ResponseDecoder()
+    decoder.feed(info)
+    assert decoder.partial and not len(decoder.responses())
+    # the next response (or read padding) settles it
+    decoder.feed(ResponseOKMessage(b'hi').bytes)
+    rs = decoder.responses()
+    assert [type(r) for r in rs] == [ResponseInfo, ResponseOKMessage]
+    assert rs[0].protocol == 1
+
+def test_untagged_info_at_the_very_end_on_flush():
+    decoder = ResponseDecoder()
+    decoder.feed(encoded(wr.InfoWriter(1, 2, 3, '')))
+    decoder.flush()
+    rs = decoder.responses()
+    assert len(rs) == 1 and rs[0].protocol == 1
+    assert decoder.bytes_skipped == 0
+
+def test_blocks_one_at_a_time_same_as_whole_transfer():
+    from spasic.cnc.response.response import ResponseStatus
+    sent = [rsp.bytes for rsp in [
+        ResponseOKMessage(b'a'), # status' result cut by the block
+        ResponseStatus(True, 3, 0, 1234, bytearray(b'Stratos!')),
+        ResponseInfo(1, 2, 3, 'P2', 100, 200),
+        ResponseStatus(False, 16, 0, 2, bytearray(b'\x00\x03\x04')), # short result, last
+    ]]
+    transfer = b''.join([bytes(b) for b in sent])
+    transfer += bytes(-len(transfer) % 16)
+    
+    whole = ResponseDecoder()
+    whole.feed(transfer)
+    whole.end_transfer()
+    expected = [bytes(r.bytes) for r in whole.responses()]
+    
+    blocks = ResponseDecoder()
+    got = []
+    for i in range(0, len(transfer), 16):
+        blocks.feed(transfer[i:(i + 16)])
+        got.extend([bytes(r.bytes) for r in blocks.responses()])
+    blocks.end_transfer()
+    got.extend([bytes(r.bytes) for r in blocks.responses()])
+    
+    assert got == expected
+    assert got[1] == bytes(sent[1])
+    assert got[2] == bytes(sent[2])
+    assert blocks.bytes_skipped == 0
+
+def test_status_waits_for_its_result_then_ends_with_the_transfer():
+    from spasic.cnc.response.response import ResponseStatus
+    status = bytes(ResponseStatus(True, 3, 0, 1234, bytearray(b'ab')).bytes)
+    decoder = ResponseDecoder()
+    decoder.feed(status)
+    assert decoder.partial and not len(decoder.responses())
+    decoder.end_transfer()
+    rs = decoder.responses()
+    assert len(rs) == 1 and bytes(rs[0].result) == b'ab'
@@ -0,0 +1,55 @@
+'''
+I2CDevice transmit lanes, on the simulated slave: what the master 
+actually reads.
+
+@author: Pat Deegan
+@copyright: Copyright (C) 2025 Pat Deegan, https://psychogenic.com
+'''
+from spasic.i2c.device_sim import I2CDevice, SlaveSim
+from spasic.i2c.tx_arena import ReportStatus
+import spasic.cnc.response.response as rsp
+
+def device():
+    slave = SlaveSim()
+    dev = I2CDevice(backend=slave, double_buffer=True)
+    dev.begin()
+    return (dev, slave)
+
+def master_read(dev, slave, num_reads:int):
+    reads = []
+    for _i in range(num_reads):
+        reads.append(bytes(slave.master_request_data()))
+        dev.push_outgoing_data()
+    return reads
+
+def test_staged_report_still_in_its_slot_goes_out_whole():
+    (dev, slave) = device()
+    reply = rsp.ResponseOKMessage(b'r1')
+    report = rsp.ResponseOKMessage(b'stat1')
+    dev.txqueue.put(reply)
+    dev.queue_outdata()
+    # only in its slot, nothing in the telemetry ring yet
+    dev.txqueue_low.put(report, ReportStatus)
+    dev.prestage()
+    assert bytes(dev._txnext[:dev._txnext_len]) == report.bytes
+    
+    reads = master_read(dev, slave, 3)
+    assert reads[0] == bytes(reply.bytes) + bytes(16 - len(reply.bytes))
+    assert reads[1] == bytes(report.bytes) + bytes(16 - len(report.bytes))
+    assert reads[2] == bytes(16)
+
+def test_staged_reports_never_split_across_reads():
+    (dev, slave) = device()
+    reports = [rsp.ResponseStatus(True, 3, 0, 1234, bytearray(8)), 
+               rsp.ResponseInfo(1, 1, 0, '', 123456, 654321)]
+    dev.txqueue.put(rsp.ResponseOKMessage(b'r1'))
+    dev.queue_outdata()
+    for (key, report) in enumerate(reports):
+        dev.txqueue_low.put(report, key)
+    dev.prestage()
+    
+    reads = master_read(dev, slave, 4)
+    for (read, report) in zip(reads[1:], reports):
+        expected = bytes(report.bytes)
+        assert read[:len(expected)] == expected
+        assert read[len(expected):] == bytes(16 - len(expected))
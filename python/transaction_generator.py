@@ -33,12 +33,14 @@ class TSPacket:
     
 class CSVGenerator:
     
-    def __init__(self, device_bus_id:int=DeviceBusIdDefault):
+    def __init__(self, device_bus_id:int=DeviceBusIdDefault, batch_commands:bool=True):
         self.tspackets = [] 
         self.current_pack = None 
         self.include_bytes_column = False
         self.hexpack_little_endian = True
         packetdump.extend_packets = True
+        # short commands sent at the same time share 'B' batch writes
+        packetdump.batch_packets = batch_commands
         self.bus_id = device_bus_id
         
         